@@ -1,10 +1,21 @@
-from typing import List, Dict, Literal
+import time
+import asyncio
+import hashlib
+from concurrent.futures import Executor
+from typing import List, Dict, Literal, Optional, Tuple
 from anonyme.logging.audit import get_logger
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
+from anonyme.detectors.base import Detector
 from anonyme.detectors.regex import RegexDetector
 from anonyme.detectors.ner import NerDetector
-from anonyme.decision import decide
+from anonyme.decision import decide, is_decided, resolve_policy
+from anonyme.config.policies import CompiledPolicy
+from anonyme.redaction import redact
+from anonyme.context import EmbeddingBasedContext
+from anonyme.cache import AnalysisCache
+from anonyme.prefilter import Prefilter
+from anonyme.metrics import StageTimer, metrics
 
 logger = get_logger(__name__)
 
@@ -13,23 +24,460 @@ class AnalyzeResult(BaseModel):
     risk_score: float
     reasons: List[str]
     metadata: Dict[str, str]
+    redacted_prompt: Optional[str] = None
+    # Finding subtypes behind the decision, for the audit trail; not part of responses
+    subtypes: List[str] = Field(default_factory=list, exclude=True)
+
+FailPolicy = Literal["open", "closed"]
+
+# Stages in order of cost; short-circuit evaluation skips the later ones
+REGEX_STAGE = "regex"
+NER_STAGE = "ner"
+CONTEXT_STAGE = "context"
+# Timed with the stages above, but never skipped
+DECIDE_STAGE = "decide"
+
+# "fast" runs regex and decide only, so it never imports or loads a model
+Profile = Literal["full", "fast"]
+FULL_PROFILE = "full"
+FAST_PROFILE = "fast"
+PROFILES = (FULL_PROFILE, FAST_PROFILE)
 
 regex_detector = RegexDetector()
 ner_detector = NerDetector()
 
-def analyze(prompt: str, context: List[Dict[str, str]]) -> AnalyzeResult:
-    logger.info("Analyzing prompt: %s", prompt)
-    logger.info("Context: %s", context)
+def _fingerprint(*parts: str) -> str:
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()[:16]
+
+# Identifies the detector configuration in cache keys
+PIPELINE_VERSION = _fingerprint(
+    repr(regex_detector.patterns),
+    regex_detector.api_key_pattern,
+    ner_detector.model_name,
+    repr(ner_detector.entity_types),
+)
+
+# Fast-profile results differ from full ones, so they get their own namespace
+FAST_PIPELINE_VERSION = _fingerprint(
+    FAST_PROFILE,
+    repr(regex_detector.patterns),
+    regex_detector.api_key_pattern,
+)
+
+# Receives every decision when set; see anonyme.logging.decisions
+audit_sink = None
+
+def _result_namespace(version: str, policy: CompiledPolicy) -> str:
+    # Findings do not depend on the policy, results do
+    return f"{version}/{policy.namespace}"
+
+def set_audit_sink(sink):
+    """Install the sink that records each decision and return the previous one."""
+    global audit_sink
+    previous, audit_sink = audit_sink, sink
+    return previous
+
+def _timed(timer: StageTimer, stage: str, func, *args):
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        timer.since(stage, start)
+
+def _finalize(
+    prompt: str,
+    result: AnalyzeResult,
+    timer: StageTimer,
+    session=None,
+    timings: bool = False
+) -> AnalyzeResult:
+    """Close the call's timings and report its final decision."""
+    timer.finish(result.action)
+    if timings:
+        result.metadata["stage_ms"] = timer.as_metadata()
+    if audit_sink is not None:
+        audit_sink.record_result(prompt, result, getattr(session, "session_id", None))
+    return result
+
+def set_ner_detector(detector: Detector) -> Detector:
+    """Swap the detector used for the NER stage and return the previous one."""
+    global ner_detector
+    previous, ner_detector = ner_detector, detector
+    return previous
+
+def _build_result(
+    prompt: str,
+    context: List[Dict[str, str]],
+    findings: list,
+    session: Optional[EmbeddingBasedContext] = None,
+    embedding_risk: Optional[Tuple[float, List[str]]] = None,
+    skip_context: bool = False,
+    timer: Optional[StageTimer] = None,
+    policy: Optional[CompiledPolicy] = None
+) -> AnalyzeResult:
+    timer = timer or metrics.timer()
+    start = time.perf_counter()
+    risk_modifier, modifier_reasons = 0.0, []
+    if session is not None:
+        if skip_context:
+            risk_modifier, modifier_reasons = session.findings_risk_modifier(findings)
+        elif embedding_risk is None:
+            risk_modifier, modifier_reasons = session.calculate_context_risk_modifier(prompt, findings)
+        else:
+            findings_modifier, findings_reasons = session.findings_risk_modifier(findings)
+            risk_modifier = embedding_risk[0] + findings_modifier
+            modifier_reasons = embedding_risk[1] + findings_reasons
+        start = timer.since(CONTEXT_STAGE, start)
     
-    findings = []
-    findings.extend(regex_detector.detect(prompt))
-    findings.extend(ner_detector.detect(prompt))
+    decision = decide(findings, context, risk_modifier, modifier_reasons, policy=policy)
     
-    decision = decide(findings, context)
+    redacted_prompt = None
+    if decision["action"] == "REDACT":
+        redacted_prompt = redact(prompt, findings)
     
-    return AnalyzeResult(
+    result = AnalyzeResult(
         action=decision["action"],
         risk_score=decision["risk_score"],
         reasons=decision["reasons"],
-        metadata={}
-    )
\ No newline at end of file
+        metadata={},
+        redacted_prompt=redacted_prompt,
+        subtypes=list(dict.fromkeys(f.subtype for f in findings))
+    )
+    start = timer.since(DECIDE_STAGE, start)
+    
+    if session is not None:
+        session.add_message("user", prompt, findings, decision["risk_score"], embed=not skip_context)
+        timer.since(CONTEXT_STAGE, start)
+    return result
+
+def _detect(
+    prompt: str,
+    short_circuit: bool = False,
+    run_ner: bool = True,
+    timer: Optional[StageTimer] = None,
+    policy: Optional[CompiledPolicy] = None
+) -> Tuple[list, List[str]]:
+    """Run the detectors cheapest first; return the findings and the stages skipped."""
+    timer = timer or metrics.timer()
+    findings = list(_timed(timer, REGEX_STAGE, regex_detector.detect, prompt))
+    if not run_ner or (short_circuit and is_decided(findings, policy)):
+        return findings, [NER_STAGE]
+    findings.extend(_timed(timer, NER_STAGE, ner_detector.detect, prompt))
+    return findings, []
+
+def _finish(
+    prompt: str,
+    context: List[Dict[str, str]],
+    findings: list,
+    skipped: List[str],
+    session: Optional[EmbeddingBasedContext],
+    short_circuit: bool,
+    run_context: bool = True,
+    timer: Optional[StageTimer] = None,
+    policy: Optional[CompiledPolicy] = None
+) -> AnalyzeResult:
+    if session is not None and (not run_context or (short_circuit and is_decided(findings, policy))):
+        skipped = skipped + [CONTEXT_STAGE]
+    
+    result = _build_result(
+        prompt, context, findings, session, skip_context=CONTEXT_STAGE in skipped, timer=timer, policy=policy
+    )
+    if skipped:
+        result.metadata["skipped_stages"] = ",".join(skipped)
+    return result
+
+def _check_profile(profile: str):
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown profile {profile!r}, expected one of {PROFILES}")
+
+def _analyze_fast(
+    prompt: str,
+    context: List[Dict[str, str]],
+    session: Optional[EmbeddingBasedContext] = None,
+    cache: Optional[AnalysisCache] = None,
+    timings: bool = False,
+    scope: Optional[Dict[str, str]] = None
+) -> AnalyzeResult:
+    """Regex findings and ``decide`` only; session turns are recorded without embeddings."""
+    timer = metrics.timer()
+    # An INFO record costs more than the whole fast analysis
+    logger.debug("Analyzing prompt (fast profile): %s", prompt)
+    policy = resolve_policy(scope)
+    
+    cache_result = cache is not None and not context and session is None
+    if cache_result:
+        namespace = _result_namespace(FAST_PIPELINE_VERSION, policy)
+        result = cache.get_result(prompt, namespace)
+        if result is not None:
+            return _finalize(prompt, result, timer, timings=timings)
+    
+    findings = list(_timed(timer, REGEX_STAGE, regex_detector.detect, prompt))
+    result = _build_result(prompt, context, findings, session, skip_context=True, timer=timer, policy=policy)
+    result.metadata["profile"] = FAST_PROFILE
+    
+    if cache_result:
+        cache.set_result(prompt, result, namespace)
+    return _finalize(prompt, result, timer, session, timings)
+
+def analyze(
+    prompt: str,
+    context: List[Dict[str, str]],
+    session: Optional[EmbeddingBasedContext] = None,
+    cache: Optional[AnalysisCache] = None,
+    short_circuit: bool = False,
+    prefilter: Optional[Prefilter] = None,
+    profile: Profile = FULL_PROFILE,
+    timings: bool = False,
+    scope: Optional[Dict[str, str]] = None
+) -> AnalyzeResult:
+    """
+    Detect sensitive data in ``prompt`` and decide what to do with it.
+    
+    With ``short_circuit``, stages that can no longer change a BLOCK are
+    skipped and listed in ``metadata["skipped_stages"]``; the action is the
+    same, but the risk score and reasons only cover the stages that ran.
+    A ``prefilter`` likewise skips NER and context scoring for prompts it
+    screens out. ``profile="fast"`` runs the regex detector alone and sets
+    ``metadata["profile"]``. With ``timings``, ``metadata["stage_ms"]`` holds
+    the milliseconds spent per stage, e.g. ``"regex=0.012,ner=3.480,..."``;
+    the process-wide aggregates in ``anonyme.metrics`` are kept either way.
+    ``scope`` holds the request's ``role``, ``classification`` and
+    ``regime``, which select the decision policy; see ``anonyme.config.policies``.
+    """
+    _check_profile(profile)
+    if profile == FAST_PROFILE:
+        return _analyze_fast(prompt, context, session, cache, timings, scope)
+    
+    timer = metrics.timer()
+    logger.info("Analyzing prompt: %s", prompt)
+    logger.info("Context: %s", context)
+    policy = resolve_policy(scope)
+    
+    # Only context-free calls may reuse a whole result
+    cache_result = cache is not None and not context and session is None
+    
+    if cache_result:
+        namespace = _result_namespace(PIPELINE_VERSION, policy)
+        result = cache.get_result(prompt, namespace)
+        if result is not None:
+            return _finalize(prompt, result, timer, timings=timings)
+    
+    run_ner, run_context = prefilter.screen(prompt, session) if prefilter is not None else (True, True)
+    
+    skipped: List[str] = []
+    findings = cache.get_findings(prompt, PIPELINE_VERSION) if cache is not None else None
+    if findings is None:
+        findings, skipped = _detect(prompt, short_circuit, run_ner, timer, policy)
+        # Partial findings would be wrong for callers that want every stage
+        if cache is not None and not skipped:
+            cache.set_findings(prompt, findings, PIPELINE_VERSION)
+    
+    result = _finish(prompt, context, findings, skipped, session, short_circuit, run_context, timer, policy)
+    
+    if cache_result and "skipped_stages" not in result.metadata:
+        cache.set_result(prompt, result, namespace)
+    
+    return _finalize(prompt, result, timer, session, timings)
+
+def analyze_many(
+    prompts: List[str],
+    contexts: Optional[List[List[Dict[str, str]]]] = None,
+    batch_size: int = 64,
+    n_process: int = 1,
+    cache: Optional[AnalysisCache] = None,
+    short_circuit: bool = False,
+    prefilter: Optional[Prefilter] = None,
+    profile: Profile = FULL_PROFILE,
+    timings: bool = False,
+    scope: Optional[Dict[str, str]] = None
+) -> List[AnalyzeResult]:
+    _check_profile(profile)
+    if contexts is None:
+        contexts = [[] for _ in prompts]
+    if len(contexts) != len(prompts):
+        raise ValueError(
+            f"Got {len(prompts)} prompts but {len(contexts)} contexts"
+        )
+    
+    if profile == FAST_PROFILE:
+        return [
+            _analyze_fast(prompt, context, cache=cache, timings=timings, scope=scope)
+            for prompt, context in zip(prompts, contexts)
+        ]
+    
+    # Batched stages are split evenly between the prompts they ran for
+    timers = [metrics.timer() for _ in prompts]
+    logger.info("Analyzing batch of %d prompt(s)", len(prompts))
+    policy = resolve_policy(scope)
+    
+    findings: List[Optional[list]] = [None] * len(prompts)
+    if cache is not None:
+        findings = [cache.get_findings(prompt, PIPELINE_VERSION) for prompt in prompts]
+    
+    skipped: List[List[str]] = [[] for _ in prompts]
+    pending = [index for index, cached in enumerate(findings) if cached is None]
+    if pending:
+        start = time.perf_counter()
+        regex_findings = regex_detector.detect_many([prompts[index] for index in pending])
+        share = (time.perf_counter() - start) / len(pending)
+        for index, regex in zip(pending, regex_findings):
+            findings[index] = list(regex)
+            timers[index].add(REGEX_STAGE, share)
+        
+        for index in pending:
+            if short_circuit and is_decided(findings[index], policy):
+                skipped[index] = [NER_STAGE]
+            elif prefilter is not None and not prefilter.screen(prompts[index])[0]:
+                skipped[index] = [NER_STAGE]
+        pending = [index for index in pending if not skipped[index]]
+        
+        if pending:
+            start = time.perf_counter()
+            ner_findings = ner_detector.detect_many(
+                [prompts[index] for index in pending], batch_size=batch_size, n_process=n_process
+            )
+            share = (time.perf_counter() - start) / len(pending)
+            for index, ner in zip(pending, ner_findings):
+                findings[index].extend(ner)
+                timers[index].add(NER_STAGE, share)
+                if cache is not None:
+                    cache.set_findings(prompts[index], findings[index], PIPELINE_VERSION)
+    
+    return [
+        _finalize(
+            prompt,
+            _finish(
+                prompt, context, prompt_findings, prompt_skipped, None, short_circuit, timer=timer, policy=policy
+            ),
+            timer,
+            timings=timings
+        )
+        for prompt, context, prompt_findings, prompt_skipped, timer in zip(
+            prompts, contexts, findings, skipped, timers
+        )
+    ]
+
+async def _await_stage(future: asyncio.Future, timeout: Optional[float]):
+    """Wait for a stage; return ``(result, None)`` or ``(None, failure reason)``."""
+    try:
+        return await asyncio.wait_for(future, timeout), None
+    except asyncio.TimeoutError:
+        # The worker thread cannot be interrupted; its result is discarded
+        return None, f"timed out after {timeout:g}s"
+    except Exception as exc:
+        logger.warning("Analysis stage failed: %s", exc)
+        return None, f"failed ({type(exc).__name__})"
+
+async def analyze_async(
+    prompt: str,
+    context: List[Dict[str, str]],
+    session: Optional[EmbeddingBasedContext] = None,
+    cache: Optional[AnalysisCache] = None,
+    executor: Optional[Executor] = None,
+    timeouts: Optional[Dict[str, float]] = None,
+    fail_policy: FailPolicy = "open",
+    short_circuit: bool = False,
+    prefilter: Optional[Prefilter] = None,
+    profile: Profile = FULL_PROFILE,
+    timings: bool = False,
+    scope: Optional[Dict[str, str]] = None
+) -> AnalyzeResult:
+    """
+    Like ``analyze``, but runs NER and the session's embedding work concurrently.
+
+    Regex runs inline; NER and context scoring run in ``executor`` (the
+    loop's default executor when None), so latency is roughly the slower of
+    the two. ``timeouts`` maps ``"ner"`` and ``"context"`` to seconds. When a
+    stage times out or raises, ``fail_policy="open"`` decides without it and
+    ``"closed"`` blocks the prompt; either way ``metadata["degraded"]`` names
+    the stage. With ``short_circuit``, regex runs first and nothing else is
+    submitted once it forces BLOCK; stages a ``prefilter`` screens out are
+    never submitted. The fast profile runs inline, as it would in ``analyze``.
+    """
+    _check_profile(profile)
+    if profile == FAST_PROFILE:
+        return _analyze_fast(prompt, context, session, cache, timings, scope)
+    
+    timer = metrics.timer()
+    logger.info("Analyzing prompt: %s", prompt)
+    logger.info("Context: %s", context)
+    policy = resolve_policy(scope)
+    
+    timeouts = timeouts or {}
+    loop = asyncio.get_running_loop()
+    
+    cache_result = cache is not None and not context and session is None
+    if cache_result:
+        namespace = _result_namespace(PIPELINE_VERSION, policy)
+        result = cache.get_result(prompt, namespace)
+        if result is not None:
+            return _finalize(prompt, result, timer, timings=timings)
+    
+    findings = cache.get_findings(prompt, PIPELINE_VERSION) if cache is not None else None
+    
+    run_ner, run_context = prefilter.screen(prompt, session) if prefilter is not None else (True, True)
+    
+    regex_findings = None
+    skipped: List[str] = []
+    if findings is None and not run_ner:
+        findings, skipped = list(_timed(timer, REGEX_STAGE, regex_detector.detect, prompt)), [NER_STAGE]
+    if short_circuit and findings is None:
+        regex_findings = _timed(timer, REGEX_STAGE, regex_detector.detect, prompt)
+        if is_decided(regex_findings, policy):
+            findings, skipped = list(regex_findings), [NER_STAGE]
+    if session is not None and (
+        not run_context or (short_circuit and findings is not None and is_decided(findings, policy))
+    ):
+        skipped.append(CONTEXT_STAGE)
+    
+    # Submitted before regex runs so the executor starts on them right away
+    stages = {}
+    if findings is None:
+        stages[NER_STAGE] = loop.run_in_executor(executor, _timed, timer, NER_STAGE, ner_detector.detect, prompt)
+    if session is not None and CONTEXT_STAGE not in skipped:
+        stages[CONTEXT_STAGE] = loop.run_in_executor(
+            executor, _timed, timer, CONTEXT_STAGE, session.embedding_risk_modifier, prompt
+        )
+    tasks = {
+        stage: asyncio.ensure_future(_await_stage(future, timeouts.get(stage)))
+        for stage, future in stages.items()
+    }
+    
+    if findings is None and regex_findings is None:
+        regex_findings = _timed(timer, REGEX_STAGE, regex_detector.detect, prompt)
+    outcomes = {stage: await task for stage, task in tasks.items()}
+    
+    failures = {stage: reason for stage, (_, reason) in outcomes.items() if reason is not None}
+    
+    if findings is None:
+        ner_findings = outcomes[NER_STAGE][0] or []
+        findings = regex_findings + ner_findings
+        if cache is not None and NER_STAGE not in failures:
+            cache.set_findings(prompt, findings, PIPELINE_VERSION)
+    
+    embedding_risk = None
+    skip_context = CONTEXT_STAGE in skipped
+    if CONTEXT_STAGE in outcomes:
+        embedding_risk = outcomes[CONTEXT_STAGE][0]
+        if CONTEXT_STAGE in failures:
+            # The turn stays in the history unembedded, as a skipped stage leaves it
+            skip_context = True
+    
+    result = _build_result(
+        prompt, context, findings, session, embedding_risk,
+        skip_context=skip_context, timer=timer, policy=policy
+    )
+    if skipped:
+        result.metadata["skipped_stages"] = ",".join(skipped)
+    
+    if failures:
+        result.metadata["degraded"] = ",".join(sorted(failures))
+        result.reasons.extend(f"{stage} stage {reason}" for stage, reason in failures.items())
+        if fail_policy == "closed":
+            result.action = "BLOCK"
+            result.risk_score = max(result.risk_score, 1.0)
+            result.redacted_prompt = None
+    elif cache_result and not skipped:
+        cache.set_result(prompt, result, namespace)
+    
+    return _finalize(prompt, result, timer, session, timings)
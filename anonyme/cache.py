@@ -0,0 +1,153 @@
+import time
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from anonyme.metrics import metrics
+
+
+class CacheBackend(ABC):
+    """Key-value store behind ``AnalysisCache``. Keys are hex digests."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: Any):
+        pass
+
+    @abstractmethod
+    def clear(self):
+        pass
+
+
+class LRUCache(CacheBackend):
+    """In-process cache bounded by entry count, with optional per-entry TTL."""
+
+    def __init__(
+        self,
+        max_size: int = 10_000,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+
+        self.evictions = 0
+        self.expirations = 0
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= self.clock():
+                del self._entries[key]
+                self.expirations += 1
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any):
+        expires_at = self.clock() + self.ttl if self.ttl is not None else None
+
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class AnalysisCache:
+    """
+    Content-addressed cache for ``analyze``.
+
+    Entries are keyed by a SHA-256 of the cache version, the caller's
+    namespace (the pipeline version) and the prompt, so changing detector
+    or policy configuration never serves stale results. Full results are
+    only reused for context-free calls; with context, only the detector
+    findings are reused.
+    """
+
+    RESULT = "result"
+    FINDINGS = "findings"
+
+    def __init__(self, backend: Optional[CacheBackend] = None, version: str = ""):
+        self.backend = backend if backend is not None else LRUCache()
+        self.version = version
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def key(self, kind: str, prompt: str, namespace: str = "") -> str:
+        digest = hashlib.sha256()
+        digest.update(self.version.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(namespace.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(kind.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(prompt.encode("utf-8", "surrogatepass"))
+        return digest.hexdigest()
+
+    def _get(self, kind: str, prompt: str, namespace: str) -> Optional[Any]:
+        value = self.backend.get(self.key(kind, prompt, namespace))
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        metrics.count_cache(kind, value is not None)
+        return value
+
+    def get_result(self, prompt: str, namespace: str = ""):
+        result = self._get(self.RESULT, prompt, namespace)
+        return result.model_copy(deep=True) if result is not None else None
+
+    def set_result(self, prompt: str, result, namespace: str = ""):
+        self.backend.set(self.key(self.RESULT, prompt, namespace), result.model_copy(deep=True))
+
+    def get_findings(self, prompt: str, namespace: str = "") -> Optional[list]:
+        findings = self._get(self.FINDINGS, prompt, namespace)
+        return list(findings) if findings is not None else None
+
+    def set_findings(self, prompt: str, findings: list, namespace: str = ""):
+        self.backend.set(self.key(self.FINDINGS, prompt, namespace), list(findings))
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+        }
+
+    def clear(self):
+        self.backend.clear()
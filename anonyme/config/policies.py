@@ -0,0 +1,345 @@
+"""Declarative decision policies, compiled into lookup tables for ``decide``."""
+
+import os
+import json
+import math
+import hashlib
+import threading
+from operator import mul
+from itertools import product
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from anonyme.logging.audit import get_logger
+
+logger = get_logger(__name__)
+
+
+BLOCK_THRESHOLD = 0.8
+REDACT_THRESHOLD = 0.5
+
+ACTIONS = ("ALLOW", "REDACT", "BLOCK")
+# Actions a subtype can force; a weight of 0 exempts it instead
+FORCED_ACTIONS = ("REDACT", "BLOCK")
+_SEVERITY = {action: rank for rank, action in enumerate(ACTIONS)}
+
+# A scope field a policy does not match on, or a value no policy names
+ANY = "*"
+SCOPE_FIELDS = ("role", "classification", "regime")
+
+ScopeKey = Tuple[str, str, str]
+
+
+class PolicyError(ValueError):
+    """A policy file or mapping that cannot be compiled."""
+
+
+@dataclass(frozen=True)
+class CompiledPolicy:
+    """
+    Everything ``decide`` needs for one scope, resolved ahead of time.
+
+    The risk of a set of findings is the dot product of their confidences
+    with the weights of their subtypes; subtypes without a weight count 1.0.
+    ``namespace`` fingerprints the resolved rules; scopes and reloads that
+    resolve to the same rules share it, and cached results with it.
+    """
+
+    name: str
+    version: str
+    weights: Mapping[str, float]
+    actions: Mapping[str, str]
+    redact_threshold: float
+    block_threshold: float
+    namespace: str
+
+    def score(self, findings: list) -> float:
+        # A handful of findings per prompt: numpy's call overhead would cost more than the product
+        weights = self.weights
+        return float(sum(map(mul, [f.confidence for f in findings], [weights.get(f.subtype, 1.0) for f in findings])))
+
+    def forced_action(self, findings: list) -> Optional[str]:
+        """The most severe action any finding's subtype forces, if any."""
+        forced = None
+        if self.actions:
+            for finding in findings:
+                action = self.actions.get(finding.subtype)
+                if action is not None and (forced is None or _SEVERITY[action] > _SEVERITY[forced]):
+                    forced = action
+        return forced
+
+    def action_for(self, risk: float, forced: Optional[str] = None) -> str:
+        if risk >= self.block_threshold:
+            action = "BLOCK"
+        elif risk >= self.redact_threshold:
+            action = "REDACT"
+        else:
+            action = "ALLOW"
+        if forced is not None and _SEVERITY[forced] > _SEVERITY[action]:
+            return forced
+        return action
+
+    def is_decided(self, findings: list) -> bool:
+        return self.forced_action(findings) == "BLOCK" or self.score(findings) >= self.block_threshold
+
+
+def _fingerprint(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def _check_type(value, expected: type, what: str):
+    if not isinstance(value, expected) or isinstance(value, str):
+        raise PolicyError(f"{what} must be a {expected.__name__.lower()}, got {type(value).__name__}")
+
+
+def _is_finite_number(value) -> bool:
+    # NaN fails every comparison, so a NaN threshold would ALLOW everything
+    return isinstance(value, (int, float)) and math.isfinite(value)
+
+
+def _check_rules(rules: Mapping, where: str):
+    _check_type(rules, Mapping, where)
+    for field in ("match", "weights", "actions"):
+        if field in rules:
+            _check_type(rules[field], Mapping, f"{where}: {field}")
+    for subtype, weight in rules.get("weights", {}).items():
+        if not _is_finite_number(weight) or weight < 0:
+            # Negative weights would let later stages lower a BLOCK, breaking short-circuiting
+            raise PolicyError(f"{where}: weight of {subtype!r} must be a non-negative number, got {weight!r}")
+    for subtype, action in rules.get("actions", {}).items():
+        if action not in FORCED_ACTIONS:
+            raise PolicyError(f"{where}: action of {subtype!r} must be one of {FORCED_ACTIONS}, got {action!r}")
+    for threshold in ("redact_threshold", "block_threshold"):
+        if threshold in rules and not _is_finite_number(rules[threshold]):
+            raise PolicyError(f"{where}: {threshold} must be a finite number, got {rules[threshold]!r}")
+
+
+class PolicySet:
+    """
+    A compiled set of policies.
+
+    The spec is a mapping like::
+
+        {
+            "version": "2026-10",
+            "default": {"weights": {"PERSON": 0.5}, "block_threshold": 0.8},
+            "policies": [
+                {"name": "hipaa", "match": {"regime": "HIPAA"},
+                 "weights": {"DATE": 1.0}, "actions": {"SSN": "BLOCK"}},
+                {"name": "support", "match": {"role": "support", "classification": "public"},
+                 "weights": {"Email": 0.0}}
+            ]
+        }
+
+    Subtypes weigh 1.0 and the thresholds are 0.5 and 0.8 unless a rule
+    says otherwise. Every policy whose ``match`` (on ``role``,
+    ``classification`` and ``regime``) fits a request applies on top of
+    ``default``, less specific ones first and ties in file order, each
+    overriding the weights, actions and thresholds it names. ``actions``
+    force at least that action whenever the subtype is found.
+
+    Compilation resolves every combination of the scope values the
+    policies name, so ``resolve`` is three set lookups and a dict lookup.
+    """
+
+    def __init__(self, spec: Optional[Mapping] = None):
+        if spec is not None and not isinstance(spec, Mapping):
+            raise PolicyError(f"expected a mapping of policies, got {type(spec).__name__}")
+        spec = dict(spec or {})
+        _check_rules(spec.get("default", {}), "default")
+        _check_type(spec.get("policies", []), list, "policies")
+        for position, policy in enumerate(spec.get("policies", [])):
+            _check_type(policy, Mapping, f"policy {position}")
+            where = f"policy {policy.get('name', position)!r}"
+            _check_rules(policy, where)
+            unknown = set(policy.get("match", {})) - set(SCOPE_FIELDS)
+            if unknown:
+                raise PolicyError(f"{where}: cannot match on {sorted(unknown)}, only on {SCOPE_FIELDS}")
+
+        self.version = str(spec.get("version", ""))
+        self.default = dict(spec.get("default", {}))
+        self.policies: List[dict] = [dict(policy) for policy in spec.get("policies", [])]
+
+        self._values = [
+            {ANY} | {str(policy["match"][field]) for policy in self.policies if field in policy.get("match", {})}
+            for field in SCOPE_FIELDS
+        ]
+        self._table: Dict[ScopeKey, CompiledPolicy] = {
+            key: self._compile(key) for key in product(*self._values)
+        }
+
+    @classmethod
+    def from_file(cls, path: str) -> "PolicySet":
+        with open(path, encoding="utf-8") as f:
+            try:
+                spec = json.load(f)
+            except json.JSONDecodeError as exc:
+                raise PolicyError(f"{path}: {exc}") from exc
+        return cls(spec)
+
+    def _matching(self, key: ScopeKey) -> List[dict]:
+        scope = dict(zip(SCOPE_FIELDS, key))
+        matching = [
+            (len(policy.get("match", {})), position, policy)
+            for position, policy in enumerate(self.policies)
+            if all(scope[field] == str(value) for field, value in policy.get("match", {}).items())
+        ]
+        return [policy for _, _, policy in sorted(matching, key=lambda entry: entry[:2])]
+
+    def _compile(self, key: ScopeKey) -> CompiledPolicy:
+        weights: Dict[str, float] = {}
+        actions: Dict[str, str] = {}
+        thresholds = {"redact_threshold": REDACT_THRESHOLD, "block_threshold": BLOCK_THRESHOLD}
+        names = []
+        for rules in [self.default] + self._matching(key):
+            weights.update(rules.get("weights", {}))
+            actions.update(rules.get("actions", {}))
+            thresholds.update({name: rules[name] for name in thresholds if name in rules})
+            if "name" in rules:
+                names.append(str(rules["name"]))
+
+        # Weights of 1.0 are the default anyway; dropping them keeps the lookup and fingerprint minimal
+        weights = {subtype: float(weight) for subtype, weight in weights.items() if weight != 1.0}
+        thresholds = {name: float(value) for name, value in thresholds.items()}
+        name = "+".join(names) or "default"
+        if not 0 <= thresholds["redact_threshold"] <= thresholds["block_threshold"]:
+            raise PolicyError(
+                f"policy {name!r}: need 0 <= redact_threshold <= block_threshold, got "
+                f"{thresholds['redact_threshold']} and {thresholds['block_threshold']}"
+            )
+        return CompiledPolicy(
+            name=name,
+            version=self.version,
+            weights=weights,
+            actions=actions,
+            namespace=_fingerprint({"weights": weights, "actions": actions, **thresholds}),
+            **thresholds,
+        )
+
+    def resolve(self, scope: Optional[Mapping[str, str]] = None) -> CompiledPolicy:
+        """The policy for a request's ``role``, ``classification`` and ``regime``; missing ones match any."""
+        if not scope:
+            return self._table[(ANY, ANY, ANY)]
+        key = []
+        for field, values in zip(SCOPE_FIELDS, self._values):
+            value = scope.get(field)
+            key.append(value if value in values else ANY)
+        return self._table[tuple(key)]
+
+    def __len__(self) -> int:
+        return len(self.policies)
+
+
+class PolicyEngine:
+    """
+    Serves the current ``PolicySet``, reloading it when its file changes.
+
+    A background thread checks the file's mtime every ``check_interval``
+    seconds (never if it is 0; call ``reload`` instead), so ``resolve``
+    only reads the current set and compiling a large file never stalls a
+    request. A changed file is compiled in full before it replaces the
+    current set in one reference swap, so a request sees either the old
+    policies or the new ones, never a mix. A file that fails to compile is
+    logged and skipped until it changes again; the old set stays in force.
+    Write policy files atomically (write a temporary file, then rename it)
+    so a reload never reads half of one.
+    """
+
+    def __init__(
+        self,
+        policies: Optional[PolicySet] = None,
+        path: Optional[str] = None,
+        check_interval: float = 1.0
+    ):
+        self.path = path
+        self.check_interval = check_interval
+        self.reloads = 0
+        self.errors = 0
+        self._policies = policies or PolicySet()
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        if path is not None:
+            self._stamp = self._file_stamp()
+            self._policies = PolicySet.from_file(path)
+            self.watch()
+
+    @classmethod
+    def from_file(cls, path: str, check_interval: float = 1.0) -> "PolicyEngine":
+        return cls(path=path, check_interval=check_interval)
+
+    @property
+    def policies(self) -> PolicySet:
+        return self._policies
+
+    def _file_stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def reload(self, force: bool = False) -> bool:
+        """Recompile the policy file if it changed (or ``force``); return whether the set was replaced."""
+        if self.path is None:
+            return False
+        with self._lock:
+            stamp = self._file_stamp()
+            if stamp is None or (stamp == self._stamp and not force):
+                return False
+            self._stamp = stamp
+            try:
+                policies = PolicySet.from_file(self.path)
+            except (OSError, PolicyError) as exc:
+                self.errors += 1
+                logger.error("Keeping the current policies, %s failed to load: %s", self.path, exc)
+                return False
+            self._policies = policies
+            self.reloads += 1
+        logger.info("Reloaded %d policies from %s (version %r)", len(policies), self.path, policies.version)
+        return True
+
+    def watch(self):
+        """
+        Start the watcher thread unless it is running or not needed.
+
+        Threads do not survive ``fork``, so forked workers call this again
+        to watch the file themselves.
+        """
+        if self.path is None or self.check_interval <= 0 or self._stopped.is_set():
+            return
+        if self._watcher is not None:
+            if self._watcher.is_alive():
+                return
+            # Forked while the parent's watcher may have held the lock
+            self._lock = threading.Lock()
+        self._watcher = threading.Thread(target=self._watch, name="anonyme-policy-watcher", daemon=True)
+        self._watcher.start()
+
+    def _watch(self):
+        while not self._stopped.wait(self.check_interval):
+            try:
+                self.reload()
+            except Exception:
+                # Keep watching; the current set stays in force
+                self.errors += 1
+                logger.exception("Keeping the current policies, reloading %s failed", self.path)
+
+    def resolve(self, scope: Optional[Mapping[str, str]] = None) -> CompiledPolicy:
+        return self._policies.resolve(scope)
+
+    def close(self):
+        """Stop watching the policy file."""
+        self._stopped.set()
+        if self._watcher is not None:
+            self._watcher.join()
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "version": self._policies.version,
+            "policies": len(self._policies),
+            "reloads": self.reloads,
+            "errors": self.errors,
+        }
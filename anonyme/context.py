@@ -1,86 +1,170 @@
 import numpy as np
-from typing import List, Dict, Optional, Tuple
+from collections import deque
+from typing import Callable, Iterator, List, Dict, Optional, Tuple
 from dataclasses import dataclass
 from datetime import datetime
 
+from anonyme.embeddings import ModelRegistry, SharedEmbeddingModel, registry
 
-@dataclass
+
+SENSITIVE_TOPICS = {
+    "authentication": ["password", "login", "credentials", "auth"],
+    "pii": ["ssn", "social security", "driver license", "passport"],
+    "financial": ["credit card", "bank account", "salary", "payment"],
+    "medical": ["diagnosis", "medication", "health record", "patient"],
+    "confidential": ["secret", "confidential", "private", "classified"]
+}
+
+
+@dataclass(slots=True)
 class Message:
     role: str
     content: str
-    embedding: Optional[np.ndarray]
     timestamp: datetime
     findings: List
     risk_score: float
 
 
+class MessageHistory:
+    """
+    Fixed-capacity ring buffer of messages.
+
+    Embeddings live in one preallocated ``(capacity, dim)`` float32 block,
+    allocated on the first embedded append; appending past capacity
+    overwrites the oldest slot in O(1). Messages appended without an
+    embedding keep a zero row until ``fill_missing`` embeds them.
+    """
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+
+        self.capacity = capacity
+        self.embeddings: Optional[np.ndarray] = None
+        self._records: List[Optional[Message]] = [None] * capacity
+        self._embedded = [False] * capacity
+        self._start = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Message]:
+        return iter(self.recent(self._size))
+
+    def slots(self, count: Optional[int] = None) -> List[int]:
+        """Buffer slots of the newest ``count`` messages, oldest first."""
+        count = self._size if count is None else min(count, self._size)
+        first = self._start + self._size - count
+        return [(first + offset) % self.capacity for offset in range(count)]
+
+    def recent(self, count: int) -> List[Message]:
+        return [self._records[slot] for slot in self.slots(count)]
+
+    def embedded(self, slot: int) -> bool:
+        return self._embedded[slot]
+
+    def _set_embedding(self, slot: int, embedding: np.ndarray):
+        if self.embeddings is None:
+            self.embeddings = np.zeros((self.capacity, embedding.shape[-1]), dtype=np.float32)
+        self.embeddings[slot] = embedding
+        self._embedded[slot] = True
+
+    def fill_missing(self, slots: List[int], embed: Callable[[List[str]], np.ndarray]):
+        """Embed the messages in ``slots`` that were appended without an embedding."""
+        missing = [slot for slot in slots if not self._embedded[slot]]
+        if missing:
+            records = [self._records[slot] for slot in missing]
+            rows = embed([record.content for record in records])
+            for slot, record, row in zip(missing, records, rows):
+                # A turn recorded while a timed-out stage was still embedding may have taken the slot
+                if self._records[slot] is record:
+                    self._set_embedding(slot, row)
+
+    def append(self, message: Message, embedding: Optional[np.ndarray] = None):
+        if self._size < self.capacity:
+            slot = (self._start + self._size) % self.capacity
+            self._size += 1
+        else:
+            slot = self._start
+            self._start = (self._start + 1) % self.capacity
+
+        self._records[slot] = message
+        if embedding is not None:
+            self._set_embedding(slot, embedding)
+        else:
+            self._embedded[slot] = False
+            if self.embeddings is not None:
+                self.embeddings[slot] = 0.0
+
+    def clear(self):
+        self._records = [None] * self.capacity
+        self._embedded = [False] * self.capacity
+        self._start = 0
+        self._size = 0
+        if self.embeddings is not None:
+            self.embeddings.fill(0.0)
+
+
 class EmbeddingBasedContext:
-    def __init__(self, session_id: str, model_name: str = "all-MiniLM-L6-v2"):
+    def __init__(
+        self,
+        session_id: str,
+        model_name: str = "all-MiniLM-L6-v2",
+        model_registry: Optional[ModelRegistry] = None,
+        max_history: int = 20
+    ):
         self.session_id = session_id
         self.model_name = model_name
-        self.model = None
+        self.model_registry = model_registry or registry
+        self.shared_model: Optional[SharedEmbeddingModel] = None
         
-        self.messages: List[Message] = []
-        self.max_history = 20
+        # Embeddings are stored unit-length, ready for cosine scoring
+        self.messages = MessageHistory(max_history)
+        self.reference_window = 5
         
-        self.sensitive_topics = {
-            "authentication": ["password", "login", "credentials", "auth"],
-            "pii": ["ssn", "social security", "driver license", "passport"],
-            "financial": ["credit card", "bank account", "salary", "payment"],
-            "medical": ["diagnosis", "medication", "health record", "patient"],
-            "confidential": ["secret", "confidential", "private", "classified"]
-        }
+        self.sensitive_topics = {topic: list(keywords) for topic, keywords in SENSITIVE_TOPICS.items()}
         
-        self.topic_embeddings = {}
+        self.topic_names: List[str] = []
+        self.topic_matrix: Optional[np.ndarray] = None
         self.entity_memory = {}
-        self.risk_trend = []
+        self.risk_trend = deque(maxlen=10)
+    
+    @property
+    def max_history(self) -> int:
+        return self.messages.capacity
+    
+    @property
+    def model(self):
+        return self.shared_model.model if self.shared_model is not None else None
         
     def _load_model(self):
-        if self.model is None:
-            try:
-                from sentence_transformers import SentenceTransformer
-                self.model = SentenceTransformer(self.model_name)
-                self._precompute_topic_embeddings()
-            except ImportError:
-                raise RuntimeError(
-                    "sentence-transformers not installed. "
-                    "Install with: pip install sentence-transformers"
-                )
+        if self.shared_model is None:
+            self.shared_model = self.model_registry.get(self.model_name)
+        if self.topic_matrix is None:
+            self._precompute_topic_embeddings()
     
     def _precompute_topic_embeddings(self):
-        for topic, keywords in self.sensitive_topics.items():
-            topic_text = " ".join(keywords)
-            self.topic_embeddings[topic] = self.model.encode(topic_text)
+        self.topic_names, self.topic_matrix = self.shared_model.topic_matrix(self.sensitive_topics)
     
-    def _embed_text(self, text: str) -> np.ndarray:
+    def _embed_normalized(self, texts: List[str]) -> np.ndarray:
         self._load_model()
-        return self.model.encode(text)
-    
-    def _cosine_similarity(self, vec1: np.ndarray, vec2: np.ndarray) -> float:
-        dot_product = np.dot(vec1, vec2)
-        norm_product = np.linalg.norm(vec1) * np.linalg.norm(vec2)
-        return dot_product / norm_product if norm_product > 0 else 0.0
+        return self.shared_model.encode_normalized(texts)
     
-    def add_message(self, role: str, content: str, findings: List, risk_score: float):
-        embedding = self._embed_text(content)
+    def add_message(self, role: str, content: str, findings: List, risk_score: float, embed: bool = True):
+        # Unembedded turns are embedded later, if they ever fall in a reference window
+        embedding = self._embed_normalized([content])[0] if embed else None
         
         message = Message(
             role=role,
             content=content,
-            embedding=embedding,
             timestamp=datetime.now(),
             findings=findings,
             risk_score=risk_score
         )
         
-        self.messages.append(message)
-        
-        if len(self.messages) > self.max_history:
-            self.messages.pop(0)
-        
+        self.messages.append(message, embedding)
         self.risk_trend.append(risk_score)
-        if len(self.risk_trend) > 10:
-            self.risk_trend.pop(0)
         
         self._update_entity_memory(findings)
     
@@ -96,35 +180,42 @@ class EmbeddingBasedContext:
             self.entity_memory[entity_key]["count"] += 1
             self.entity_memory[entity_key]["last_seen"] = datetime.now()
     
-    def detect_topic_context(self, current_text: str) -> Dict[str, float]:
-        current_embedding = self._embed_text(current_text)
+    def detect_topic_context_many(self, texts: List[str]) -> List[Dict[str, float]]:
+        current = self._embed_normalized(texts)
+        scores = current @ self.topic_matrix.T
         
-        topic_scores = {}
-        for topic, topic_embedding in self.topic_embeddings.items():
-            similarity = self._cosine_similarity(current_embedding, topic_embedding)
-            topic_scores[topic] = similarity
-        
-        return topic_scores
+        return [dict(zip(self.topic_names, row.tolist())) for row in scores]
     
-    def find_reference_chain(self, current_text: str, threshold: float = 0.7) -> List[Tuple[Message, float]]:
+    def detect_topic_context(self, current_text: str) -> Dict[str, float]:
+        return self.detect_topic_context_many([current_text])[0]
+    
+    def find_reference_chain_many(
+        self, texts: List[str], threshold: float = 0.7
+    ) -> List[List[Tuple[Message, float]]]:
         if not self.messages:
-            return []
-        
-        current_embedding = self._embed_text(current_text)
-        references = []
+            return [[] for _ in texts]
         
-        for msg in reversed(self.messages[-5:]):
-            if msg.embedding is not None:
-                similarity = self._cosine_similarity(current_embedding, msg.embedding)
-                if similarity > threshold:
-                    references.append((msg, similarity))
+        slots = self.messages.slots(self.reference_window)
+        self.messages.fill_missing(slots, self._embed_normalized)
+        recent = self.messages.recent(self.reference_window)
+        scores = self._embed_normalized(texts) @ self.messages.embeddings[slots].T
         
-        return references
+        chains = []
+        for row in scores:
+            chains.append([
+                (msg, similarity)
+                for msg, similarity in zip(reversed(recent), reversed(row.tolist()))
+                if similarity > threshold
+            ])
+        return chains
+    
+    def find_reference_chain(self, current_text: str, threshold: float = 0.7) -> List[Tuple[Message, float]]:
+        return self.find_reference_chain_many([current_text], threshold)[0]
     
     def detect_entity_coreference(self, current_findings: List) -> bool:
         current_types = {f.subtype for f in current_findings}
         
-        for msg in reversed(self.messages[-3:]):
+        for msg in reversed(self.messages.recent(3)):
             past_types = {f.subtype for f in msg.findings}
             
             if "PERSON" in past_types and "Email" in current_types:
@@ -138,7 +229,8 @@ class EmbeddingBasedContext:
         
         return False
     
-    def calculate_context_risk_modifier(self, current_text: str, current_findings: List) -> Tuple[float, List[str]]:
+    def embedding_risk_modifier(self, current_text: str) -> Tuple[float, List[str]]:
+        """Risk from topic similarity and references to earlier turns; needs the embedding model."""
         modifier = 0.0
         reasons = []
         
@@ -156,12 +248,19 @@ class EmbeddingBasedContext:
             modifier += 0.15 * len(references)
             reasons.append(f"References to {len(references)} previous message(s)")
         
+        return modifier, reasons
+    
+    def findings_risk_modifier(self, current_findings: List) -> Tuple[float, List[str]]:
+        """Risk from entities and the risk trend of earlier turns."""
+        modifier = 0.0
+        reasons = []
+        
         if self.detect_entity_coreference(current_findings):
             modifier += 0.3
             reasons.append("Entity coreference detected (asking about previously mentioned entity)")
         
         if len(self.risk_trend) >= 3:
-            recent_avg = np.mean(self.risk_trend[-3:])
+            recent_avg = np.mean(list(self.risk_trend)[-3:])
             if recent_avg > 0.5:
                 modifier += 0.25
                 reasons.append(f"Escalating risk pattern (avg: {recent_avg:.2f})")
@@ -173,6 +272,11 @@ class EmbeddingBasedContext:
         
         return modifier, reasons
     
+    def calculate_context_risk_modifier(self, current_text: str, current_findings: List) -> Tuple[float, List[str]]:
+        embedding_modifier, embedding_reasons = self.embedding_risk_modifier(current_text)
+        findings_modifier, findings_reasons = self.findings_risk_modifier(current_findings)
+        return embedding_modifier + findings_modifier, embedding_reasons + findings_reasons
+    
     def get_conversation_summary(self) -> Dict:
         return {
             "session_id": self.session_id,
@@ -1,15 +1,63 @@
-def decide(findings: list, context: dict):
-    risk = sum(f.confidence for f in findings)
+from typing import List, Mapping, Optional
 
-    if risk >= 0.8:
-        action = "BLOCK"
-    elif risk >= 0.5:
-        action = "REDACT"
-    else:
-        action = "ALLOW"
+from anonyme.config.policies import CompiledPolicy, PolicyEngine
+
+
+# Resolves the policy for each request; see anonyme.config.policies
+policy_engine = PolicyEngine()
+
+def set_policy_engine(engine: PolicyEngine) -> PolicyEngine:
+    """Install the engine ``decide`` resolves policies from and return the previous one."""
+    global policy_engine
+    previous, policy_engine = policy_engine, engine
+    return previous
+
+
+def resolve_policy(scope: Optional[Mapping[str, str]] = None) -> CompiledPolicy:
+    """The active policy for a ``role``/``classification``/``regime`` scope."""
+    return policy_engine.resolve(scope)
+
+
+def is_decided(findings: list, policy: Optional[CompiledPolicy] = None) -> bool:
+    """
+    Whether ``findings`` already force BLOCK.
+
+    Later stages only add findings or a non-negative risk modifier, and
+    policy weights are non-negative, so once the score reaches the BLOCK
+    threshold the action can no longer change.
+    """
+    return (policy or resolve_policy()).is_decided(findings)
+
+
+def decide(
+    findings: list,
+    context: dict,
+    risk_modifier: float = 0.0,
+    modifier_reasons: Optional[List[str]] = None,
+    policy: Optional[CompiledPolicy] = None
+):
+    """
+    Score ``findings`` under a policy and pick an action.
+
+    Without an explicit ``policy``, a ``context`` mapping with ``role``,
+    ``classification`` or ``regime`` keys selects one from the active
+    engine; anything else gets the default policy.
+    """
+    if policy is None:
+        policy = resolve_policy(context if isinstance(context, Mapping) else None)
+
+    risk = policy.score(findings) + risk_modifier
+    forced = policy.forced_action(findings)
+    action = policy.action_for(risk, forced)
+
+    reasons = [f"{f.subtype} via {f.source}" for f in findings]
+    if forced is not None and action == forced:
+        reasons.append(f"Policy {policy.name} requires {forced}")
+    if modifier_reasons:
+        reasons.extend(modifier_reasons)
 
     return {
         "action": action,
         "risk_score": risk,
-        "reasons": [f"{f.subtype} via {f.source}" for f in findings]
+        "reasons": reasons
     }
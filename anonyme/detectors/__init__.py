@@ -1,5 +1,18 @@
+from importlib import import_module
+
 from anonyme.detectors.base import Detector
 from anonyme.detectors.regex import RegexDetector
-from anonyme.detectors.ner import NerDetector
 
-__all__ = ["Detector", "RegexDetector", "NerDetector"]
\ No newline at end of file
+__all__ = ["Detector", "RegexDetector", "NerDetector", "BatchedDetector"]
+
+# Heavier detectors are imported on first access
+_LAZY = {
+    "NerDetector": "anonyme.detectors.ner",
+    "BatchedDetector": "anonyme.detectors.batched",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        return getattr(import_module(_LAZY[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,7 +1,11 @@
 from abc import ABC, abstractmethod
+from typing import Iterable, List
 
 
 class Detector(ABC):
     @abstractmethod
     def detect(self, text: str) -> list:
         pass
+
+    def detect_many(self, texts: Iterable[str]) -> List[list]:
+        return [self.detect(text) for text in texts]
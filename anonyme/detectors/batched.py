@@ -0,0 +1,39 @@
+import threading
+from typing import Iterable, List
+
+from anonyme.detectors.base import Detector
+from anonyme.scheduler import MicroBatchScheduler
+
+
+class BatchedDetector(Detector):
+    """
+    Route single-text ``detect`` calls through a micro-batching scheduler.
+
+    Concurrent callers share one ``detect_many`` call on the wrapped
+    detector, e.g. one ``nlp.pipe`` batch for ``NerDetector``. Direct
+    ``detect_many`` calls take the same lock as the scheduler's batches,
+    so the wrapped model never runs two batches at once.
+    """
+
+    def __init__(self, detector: Detector, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.detector = detector
+        self._lock = threading.Lock()
+        self.scheduler = MicroBatchScheduler(
+            self.detect_many,
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            name=f"anonyme-{type(detector).__name__}-batch"
+        )
+
+    def detect(self, text: str) -> list:
+        return self.scheduler(text)
+
+    async def detect_async(self, text: str) -> list:
+        return await self.scheduler.submit_async(text)
+
+    def detect_many(self, texts: Iterable[str], **kwargs) -> List[list]:
+        with self._lock:
+            return self.detector.detect_many(texts, **kwargs)
+
+    def close(self):
+        self.scheduler.stop()
@@ -1,28 +1,63 @@
-import spacy
+import time
+from typing import Iterable, List, Optional
 
 from anonyme.detectors.base import Detector
+from anonyme.metrics import metrics
 from anonyme.models.findings import Finding
 
 
 class NerDetector(Detector):
-    def __init__(self):
+    # Pipeline components that never feed doc.ents
+    NON_NER_COMPONENTS = [
+        "tagger", "parser", "senter", "morphologizer", "attribute_ruler", "lemmatizer"
+    ]
+
+    def __init__(
+        self,
+        batch_size: int = 64,
+        n_process: int = 1,
+        model_name: str = "en_core_web_sm",
+        ner_only: bool = True
+    ):
         self.model = None
+        self.model_name = model_name
+        self.ner_only = ner_only
         self.entity_types = ["PERSON", "ORG", "GPE", "DATE"]
+        self.batch_size = batch_size
+        self.n_process = n_process
     
     def _load_model(self):
         if self.model is None:
+            # spaCy takes most of a second to import, so only pay for it on first use
+            import spacy
+
+            exclude = self.NON_NER_COMPONENTS if self.ner_only else []
+            start = time.perf_counter()
             try:
-                self.model = spacy.load("en_core_web_sm")
+                model = spacy.load(self.model_name, exclude=exclude)
             except OSError:
                 raise RuntimeError(
-                    "spaCy model 'en_core_web_sm' not found. "
-                    "Install it with: python -m spacy download en_core_web_sm"
+                    f"spaCy model '{self.model_name}' not found. "
+                    f"Install it with: python -m spacy download {self.model_name}"
                 )
+            if self.ner_only:
+                self._prune_unused_tok2vec(model)
+            metrics.record_model_load(f"spacy/{self.model_name}", time.perf_counter() - start)
+            self.model = model
 
-    def detect(self, text: str) -> list:
+    def _prune_unused_tok2vec(self, model):
+        # The shared tok2vec layer only matters if a remaining component
+        # listens to it; small models give ner its own embedding layer.
+        if "tok2vec" in model.pipe_names:
+            if not model.get_pipe("tok2vec").listening_components:
+                model.remove_pipe("tok2vec")
+
+    @property
+    def active_components(self) -> List[str]:
         self._load_model()
-        
-        doc = self.model(text)
+        return list(self.model.pipe_names)
+
+    def _findings_from_doc(self, doc) -> list:
         findings = []
         
         for ent in doc.ents:
@@ -32,8 +67,31 @@ class NerDetector(Detector):
                         type="PII",
                         subtype=ent.label_,
                         confidence=0.9,
-                        source="ner"
+                        source="ner",
+                        start=ent.start_char,
+                        end=ent.end_char,
+                        text=ent.text
                     )
                 )
         
-        return findings
\ No newline at end of file
+        return findings
+
+    def detect(self, text: str) -> list:
+        self._load_model()
+        
+        return self._findings_from_doc(self.model(text))
+
+    def detect_many(
+        self,
+        texts: Iterable[str],
+        batch_size: Optional[int] = None,
+        n_process: Optional[int] = None
+    ) -> List[list]:
+        self._load_model()
+        
+        docs = self.model.pipe(
+            texts,
+            batch_size=batch_size or self.batch_size,
+            n_process=n_process or self.n_process
+        )
+        return [self._findings_from_doc(doc) for doc in docs]
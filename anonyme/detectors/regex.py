@@ -5,6 +5,8 @@ from anonyme.models.findings import Finding
 
 
 class RegexDetector(Detector):
+    API_KEY = "API Key or Token"
+
     def __init__(self):
         self.patterns = {
             "SSN": r"\b\d{3}-\d{2}-\d{4}\b",
@@ -12,52 +14,105 @@ class RegexDetector(Detector):
             "Email": r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b",
             "Phone": r"(?:\+\d{1,3}\s?)?\(?\d{1,4}\)?[-.\s]?\d{1,4}[-.\s]?\d{1,4}[-.\s]?\d{0,4}",
         }
-        
+
         self.api_key_pattern = r"\b[A-Za-z0-9_\-]{20,}\b"
 
+        # Characters every match of a pattern starts with. Leading with a
+        # lookahead on them lets ``re`` jump between candidate positions
+        # instead of trying the whole pattern at every character.
+        first_chars = {
+            "SSN": r"\d",
+            "Credit Card": r"\d",
+            "Email": r"[A-Za-z0-9._%+-]",
+            "Phone": r"[+(\d]",
+            self.API_KEY: r"[A-Za-z0-9_\-]",
+        }
+        sources = dict(self.patterns, **{self.API_KEY: self.api_key_pattern})
+        self._scanners = {
+            name: re.compile(f"(?={first_chars[name]}){source}") for name, source in sources.items()
+        }
+        self._digit = re.compile(r"\d")
+
+    def _skipped(self, text: str) -> set:
+        """Patterns that cannot match ``text``, found with checks far cheaper than a scan."""
+        skipped = set()
+        if self._digit.search(text) is None:
+            skipped.update(("SSN", "Credit Card", "Phone"))
+        elif "-" not in text:
+            skipped.add("SSN")
+        if "@" not in text:
+            skipped.add("Email")
+        # A key is a run of 20 non-space characters, so some whitespace-separated token is that long
+        if max(map(len, text.split()), default=0) < 20:
+            skipped.add(self.API_KEY)
+        return skipped
+
+    def scan(self, text: str) -> dict:
+        """
+        Find the matches of every pattern in ``text``.
+
+        Returns a mapping of pattern name to the ``(start, end)`` spans that
+        ``re.finditer`` would yield for that pattern on its own.
+        """
+        skipped = self._skipped(text)
+        return {
+            name: [] if name in skipped else [match.span() for match in scanner.finditer(text)]
+            for name, scanner in self._scanners.items()
+        }
+
     def _looks_like_api_key(self, text: str) -> bool:
         if len(text) < 20:
             return False
-        
+
         has_upper = any(c.isupper() for c in text)
         has_lower = any(c.islower() for c in text)
         has_digit = any(c.isdigit() for c in text)
         has_special = any(c in "_-" for c in text)
-        
+
         char_variety = sum([has_upper, has_lower, has_digit, has_special])
-        
+
         digit_ratio = sum(c.isdigit() for c in text) / len(text)
         upper_ratio = sum(c.isupper() for c in text) / len(text)
-        
+
         if char_variety >= 2 and (digit_ratio > 0.2 or upper_ratio > 0.3):
             return True
-        
+
         return False
 
     def detect(self, text: str) -> list:
         findings = []
-        
-        for name, pattern in self.patterns.items():
-            if re.search(pattern, text):
+        spans = self.scan(text)
+
+        # One finding per subtype however often it matches, so repeats do not add up in the risk score
+        for name in self.patterns:
+            if spans[name]:
+                start, end = spans[name][0]
                 findings.append(
                     Finding(
                         type="PII",
                         subtype=name,
                         confidence=1.0,
-                        source="regex"
+                        source="regex",
+                        start=start,
+                        end=end,
+                        text=text[start:end],
+                        spans=tuple(spans[name])
                     )
                 )
-        
-        potential_keys = re.findall(self.api_key_pattern, text)
-        for key in potential_keys:
-            if self._looks_like_api_key(key):
+
+        for start, end in spans[self.API_KEY]:
+            candidate = text[start:end]
+            if self._looks_like_api_key(candidate):
                 findings.append(
                     Finding(
                         type="SECRET",
-                        subtype="API Key or Token",
+                        subtype=self.API_KEY,
                         confidence=0.8,
-                        source="regex"
+                        source="regex",
+                        start=start,
+                        end=end,
+                        text=candidate
                     )
                 )
-        
-        return findings
\ No newline at end of file
+
+        return findings
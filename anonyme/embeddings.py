@@ -0,0 +1,158 @@
+import time
+import hashlib
+import threading
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from anonyme.cache import LRUCache
+from anonyme.metrics import metrics
+
+
+def load_embedding_model(model_name: str):
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        raise RuntimeError(
+            "sentence-transformers not installed. "
+            "Install with: pip install sentence-transformers"
+        )
+    return SentenceTransformer(model_name)
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    """Scale each row to unit length so dot products are cosine similarities."""
+    matrix = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    # Zero vectors stay zero and score 0.0 against everything
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+class EmbeddingCache:
+    """
+    Memoize ``model.encode`` for one embedding model.
+
+    Entries are keyed by a hash of the text and bounded by ``max_size``.
+    Cached vectors are read-only because every caller shares them.
+    """
+
+    def __init__(self, model, max_size: int = 4096):
+        self.model = model
+        self.hits = 0
+        self.misses = 0
+        self._entries = LRUCache(max_size=max_size)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+
+    def encode(self, text: str) -> np.ndarray:
+        key = self.key(text)
+        embedding = self._entries.get(key)
+        if embedding is not None:
+            with self._lock:
+                self.hits += 1
+            metrics.count_cache("embedding", True)
+            return embedding
+
+        embedding = np.asarray(self.model.encode(text))
+        embedding.setflags(write=False)
+        self._entries.set(key, embedding)
+        with self._lock:
+            self.misses += 1
+        metrics.count_cache("embedding", False)
+        return embedding
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self),
+        }
+
+
+class SharedEmbeddingModel:
+    """An embedding model loaded once per process, with its text cache and topic vectors."""
+
+    def __init__(self, model_name: str, model, cache_size: int = 4096):
+        self.model_name = model_name
+        self.model = model
+        self.cache = EmbeddingCache(model, max_size=cache_size)
+        self._topics: Dict[tuple, Tuple[List[str], np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    def encode(self, text: str) -> np.ndarray:
+        return self.cache.encode(text)
+
+    def encode_normalized(self, texts: List[str]) -> np.ndarray:
+        return normalize_rows([self.encode(text) for text in texts])
+
+    def topic_matrix(self, topics: Dict[str, List[str]]) -> Tuple[List[str], np.ndarray]:
+        """
+        Return topic names and their unit-length keyword embeddings, one row each.
+
+        Computed once for every session that uses the same topic set.
+        """
+        key = tuple((topic, tuple(keywords)) for topic, keywords in topics.items())
+        entry = self._topics.get(key)
+        if entry is None:
+            with self._lock:
+                entry = self._topics.get(key)
+                if entry is None:
+                    names = list(topics)
+                    matrix = self.encode_normalized([" ".join(topics[name]) for name in names])
+                    matrix.setflags(write=False)
+                    entry = (names, matrix)
+                    self._topics[key] = entry
+        return entry
+
+
+class ModelRegistry:
+    """
+    Load each embedding model at most once per process.
+
+    ``get`` loads lazily and is safe to call from many threads; ``register``
+    installs an already loaded model, e.g. one preloaded by a service.
+    """
+
+    def __init__(self, loader: Callable[[str], object] = load_embedding_model, cache_size: int = 4096):
+        self.loader = loader
+        self.cache_size = cache_size
+        self._models: Dict[str, SharedEmbeddingModel] = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_name: str) -> SharedEmbeddingModel:
+        shared = self._models.get(model_name)
+        if shared is None:
+            with self._lock:
+                shared = self._models.get(model_name)
+                if shared is None:
+                    start = time.perf_counter()
+                    model = self.loader(model_name)
+                    metrics.record_model_load(f"embedding/{model_name}", time.perf_counter() - start)
+                    shared = SharedEmbeddingModel(model_name, model, cache_size=self.cache_size)
+                    self._models[model_name] = shared
+        return shared
+
+    def register(self, model_name: str, model) -> SharedEmbeddingModel:
+        with self._lock:
+            shared = SharedEmbeddingModel(model_name, model, cache_size=self.cache_size)
+            self._models[model_name] = shared
+            return shared
+
+    def loaded(self) -> List[str]:
+        return list(self._models)
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+
+registry = ModelRegistry()
+
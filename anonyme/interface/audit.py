@@ -0,0 +1,92 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+from typing import List, Optional
+
+from anonyme.logging.decisions import SQLiteAuditStore
+
+
+_RELATIVE = re.compile(r"^(\d+(?:\.\d+)?)([smhdw])$")
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def parse_time(value: str, now: Optional[float] = None) -> float:
+    """Unix timestamp for an ISO date/time or a span ago such as ``30m``, ``24h`` or ``7d``."""
+    match = _RELATIVE.match(value.strip())
+    if match:
+        now = time.time() if now is None else now
+        return now - float(match.group(1)) * _UNITS[match.group(2)]
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected an ISO date or a span like 7d, got {value!r}")
+
+
+def format_row(record) -> str:
+    when = datetime.fromtimestamp(record.timestamp).isoformat(sep=" ", timespec="seconds")
+    subtypes = ",".join(record.subtypes) or "-"
+    return (
+        f"{when}  {record.action:<6}  {record.risk_score:5.2f}  "
+        f"{record.session_id or '-':<20}  {subtypes:<30}  {record.prompt_hash.hex()}"
+    )
+
+
+def parse_arguments(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        prog='anonyme --audit',
+        description='Query the decision audit store',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  anonyme --audit --db audit.db --action BLOCK --subtype SSN --since 7d
+  anonyme --audit --db audit.db --session chat-42 --json
+  anonyme --audit --db audit.db --since 2026-10-01 --until 2026-10-08 --count
+        """
+    )
+    parser.add_argument('--db', default=os.environ.get('ANONYME_AUDIT_DB'), help='Audit database (default: $ANONYME_AUDIT_DB)')
+    parser.add_argument('--action', choices=['ALLOW', 'REDACT', 'BLOCK'], help='Only decisions with this action')
+    parser.add_argument('--subtype', help='Only decisions with a finding of this subtype, e.g. SSN or PERSON')
+    parser.add_argument('--since', type=parse_time, help='Start of the time range: ISO date/time or a span ago like 24h or 7d')
+    parser.add_argument('--until', type=parse_time, help='End of the time range (exclusive), same formats as --since')
+    parser.add_argument('--session', help='Only decisions for this session id')
+    parser.add_argument('--prompt', help='Only decisions for this exact prompt, matched by hash')
+    parser.add_argument('--limit', type=int, default=100, help='Most recent decisions to show, 0 for all (default: 100)')
+    parser.add_argument('--count', action='store_true', help='Print only the number of matching decisions')
+    parser.add_argument('-j', '--json', action='store_true', help='One JSON object per decision')
+    args = parser.parse_args(argv)
+    if not args.db:
+        parser.error('give --db or set ANONYME_AUDIT_DB')
+    if not os.path.exists(args.db):
+        parser.error(f'no audit database at {args.db}')
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_arguments(argv)
+    hash_key = os.environ.get('ANONYME_AUDIT_KEY')
+    store = SQLiteAuditStore(args.db, hash_key=hash_key.encode('utf-8') if hash_key else None)
+    filters = {
+        "action": args.action,
+        "subtype": args.subtype,
+        "since": args.since,
+        "until": args.until,
+        "session_id": args.session,
+        "prompt": args.prompt,
+    }
+    try:
+        if args.count:
+            print(store.count(**filters))
+            return 0
+        for record in store.query(limit=args.limit or None, **filters):
+            print(json.dumps(record.to_dict()) if args.json else format_row(record))
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
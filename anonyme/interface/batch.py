@@ -0,0 +1,243 @@
+import gc
+import os
+import sys
+import json
+import argparse
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import partial
+from typing import IO, Dict, Iterable, List, Optional, Tuple
+
+from anonyme.interface.cli import _chunks, add_policy_arguments, analyze_chunk, policy_scope, read_records
+from anonyme.interface.reader import MappedFile, close_spans, read_spans, shard_range
+from anonyme.logging.audit import LoggerManager
+from anonyme.metrics import metrics
+from anonyme.prefilter import Prefilter
+
+
+def _init_worker():
+    # The parent's policy watcher thread does not survive the fork
+    from anonyme import decision
+    decision.policy_engine.watch()
+    # Workers map the input themselves; their mappings go when the pool shuts down with the scan
+    close_spans()
+
+
+def analyze_spans(path: str, fmt: str, spans: List[Tuple[int, int]], **options) -> List[Dict]:
+    """Decode and analyze one chunk of line spans; runs in the worker that owns the chunk."""
+    return analyze_chunk(read_spans(path, fmt, spans), **options)
+
+
+class BatchScanner:
+    """
+    Scan JSONL records with every core.
+
+    ``preload`` loads the models in the parent; the worker processes are
+    then forked, so they share the model memory copy-on-write instead of
+    each loading their own. The parent reads the input in chunks of
+    ``batch_size`` records and hands them to the workers, keeping at most
+    ``max_pending`` chunks per worker in flight. Output uses the CLI's
+    result schema. Every line carries the record's input ``line`` and
+    ``id``, and lines are written in input order unless ``ordered`` is
+    False.
+
+    ``scan_file`` memory-maps its input instead: the parent only finds line
+    boundaries and hands byte spans to the workers, which decode just the
+    fields analysis needs.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        batch_size: int = 64,
+        ordered: bool = True,
+        max_pending: int = 2,
+        short_circuit: bool = False,
+        prefilter: Optional[Prefilter] = None,
+        profile: str = "full",
+        timings: bool = False,
+        scope: Optional[Dict[str, str]] = None
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.ordered = ordered
+        self.max_pending = max_pending
+        self.short_circuit = short_circuit
+        self.prefilter = prefilter
+        self.profile = profile
+        self.timings = timings
+        self.scope = scope
+
+        self.written = 0
+        self.errors = 0
+
+    def preload(self):
+        # Records are analyzed without sessions, so NER is the only model
+        if self.profile == "fast":
+            return
+        from anonyme import analyze
+        analyze.ner_detector._load_model()
+
+    def _merge_timings(self, items: List[Dict]):
+        # Workers keep their own metrics; fold their per-record timings into ours
+        for item in items:
+            stage_ms = item.get("metadata", {}).get("stage_ms")
+            if stage_ms:
+                for part in stage_ms.split(","):
+                    stage, _, ms = part.partition("=")
+                    metrics.observe(stage, float(ms) / 1000)
+
+    def _write(self, output: IO[str], items: List[Dict], merge_timings: bool = False):
+        if merge_timings:
+            self._merge_timings(items)
+        for item in items:
+            output.write(json.dumps(item) + "\n")
+            self.written += 1
+            self.errors += "error" in item
+        output.flush()
+
+    def _options(self) -> Dict:
+        return {
+            "batch_size": self.batch_size,
+            "short_circuit": self.short_circuit,
+            "prefilter": self.prefilter,
+            "profile": self.profile,
+            "timings": self.timings,
+            "scope": self.scope,
+        }
+
+    def scan(self, lines: Iterable[str], output: IO[str]) -> Tuple[int, int]:
+        """Analyze every record in ``lines`` and return ``(written, errors)``."""
+        chunks = _chunks(read_records(lines), self.batch_size)
+        return self._run(chunks, partial(analyze_chunk, **self._options()), output)
+
+    def scan_file(
+        self,
+        path: str,
+        output: IO[str],
+        fmt: str = "jsonl",
+        shard: Optional[Tuple[int, int]] = None
+    ) -> Tuple[int, int]:
+        """
+        Analyze a JSONL or text file through a memory map.
+
+        ``shard=(index, count)`` restricts the scan to that share of the
+        file's bytes, so ``count`` independent processes can split one file.
+        The mappings the scan opens are closed when it ends.
+        """
+        try:
+            with MappedFile(path, fmt=fmt) as mapped:
+                if shard is not None:
+                    mapped.start, mapped.end = shard_range(mapped.size, *shard)
+                chunks = _chunks(mapped.spans(), self.batch_size)
+                return self._run(chunks, partial(analyze_spans, path, fmt, **self._options()), output)
+        finally:
+            # An inline scan decodes its chunks through read_spans in this process
+            close_spans()
+
+    def _run(self, chunks, work, output: IO[str]) -> Tuple[int, int]:
+        self.preload()
+
+        if self.workers <= 1:
+            for chunk in chunks:
+                self._write(output, work(chunk))
+            return self.written, self.errors
+
+        # Objects that survive to the fork are never scanned by the
+        # children's GC, so their pages stay shared
+        gc.freeze()
+        try:
+            with ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_init_worker
+            ) as executor:
+                self._drain(executor, work, chunks, output)
+        finally:
+            gc.unfreeze()
+
+        return self.written, self.errors
+
+    def _drain(self, executor, work, chunks, output: IO[str]):
+        limit = self.workers * self.max_pending
+        pending = []
+        for chunk in chunks:
+            pending.append(executor.submit(work, chunk))
+            if len(pending) >= limit:
+                pending = self._collect(pending, output)
+        while pending:
+            pending = self._collect(pending, output)
+
+    def _collect(self, pending: list, output: IO[str]) -> list:
+        if self.ordered:
+            self._write(output, pending[0].result(), self.timings)
+            return pending[1:]
+
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            self._write(output, future.result(), self.timings)
+        return [future for future in pending if future not in done]
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description='Anonyme batch scanner - analyze a JSONL corpus on every core',
+    )
+    parser.add_argument('input', help='JSONL records ({"prompt": ..., "context": [...], "id": ...}), or - for stdin')
+    parser.add_argument('--format', choices=['jsonl', 'text'], default='jsonl', help='Input format; text means one prompt per line (files only)')
+    parser.add_argument('--shard', help='Scan only shard INDEX/COUNT of the file, e.g. 0/8 (files only)')
+    parser.add_argument('-o', '--output', default='-', help='Result JSONL, one line per record (default: stdout)')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(), help='Worker processes (default: all cores)')
+    parser.add_argument('--batch-size', type=int, default=256, help='Records per chunk handed to a worker (default: 256)')
+    parser.add_argument('--unordered', action='store_true', help='Write chunks as they finish instead of in input order')
+    parser.add_argument('--short-circuit', action='store_true', help='Skip later detectors once regex findings force BLOCK')
+    parser.add_argument('--prefilter', action='store_true', help='Skip NER for prompts with no capitals, digits, @ or date words')
+    parser.add_argument('--profile', choices=['full', 'fast'], default='full', help='Detector profile; fast runs regex only and never loads a model')
+    parser.add_argument('--stats', action='store_true', help='Add per-stage timings to each result and print a Prometheus-style metrics snapshot to stderr')
+    add_policy_arguments(parser)
+    args = parser.parse_args()
+    if args.input == '-' and (args.shard or args.format != 'jsonl'):
+        parser.error('--shard and --format need a file input')
+    if args.shard:
+        try:
+            index, count = (int(part) for part in args.shard.split('/'))
+        except ValueError:
+            parser.error('--shard must look like INDEX/COUNT')
+        args.shard = (index, count)
+    return args
+
+
+def main():
+    args = parse_arguments()
+    LoggerManager.set_console_stream(sys.stderr)
+
+    scanner = BatchScanner(
+        workers=args.workers,
+        batch_size=args.batch_size,
+        ordered=not args.unordered,
+        short_circuit=args.short_circuit,
+        prefilter=Prefilter() if args.prefilter else None,
+        profile=args.profile,
+        timings=args.stats,
+        # Forked workers inherit the policy engine and restart its watcher
+        scope=policy_scope(args)
+    )
+
+    target = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    try:
+        if args.input == '-':
+            written, errors = scanner.scan(sys.stdin, target)
+        else:
+            written, errors = scanner.scan_file(args.input, target, fmt=args.format, shard=args.shard)
+    finally:
+        if target is not sys.stdout:
+            target.close()
+
+    print(f"Analyzed {written} record(s), {errors} error(s)", file=sys.stderr)
+    if args.stats:
+        print(metrics.render(), file=sys.stderr, end="")
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,14 @@
 import sys
 import json
 import argparse
-from typing import List, Dict
+from contextlib import ExitStack
+from itertools import islice
+from typing import IO, TYPE_CHECKING, Iterable, Iterator, List, Dict, Optional, Tuple
 
-from anonyme.analyze import analyze
+from anonyme.logging.audit import LoggerManager
+
+if TYPE_CHECKING:
+    from anonyme.prefilter import Prefilter
 
 
 __version__ = "1.0.0"
@@ -64,6 +69,9 @@ def print_result(result, verbose: bool = False):
     else:
         print("Findings:    " + CLIFormatter.colorize("No issues detected", 'ALLOW'))
     
+    if result.redacted_prompt is not None:
+        print(f"Redacted:    {result.redacted_prompt}")
+    
     if verbose and result.metadata:
         print("Metadata:")
         for key, value in result.metadata.items():
@@ -72,6 +80,19 @@ def print_result(result, verbose: bool = False):
     print("-" * 60)
 
 
+def format_result(prompt: str, result) -> Dict:
+    item = {
+        "prompt": prompt,
+        "action": result.action,
+        "risk_score": result.risk_score,
+        "reasons": result.reasons,
+        "metadata": result.metadata
+    }
+    if result.redacted_prompt is not None:
+        item["redacted_prompt"] = result.redacted_prompt
+    return item
+
+
 def format_json_output(prompts: List[str], results: List) -> str:
     output = {
         "version": __version__,
@@ -80,17 +101,182 @@ def format_json_output(prompts: List[str], results: List) -> str:
     }
     
     for prompt, result in zip(prompts, results):
-        output["results"].append({
-            "prompt": prompt,
-            "action": result.action,
-            "risk_score": result.risk_score,
-            "reasons": result.reasons,
-            "metadata": result.metadata
-        })
+        output["results"].append(format_result(prompt, result))
     
     return json.dumps(output, indent=2)
 
 
+def read_records(lines: Iterable[str]) -> Iterator[Dict]:
+    """
+    Parse JSONL records lazily, one per non-blank line.
+    
+    Each record needs a ``prompt`` and may carry ``context`` and ``id``.
+    Malformed lines come back as ``{"line": n, "error": ...}``.
+    """
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict) or not isinstance(record.get("prompt"), str):
+                raise ValueError("record must be an object with a string 'prompt'")
+        except ValueError as e:
+            yield {"line": number, "error": str(e)}
+            continue
+        record["line"] = number
+        yield record
+
+
+def _chunks(records: Iterator[Dict], size: int) -> Iterator[List[Dict]]:
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _record_output(record: Dict, result=None, error: Optional[str] = None) -> Dict:
+    # Records are tagged with their input line, or byte offset for mapped input
+    item = {key: record[key] for key in ("line", "offset", "id") if key in record}
+    if error is not None:
+        item["error"] = error
+    else:
+        item.update(format_result(record["prompt"], result))
+    return item
+
+
+def analyze_chunk(
+    chunk: List[Dict],
+    batch_size: int = 64,
+    short_circuit: bool = False,
+    prefilter: Optional["Prefilter"] = None,
+    profile: str = "full",
+    timings: bool = False,
+    scope: Optional[Dict[str, str]] = None
+) -> List[Dict]:
+    """Analyze one chunk of records and return their output lines, in order."""
+    from anonyme.analyze import analyze, analyze_many
+    
+    valid = [record for record in chunk if "prompt" in record]
+    results = {}
+    try:
+        batch = analyze_many(
+            [record["prompt"] for record in valid],
+            [record.get("context") or [] for record in valid],
+            batch_size=batch_size,
+            short_circuit=short_circuit,
+            prefilter=prefilter,
+            profile=profile,
+            timings=timings,
+            scope=scope
+        )
+        results = {id(record): (result, None) for record, result in zip(valid, batch)}
+    except Exception:
+        # Fall back to one call per record so errors are reported per record
+        for record in valid:
+            try:
+                result = analyze(
+                    record["prompt"], record.get("context") or [],
+                    short_circuit=short_circuit, prefilter=prefilter, profile=profile, timings=timings,
+                    scope=scope
+                )
+                results[id(record)] = (result, None)
+            except Exception as e:
+                results[id(record)] = (None, str(e))
+    
+    output = []
+    for record in chunk:
+        if "prompt" not in record:
+            output.append(_record_output(record, error=record["error"]))
+        else:
+            output.append(_record_output(record, *results[id(record)]))
+    return output
+
+
+def stream_jsonl(
+    lines: Iterable[str],
+    output: IO[str],
+    batch_size: int = 64,
+    workers: int = 1,
+    short_circuit: bool = False,
+    prefilter: Optional["Prefilter"] = None,
+    profile: str = "full",
+    timings: bool = False,
+    scope: Optional[Dict[str, str]] = None
+) -> Tuple[int, int]:
+    """
+    Analyze JSONL records and write one JSON line per record, in input order.
+    
+    Records are read and analyzed ``batch_size`` at a time, so memory stays
+    bounded however long the input is. With ``workers`` > 1, chunks are
+    analyzed by forked worker processes (see ``BatchScanner``).
+    Returns the number of records written and how many of them were errors.
+    """
+    from anonyme.interface.batch import BatchScanner
+    
+    scanner = BatchScanner(
+        workers=workers,
+        batch_size=batch_size,
+        short_circuit=short_circuit,
+        prefilter=prefilter,
+        profile=profile,
+        timings=timings,
+        scope=scope
+    )
+    return scanner.scan(lines, output)
+
+
+def add_policy_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--policy', help='JSON decision policies, reloaded when the file changes (see anonyme.config.policies)')
+    parser.add_argument('--role', help='Requesting user role, selects the decision policy')
+    parser.add_argument('--classification', help='Data classification, selects the decision policy')
+    parser.add_argument('--regime', help='Compliance regime such as GDPR or HIPAA, selects the decision policy')
+
+
+def policy_scope(args) -> Optional[Dict[str, str]]:
+    """Install the ``--policy`` file, if any, and return the scope the flags select."""
+    if args.policy:
+        from anonyme.config.policies import PolicyEngine
+        from anonyme.decision import set_policy_engine
+        set_policy_engine(PolicyEngine.from_file(args.policy))
+    scope = {field: getattr(args, field) for field in ("role", "classification", "regime") if getattr(args, field)}
+    return scope or None
+
+
+def print_stats():
+    from anonyme.metrics import metrics
+    print(metrics.render(), file=sys.stderr, end="")
+
+
+def run_stream(args) -> int:
+    # Keep stdout for result lines only; loggers are created when anonyme.analyze is imported
+    LoggerManager.set_console_stream(sys.stderr)
+    from anonyme.prefilter import Prefilter
+    prefilter = Prefilter() if args.prefilter else None
+    scope = policy_scope(args)
+    
+    # Closes the input too when the output cannot be opened
+    with ExitStack() as files:
+        source = sys.stdin if args.input == '-' else files.enter_context(open(args.input, encoding='utf-8'))
+        target = sys.stdout if args.output == '-' else files.enter_context(open(args.output, 'w', encoding='utf-8'))
+        written, errors = stream_jsonl(
+            source,
+            target,
+            batch_size=args.batch_size,
+            workers=args.workers,
+            short_circuit=args.short_circuit,
+            prefilter=prefilter,
+            profile=args.profile,
+            timings=args.stats,
+            scope=scope
+        )
+    
+    print(f"Analyzed {written} record(s), {errors} error(s)", file=sys.stderr)
+    if args.stats:
+        print_stats()
+    return 1 if errors else 0
+
+
 def parse_arguments():
     parser = argparse.ArgumentParser(
         description='DataAnonymizator - Analyze prompts for security and privacy risks',
@@ -100,36 +286,94 @@ Examples:
   python -m anonyme.interface.cli "What is Alice's SSN?"
   python -m anonyme.interface.cli "Hello" "Test prompt" --verbose
   python -m anonyme.interface.cli "Check this" --json
+  python -m anonyme.interface.cli "Call 555-123-4567" --profile fast
+  python -m anonyme.interface.cli --input prompts.jsonl --output results.jsonl --workers 4
+  cat prompts.jsonl | python -m anonyme.interface.cli --input -
+  python -m anonyme.interface.cli --audit --db audit.db --action BLOCK --subtype SSN --since 7d
         """
     )
     
-    parser.add_argument('prompts', nargs='+', help='One or more prompts to analyze')
+    parser.add_argument('prompts', nargs='*', help='One or more prompts to analyze')
+    parser.add_argument('-i', '--input', help='Stream JSONL records ({"prompt": ..., "context": [...], "id": ...}) from a file, or - for stdin')
+    parser.add_argument('-o', '--output', default='-', help='Where --input results go, one JSON line per record (default: stdout)')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes for --input (default: 1)')
     parser.add_argument('-v', '--verbose', action='store_true', help='Enable verbose output')
     parser.add_argument('-j', '--json', action='store_true', help='Output in JSON format')
+    parser.add_argument('--batch-size', type=int, default=64, help='Prompts per NER batch (default: 64)')
+    parser.add_argument('--n-process', type=int, default=1, help='spaCy worker processes for batching prompt arguments; --input uses --workers (default: 1)')
+    parser.add_argument('--short-circuit', action='store_true', help='Skip later detectors once regex findings force BLOCK')
+    parser.add_argument('--prefilter', action='store_true', help='Skip NER for prompts with no capitals, digits, @ or date words')
+    parser.add_argument('--profile', choices=['full', 'fast'], default='full', help='Detector profile; fast runs regex only and never loads a model (default: full)')
+    parser.add_argument('--stats', action='store_true', help='Add per-stage timings to each result and print a Prometheus-style metrics snapshot to stderr')
+    add_policy_arguments(parser)
+    parser.add_argument('--audit', nargs=argparse.REMAINDER, metavar='ARGS', help='Query the decision audit store instead; every later argument goes to it (see --audit --help)')
     parser.add_argument('--version', action='version', version=f'DataAnonymizator CLI v{__version__}')
     
-    return parser.parse_args()
+    args = parser.parse_args()
+    if not args.prompts and not args.input and args.audit is None:
+        parser.error('give prompts or --input')
+    if args.input and args.n_process != 1:
+        # Each --workers process runs its own NER, so a spaCy pool would nest inside it
+        parser.error('--n-process does not apply to --input; use --workers')
+    return args
 
 
 def main():
     args = parse_arguments()
     
+    if args.audit is not None:
+        from anonyme.interface.audit import main as audit_main
+        sys.exit(audit_main(args.audit))
+    
+    if args.input:
+        sys.exit(run_stream(args))
+    
+    from anonyme.analyze import analyze, analyze_many
+    from anonyme.prefilter import Prefilter
+    
     if not args.json:
         print_banner()
     
     context: List[Dict[str, str]] = []
+    prefilter = Prefilter() if args.prefilter else None
+    scope = policy_scope(args)
     results = []
     errors = []
     
     if not args.json:
         print(f"Analyzing {len(args.prompts)} prompt(s)\n")
     
+    batch_results = None
+    if len(args.prompts) > 1:
+        try:
+            batch_results = analyze_many(
+                args.prompts,
+                [context] * len(args.prompts),
+                batch_size=args.batch_size,
+                n_process=args.n_process,
+                short_circuit=args.short_circuit,
+                prefilter=prefilter,
+                profile=args.profile,
+                timings=args.stats,
+                scope=scope
+            )
+        except Exception:
+            # Fall back to one call per prompt so errors are reported per prompt
+            batch_results = None
+    
     for i, prompt in enumerate(args.prompts, 1):
         if not args.json:
             print(f"[{i}/{len(args.prompts)}] {CLIFormatter.COLORS['DIM']}{prompt}{CLIFormatter.COLORS['RESET']}")
         
         try:
-            result = analyze(prompt, context)
+            if batch_results is not None:
+                result = batch_results[i - 1]
+            else:
+                result = analyze(
+                    prompt, context,
+                    short_circuit=args.short_circuit, prefilter=prefilter, profile=args.profile,
+                    timings=args.stats, scope=scope
+                )
             results.append(result)
             
             if not args.json:
@@ -167,6 +411,8 @@ def main():
         print("=" * 60)
         print(f"{CLIFormatter.colorize('Analysis complete', 'ALLOW')}\n")
     
+    if args.stats:
+        print_stats()
     sys.exit(1 if errors else 0)
 
 
@@ -0,0 +1,228 @@
+import os
+import re
+import json
+import mmap
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Fields of an input record that analysis uses
+RECORD_FIELDS = frozenset({"prompt", "context", "id"})
+
+# Lines up to this size are decoded whole by the C parser, which beats
+# skipping fields in Python; longer ones only have RECORD_FIELDS decoded
+FULL_DECODE_LIMIT = 1 << 20
+
+_WS = re.compile(rb"[ \t\r\n]*")
+_STRUCTURE = re.compile(rb'[\[\]{}"]')
+_SCALAR = re.compile(rb"[^,}\]\s]+")
+
+_OPEN = frozenset(b"{[")
+_QUOTE = ord('"')
+_BACKSLASH = ord("\\")
+
+
+def _skip_ws(buf, pos: int, end: int) -> int:
+    return _WS.match(buf, pos, end).end()
+
+
+def _string_end(buf, pos: int, end: int) -> int:
+    """Return the offset just past the JSON string opening at ``pos``."""
+    search = pos + 1
+    while True:
+        # find() runs at memchr speed, far faster than a regex over long strings
+        quote = buf.find(b'"', search, end)
+        if quote == -1:
+            raise ValueError(f"unterminated string at byte {pos}")
+        backslash = quote - 1
+        while buf[backslash] == _BACKSLASH:
+            backslash -= 1
+        if (quote - backslash) % 2:
+            return quote + 1
+        search = quote + 1
+
+
+def _skip_value(buf, pos: int, end: int) -> int:
+    """Return the offset just past the JSON value at ``pos`` without decoding it."""
+    first = buf[pos]
+    if first == _QUOTE:
+        return _string_end(buf, pos, end)
+    if first in _OPEN:
+        depth = 0
+        while True:
+            token = _STRUCTURE.search(buf, pos, end)
+            if token is None:
+                raise ValueError(f"unterminated value at byte {pos}")
+            char = buf[token.start()]
+            if char == _QUOTE:
+                pos = _string_end(buf, token.start(), end)
+                continue
+            pos = token.end()
+            depth += 1 if char in _OPEN else -1
+            if depth == 0:
+                return pos
+    match = _SCALAR.match(buf, pos, end)
+    if match is None:
+        raise ValueError(f"invalid value at byte {pos}")
+    return match.end()
+
+
+def parse_fields(buf, start: int, end: int, fields: Iterable[str] = RECORD_FIELDS) -> Dict:
+    """
+    Decode only ``fields`` of the JSON object in ``buf[start:end]``.
+
+    ``buf`` can be any bytes-like object, including an mmap; values of other
+    keys are stepped over in place and never copied or decoded.
+    """
+    fields = frozenset(fields)
+    record = {}
+    pos = _skip_ws(buf, start, end)
+    if pos >= end or buf[pos] != ord("{"):
+        raise ValueError("record must be a JSON object")
+    pos = _skip_ws(buf, pos + 1, end)
+    if pos < end and buf[pos] == ord("}"):
+        return record
+
+    while True:
+        if buf[pos] != _QUOTE:
+            raise ValueError(f"expected a key at byte {pos}")
+        key_end = _string_end(buf, pos, end)
+        name = json.loads(buf[pos:key_end])
+        pos = _skip_ws(buf, key_end, end)
+        if pos >= end or buf[pos] != ord(":"):
+            raise ValueError(f"expected ':' at byte {pos}")
+        pos = _skip_ws(buf, pos + 1, end)
+        if pos >= end:
+            raise ValueError("truncated record")
+
+        value_end = _skip_value(buf, pos, end)
+        if name in fields:
+            record[name] = json.loads(buf[pos:value_end])
+
+        pos = _skip_ws(buf, value_end, end)
+        if pos < end and buf[pos] == ord(","):
+            pos = _skip_ws(buf, pos + 1, end)
+            continue
+        if pos < end and buf[pos] == ord("}"):
+            return record
+        raise ValueError(f"expected ',' or '}}' at byte {pos}")
+
+
+def shard_range(size: int, index: int, count: int) -> Tuple[int, int]:
+    """Byte range of shard ``index`` out of ``count`` equal shards of a ``size``-byte file."""
+    if not 0 <= index < count:
+        raise ValueError(f"shard index must be in [0, {count})")
+    return size * index // count, size * (index + 1) // count
+
+
+class MappedFile:
+    """
+    Memory-mapped JSONL or plain-text input, read lazily one line at a time.
+
+    A reader over ``[start, end)`` owns every line whose first byte falls in
+    that range, so readers over adjacent ranges (see ``shard_range``) cover
+    a file exactly once without coordinating. Records are tagged with the
+    byte offset of their line. Only ``RECORD_FIELDS`` are kept, and lines
+    longer than ``full_decode_limit`` bytes never have their other fields
+    decoded.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        start: int = 0,
+        end: Optional[int] = None,
+        fmt: str = "jsonl",
+        full_decode_limit: int = FULL_DECODE_LIMIT
+    ):
+        if fmt not in ("jsonl", "text"):
+            raise ValueError("fmt must be 'jsonl' or 'text'")
+
+        self.path = path
+        self.fmt = fmt
+        self.full_decode_limit = full_decode_limit
+        self.size = os.path.getsize(path)
+        self.start = start
+        self.end = self.size if end is None else min(end, self.size)
+
+        self._file = open(path, "rb")
+        # Empty files cannot be mapped
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def spans(self) -> Iterator[Tuple[int, int]]:
+        """``(start, end)`` byte offsets of the non-blank lines this reader owns."""
+        buf = self._map
+        if buf is None:
+            return
+
+        pos = self.start
+        if pos > 0 and buf[pos - 1] != ord("\n"):
+            # The line under way belongs to the previous range
+            newline = buf.find(b"\n", pos)
+            pos = self.size if newline == -1 else newline + 1
+
+        while pos < self.end:
+            newline = buf.find(b"\n", pos)
+            line_end = self.size if newline == -1 else newline
+            if _skip_ws(buf, pos, line_end) < line_end:
+                yield pos, line_end
+            pos = line_end + 1
+
+    def lines(self) -> Iterator[Tuple[int, memoryview]]:
+        """Zero-copy views of each owned line; release them before ``close``."""
+        view = memoryview(self._map) if self._map is not None else None
+        for start, end in self.spans():
+            yield start, view[start:end]
+
+    def record(self, start: int, end: int) -> Dict:
+        """Decode the record at ``[start, end)``; malformed ones carry an ``error``."""
+        buf = self._map
+        try:
+            if self.fmt == "text":
+                record = {"prompt": buf[start:end].decode("utf-8").rstrip("\r")}
+            else:
+                if end - start <= self.full_decode_limit:
+                    record = json.loads(buf[start:end])
+                    if not isinstance(record, dict):
+                        raise ValueError("record must be a JSON object")
+                    record = {key: record[key] for key in RECORD_FIELDS if key in record}
+                else:
+                    record = parse_fields(buf, start, end)
+                if not isinstance(record.get("prompt"), str):
+                    raise ValueError("record must be an object with a string 'prompt'")
+        except ValueError as e:
+            return {"offset": start, "error": str(e)}
+        record["offset"] = start
+        return record
+
+    def records(self) -> Iterator[Dict]:
+        for start, end in self.spans():
+            yield self.record(start, end)
+
+
+_open_files: Dict[Tuple[str, str], MappedFile] = {}
+
+
+def read_spans(path: str, fmt: str, spans: List[Tuple[int, int]]) -> List[Dict]:
+    """Decode ``spans`` of ``path``, reusing one mapping per process until ``close_spans``."""
+    mapped = _open_files.get((path, fmt))
+    if mapped is None:
+        mapped = _open_files[(path, fmt)] = MappedFile(path, fmt=fmt)
+    return [mapped.record(start, end) for start, end in spans]
+
+
+def close_spans():
+    """Close the mappings ``read_spans`` opened, so a rewritten file is mapped afresh."""
+    while _open_files:
+        _, mapped = _open_files.popitem()
+        mapped.close()
@@ -0,0 +1,489 @@
+import os
+import asyncio
+import weakref
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from functools import partial
+from typing import List, Dict, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import BaseModel
+
+from anonyme.analyze import (
+    CONTEXT_STAGE, FAST_PROFILE, NER_STAGE, AnalyzeResult, analyze_async, analyze_many, ner_detector,
+    set_audit_sink, set_ner_detector
+)
+from anonyme.cache import AnalysisCache, LRUCache
+from anonyme.config.policies import PolicyEngine
+from anonyme.decision import set_policy_engine
+from anonyme.embeddings import registry
+from anonyme.prefilter import Prefilter
+from anonyme.sessions import SessionManager, SQLiteSessionStore
+from anonyme.detectors.batched import BatchedDetector
+from anonyme.logging.audit import LoggerManager, get_logger
+from anonyme.logging.decisions import SQLiteAuditStore
+from anonyme.metrics import metrics
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class ServiceConfig:
+    host: str = "127.0.0.1"
+    port: int = 8000
+    workers: int = 1
+    max_concurrency: int = 4
+    max_pending: int = 64
+    batch_size: int = 64
+    ner_batch_wait_ms: float = 0.0
+    ner_batch_max: int = 32
+    cache_size: int = 0
+    cache_ttl: float = 0.0
+    enable_context: bool = True
+    embedding_model: str = "all-MiniLM-L6-v2"
+    session_ttl: float = 1800.0
+    max_sessions: int = 1000
+    session_memory_mb: float = 0.0
+    session_store: str = ""
+    ner_timeout: float = 0.0
+    context_timeout: float = 0.0
+    fail_policy: str = "open"
+    short_circuit: bool = False
+    prefilter: bool = False
+    profile: str = "full"
+    audit_queue: int = 0
+    audit_overflow: str = "drop"
+    audit_db: str = ""
+    policy_file: str = ""
+
+    ENV_PREFIX = "ANONYME_"
+    # "block" is left out: requests log on the event loop thread, which a full queue would stall
+    AUDIT_OVERFLOW_POLICIES = ("drop", "sample")
+
+    @classmethod
+    def from_env(cls) -> "ServiceConfig":
+        """Build a config from ``ANONYME_*`` variables, so every worker process agrees."""
+        env = os.environ
+        prefix = cls.ENV_PREFIX
+        defaults = cls()
+        return cls(
+            host=env.get(f"{prefix}HOST", defaults.host),
+            port=int(env.get(f"{prefix}PORT", defaults.port)),
+            workers=int(env.get(f"{prefix}WORKERS", defaults.workers)),
+            max_concurrency=int(env.get(f"{prefix}MAX_CONCURRENCY", defaults.max_concurrency)),
+            max_pending=int(env.get(f"{prefix}MAX_PENDING", defaults.max_pending)),
+            batch_size=int(env.get(f"{prefix}BATCH_SIZE", defaults.batch_size)),
+            ner_batch_wait_ms=float(env.get(f"{prefix}NER_BATCH_WAIT_MS", defaults.ner_batch_wait_ms)),
+            ner_batch_max=int(env.get(f"{prefix}NER_BATCH_MAX", defaults.ner_batch_max)),
+            cache_size=int(env.get(f"{prefix}CACHE_SIZE", defaults.cache_size)),
+            cache_ttl=float(env.get(f"{prefix}CACHE_TTL", defaults.cache_ttl)),
+            enable_context=env.get(f"{prefix}ENABLE_CONTEXT", "1") not in ("0", "false", "no"),
+            embedding_model=env.get(f"{prefix}EMBEDDING_MODEL", defaults.embedding_model),
+            session_ttl=float(env.get(f"{prefix}SESSION_TTL", defaults.session_ttl)),
+            max_sessions=int(env.get(f"{prefix}MAX_SESSIONS", defaults.max_sessions)),
+            session_memory_mb=float(env.get(f"{prefix}SESSION_MEMORY_MB", defaults.session_memory_mb)),
+            session_store=env.get(f"{prefix}SESSION_STORE", defaults.session_store),
+            ner_timeout=float(env.get(f"{prefix}NER_TIMEOUT", defaults.ner_timeout)),
+            context_timeout=float(env.get(f"{prefix}CONTEXT_TIMEOUT", defaults.context_timeout)),
+            fail_policy=env.get(f"{prefix}FAIL_POLICY", defaults.fail_policy),
+            short_circuit=env.get(f"{prefix}SHORT_CIRCUIT", "0") in ("1", "true", "yes"),
+            prefilter=env.get(f"{prefix}PREFILTER", "0") in ("1", "true", "yes"),
+            profile=env.get(f"{prefix}PROFILE", defaults.profile),
+            audit_queue=int(env.get(f"{prefix}AUDIT_QUEUE", defaults.audit_queue)),
+            audit_overflow=env.get(f"{prefix}AUDIT_OVERFLOW", defaults.audit_overflow),
+            audit_db=env.get(f"{prefix}AUDIT_DB", defaults.audit_db),
+            policy_file=env.get(f"{prefix}POLICY_FILE", defaults.policy_file),
+        )
+
+    def to_env(self) -> Dict[str, str]:
+        prefix = self.ENV_PREFIX
+        return {
+            f"{prefix}HOST": self.host,
+            f"{prefix}PORT": str(self.port),
+            f"{prefix}WORKERS": str(self.workers),
+            f"{prefix}MAX_CONCURRENCY": str(self.max_concurrency),
+            f"{prefix}MAX_PENDING": str(self.max_pending),
+            f"{prefix}BATCH_SIZE": str(self.batch_size),
+            f"{prefix}NER_BATCH_WAIT_MS": str(self.ner_batch_wait_ms),
+            f"{prefix}NER_BATCH_MAX": str(self.ner_batch_max),
+            f"{prefix}CACHE_SIZE": str(self.cache_size),
+            f"{prefix}CACHE_TTL": str(self.cache_ttl),
+            f"{prefix}ENABLE_CONTEXT": "1" if self.enable_context else "0",
+            f"{prefix}EMBEDDING_MODEL": self.embedding_model,
+            f"{prefix}SESSION_TTL": str(self.session_ttl),
+            f"{prefix}MAX_SESSIONS": str(self.max_sessions),
+            f"{prefix}SESSION_MEMORY_MB": str(self.session_memory_mb),
+            f"{prefix}SESSION_STORE": self.session_store,
+            f"{prefix}NER_TIMEOUT": str(self.ner_timeout),
+            f"{prefix}CONTEXT_TIMEOUT": str(self.context_timeout),
+            f"{prefix}FAIL_POLICY": self.fail_policy,
+            f"{prefix}SHORT_CIRCUIT": "1" if self.short_circuit else "0",
+            f"{prefix}PREFILTER": "1" if self.prefilter else "0",
+            f"{prefix}PROFILE": self.profile,
+            f"{prefix}AUDIT_QUEUE": str(self.audit_queue),
+            f"{prefix}AUDIT_OVERFLOW": self.audit_overflow,
+            f"{prefix}AUDIT_DB": self.audit_db,
+            f"{prefix}POLICY_FILE": self.policy_file,
+        }
+
+
+class PolicyScope(BaseModel):
+    # Select the decision policy; see anonyme.config.policies
+    role: Optional[str] = None
+    classification: Optional[str] = None
+    regime: Optional[str] = None
+
+    def scope(self) -> Dict[str, str]:
+        fields = {"role": self.role, "classification": self.classification, "regime": self.regime}
+        return {field: value for field, value in fields.items() if value is not None}
+
+
+class AnalyzeRequest(PolicyScope):
+    prompt: str
+    context: List[Dict[str, str]] = []
+    session_id: Optional[str] = None
+    # Per-stage milliseconds in metadata["stage_ms"]
+    timings: bool = False
+
+
+class BatchItem(BaseModel):
+    prompt: str
+    context: List[Dict[str, str]] = []
+
+
+class BatchAnalyzeRequest(PolicyScope):
+    items: List[BatchItem]
+    timings: bool = False
+
+
+class BatchAnalyzeResponse(BaseModel):
+    results: List[AnalyzeResult]
+
+
+class ServiceOverloaded(Exception):
+    pass
+
+
+class ConcurrencyLimiter:
+    """
+    Bound the requests being analyzed and the requests waiting for a slot.
+
+    Once both are full, new requests are rejected immediately instead of
+    queueing without limit.
+    """
+
+    def __init__(self, max_concurrency: int, max_pending: int):
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.in_flight = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    @asynccontextmanager
+    async def slot(self):
+        if self.in_flight >= self.max_concurrency + self.max_pending:
+            self.rejected += 1
+            raise ServiceOverloaded()
+
+        self.in_flight += 1
+        try:
+            async with self._semaphore:
+                yield
+        finally:
+            self.in_flight -= 1
+
+
+class AnalysisService:
+    """Holds the models and per-session state shared by every request in a worker."""
+
+    def __init__(self, config: ServiceConfig):
+        self.config = config
+        self.limiter = ConcurrencyLimiter(config.max_concurrency, config.max_pending)
+        self.executor = ThreadPoolExecutor(
+            # NER and context scoring of one request run side by side
+            max_workers=config.max_concurrency * 2,
+            thread_name_prefix="anonyme-analyze"
+        )
+        self.cache: Optional[AnalysisCache] = None
+        if config.cache_size > 0:
+            self.cache = AnalysisCache(LRUCache(config.cache_size, ttl=config.cache_ttl or None))
+        self.prefilter = Prefilter() if config.prefilter else None
+        self.policy_engine: Optional[PolicyEngine] = None
+        self.audit_store: Optional[SQLiteAuditStore] = None
+        self.batched_ner: Optional[BatchedDetector] = None
+        self._previous_ner = None
+        self.sessions = SessionManager(
+            model_name=config.embedding_model,
+            store=SQLiteSessionStore(config.session_store) if config.session_store else None,
+            idle_ttl=config.session_ttl or None,
+            max_sessions=config.max_sessions,
+            max_memory_bytes=int(config.session_memory_mb * 1024 * 1024) or None,
+        )
+        self.timeouts = {
+            stage: timeout
+            for stage, timeout in ((NER_STAGE, config.ner_timeout), (CONTEXT_STAGE, config.context_timeout))
+            if timeout > 0
+        }
+        # Locks live only while a turn holds or waits on them
+        self._session_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    @property
+    def uses_sessions(self) -> bool:
+        # The fast profile never embeds, so turns would add nothing but state
+        return self.config.enable_context and self.config.profile != FAST_PROFILE
+
+    def load_models(self):
+        if self.config.profile == FAST_PROFILE:
+            logger.info("Fast profile: regex only, no models to load")
+            return
+        logger.info("Loading detector models")
+        ner_detector._load_model()
+        if self.config.enable_context:
+            # Every session resolves the same shared model from the registry
+            registry.get(self.config.embedding_model)
+
+        if self.config.ner_batch_wait_ms > 0:
+            # Concurrent requests share one nlp.pipe call per batching window
+            self.batched_ner = BatchedDetector(
+                ner_detector,
+                max_batch_size=self.config.ner_batch_max,
+                max_wait_ms=self.config.ner_batch_wait_ms
+            )
+            self._previous_ner = set_ner_detector(self.batched_ner)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.batched_ner is not None:
+            set_ner_detector(self._previous_ner)
+            self.batched_ner.close()
+            self.batched_ner = None
+        self.sessions.close()
+
+    def _session_lock(self, session_id: str) -> asyncio.Lock:
+        lock = self._session_locks.get(session_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._session_locks[session_id] = lock
+        return lock
+
+    def _analyze(self, request: AnalyzeRequest, session=None):
+        return analyze_async(
+            request.prompt,
+            request.context,
+            session=session,
+            cache=self.cache,
+            executor=self.executor,
+            timeouts=self.timeouts,
+            fail_policy=self.config.fail_policy,
+            short_circuit=self.config.short_circuit,
+            prefilter=self.prefilter,
+            profile=self.config.profile,
+            timings=request.timings,
+            scope=request.scope()
+        )
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    async def analyze(self, request: AnalyzeRequest) -> AnalyzeResult:
+        async with self.limiter.slot():
+            if request.session_id is None or not self.uses_sessions:
+                return await self._analyze(request)
+
+            # Turns of one conversation must be applied in order
+            async with self._session_lock(request.session_id):
+                # Leased sessions are pinned in memory until the turn is recorded
+                session = await self._run(self.sessions.acquire, request.session_id)
+                try:
+                    return await self._analyze(request, session)
+                finally:
+                    await self._run(self.sessions.release, request.session_id)
+
+    async def analyze_batch(self, request: BatchAnalyzeRequest) -> List[AnalyzeResult]:
+        async with self.limiter.slot():
+            return await self._run(
+                analyze_many,
+                [item.prompt for item in request.items],
+                [item.context for item in request.items],
+                batch_size=self.config.batch_size,
+                cache=self.cache,
+                short_circuit=self.config.short_circuit,
+                prefilter=self.prefilter,
+                profile=self.config.profile,
+                timings=request.timings,
+                scope=request.scope()
+            )
+
+
+def create_app(config: Optional[ServiceConfig] = None) -> FastAPI:
+    config = config or ServiceConfig.from_env()
+    if config.audit_overflow not in ServiceConfig.AUDIT_OVERFLOW_POLICIES:
+        raise ValueError(f"audit_overflow must be one of {ServiceConfig.AUDIT_OVERFLOW_POLICIES}")
+    service = AnalysisService(config)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        if config.audit_queue > 0:
+            # Log records are written by a background thread, off the request path
+            LoggerManager.enable_async(capacity=config.audit_queue, overflow=config.audit_overflow)
+        audit_store, previous_sink = None, None
+        if config.audit_db:
+            # ANONYME_AUDIT_KEY stays out of the config so it is never echoed
+            hash_key = os.environ.get(f"{ServiceConfig.ENV_PREFIX}AUDIT_KEY")
+            audit_store = SQLiteAuditStore(config.audit_db, hash_key=hash_key.encode("utf-8") if hash_key else None)
+            service.audit_store = audit_store
+            previous_sink = set_audit_sink(audit_store)
+        previous_engine = None
+        if config.policy_file:
+            # Each worker watches the file and reloads it on its own
+            service.policy_engine = PolicyEngine.from_file(config.policy_file)
+            previous_engine = set_policy_engine(service.policy_engine)
+        service.load_models()
+        yield
+        service.shutdown()
+        if previous_engine is not None:
+            set_policy_engine(previous_engine)
+            service.policy_engine.close()
+        if audit_store is not None:
+            set_audit_sink(previous_sink)
+            audit_store.close()
+            service.audit_store = None
+        LoggerManager.disable_async()
+
+    app = FastAPI(title="Anonyme", lifespan=lifespan)
+    app.state.service = service
+
+    @app.exception_handler(ServiceOverloaded)
+    async def overloaded_handler(request: Request, exc: ServiceOverloaded):
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Too many requests in flight, retry later"},
+            headers={"Retry-After": "1"}
+        )
+
+    @app.get("/health")
+    async def health():
+        status = {"status": "ok", "profile": service.config.profile, "in_flight": service.limiter.in_flight}
+        if service.cache is not None:
+            status["cache"] = service.cache.stats()
+        if service.prefilter is not None:
+            status["prefilter"] = service.prefilter.stats()
+        if service.uses_sessions:
+            status["sessions"] = service.sessions.stats()
+        audit = LoggerManager.async_stats()
+        if audit is not None:
+            status["audit"] = audit
+        if service.audit_store is not None:
+            status["decisions"] = service.audit_store.stats()
+        if service.policy_engine is not None:
+            status["policies"] = service.policy_engine.stats()
+        return status
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def metrics_endpoint():
+        gauges = {"in_flight": service.limiter.in_flight}
+        if service.uses_sessions:
+            sessions = service.sessions.stats()
+            gauges["sessions_active"] = sessions["active"]
+            gauges["sessions_memory_bytes"] = sessions["memory_bytes"]
+        audit = LoggerManager.async_stats()
+        if audit is not None:
+            gauges["audit_queue_dropped"] = audit["dropped"]
+        if service.audit_store is not None:
+            gauges["decisions_dropped"] = service.audit_store.stats()["dropped"]
+        return PlainTextResponse(
+            metrics.render(gauges), media_type="text/plain; version=0.0.4; charset=utf-8"
+        )
+
+    @app.post("/analyze", response_model=AnalyzeResult)
+    async def analyze_endpoint(request: AnalyzeRequest):
+        return await service.analyze(request)
+
+    @app.post("/analyze/batch", response_model=BatchAnalyzeResponse)
+    async def analyze_batch_endpoint(request: BatchAnalyzeRequest):
+        return BatchAnalyzeResponse(results=await service.analyze_batch(request))
+
+    return app
+
+
+def parse_arguments() -> ServiceConfig:
+    defaults = ServiceConfig.from_env()
+    parser = argparse.ArgumentParser(description='Anonyme HTTP analysis service')
+    parser.add_argument('--host', default=defaults.host, help=f'Bind address (default: {defaults.host})')
+    parser.add_argument('--port', type=int, default=defaults.port, help=f'Bind port (default: {defaults.port})')
+    parser.add_argument('--workers', type=int, default=defaults.workers, help='Worker processes, each with its own models')
+    parser.add_argument('--max-concurrency', type=int, default=defaults.max_concurrency, help='Requests analyzed at once per worker')
+    parser.add_argument('--max-pending', type=int, default=defaults.max_pending, help='Requests queued per worker before returning 503')
+    parser.add_argument('--batch-size', type=int, default=defaults.batch_size, help='NER batch size for /analyze/batch')
+    parser.add_argument('--ner-batch-wait-ms', type=float, default=defaults.ner_batch_wait_ms, help='Micro-batch window for NER across requests, 0 disables')
+    parser.add_argument('--ner-batch-max', type=int, default=defaults.ner_batch_max, help='Maximum prompts per NER micro-batch')
+    parser.add_argument('--cache-size', type=int, default=defaults.cache_size, help='Cached analyses per worker, 0 disables')
+    parser.add_argument('--cache-ttl', type=float, default=defaults.cache_ttl, help='Seconds a cached analysis stays valid, 0 means no expiry')
+    parser.add_argument('--no-context', action='store_true', help='Disable embedding-based conversation context')
+    parser.add_argument('--session-ttl', type=float, default=defaults.session_ttl, help='Seconds before an idle session is evicted, 0 disables')
+    parser.add_argument('--max-sessions', type=int, default=defaults.max_sessions, help='Sessions kept in memory per worker')
+    parser.add_argument('--session-memory-mb', type=float, default=defaults.session_memory_mb, help='Memory budget for in-memory sessions, 0 disables')
+    parser.add_argument('--ner-timeout', type=float, default=defaults.ner_timeout, help='Seconds NER may take per request, 0 means no limit')
+    parser.add_argument('--context-timeout', type=float, default=defaults.context_timeout, help='Seconds context scoring may take per request, 0 means no limit')
+    parser.add_argument('--fail-policy', choices=['open', 'closed'], default=defaults.fail_policy, help='Allow (open) or block (closed) prompts when a stage times out or fails')
+    parser.add_argument('--short-circuit', action='store_true', help='Skip NER and context scoring once regex findings force BLOCK')
+    parser.add_argument('--prefilter', action='store_true', help='Skip NER and context scoring for prompts that cannot need them')
+    parser.add_argument('--profile', choices=['full', 'fast'], default=defaults.profile, help='Detector profile; fast runs regex only and never loads a model')
+    parser.add_argument('--audit-queue', type=int, default=defaults.audit_queue, help='Log records buffered for a background writer thread, 0 logs synchronously')
+    parser.add_argument('--audit-overflow', choices=ServiceConfig.AUDIT_OVERFLOW_POLICIES, default=defaults.audit_overflow, help='What to do with log records when the audit queue is full')
+    parser.add_argument('--audit-db', default=defaults.audit_db, help='SQLite file for structured decision records (prompt hashes only); query it with anonyme --audit')
+    parser.add_argument('--policy-file', default=defaults.policy_file, help='JSON decision policies, reloaded when the file changes; see anonyme.config.policies')
+    parser.add_argument('--session-store', default=defaults.session_store, help='SQLite file for evicted sessions; without it they are discarded')
+    args = parser.parse_args()
+
+    return ServiceConfig(
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        max_concurrency=args.max_concurrency,
+        max_pending=args.max_pending,
+        batch_size=args.batch_size,
+        ner_batch_wait_ms=args.ner_batch_wait_ms,
+        ner_batch_max=args.ner_batch_max,
+        cache_size=args.cache_size,
+        cache_ttl=args.cache_ttl,
+        enable_context=defaults.enable_context and not args.no_context,
+        embedding_model=defaults.embedding_model,
+        session_ttl=args.session_ttl,
+        max_sessions=args.max_sessions,
+        session_memory_mb=args.session_memory_mb,
+        session_store=args.session_store,
+        ner_timeout=args.ner_timeout,
+        context_timeout=args.context_timeout,
+        fail_policy=args.fail_policy,
+        short_circuit=defaults.short_circuit or args.short_circuit,
+        prefilter=defaults.prefilter or args.prefilter,
+        profile=args.profile,
+        audit_queue=args.audit_queue,
+        audit_overflow=args.audit_overflow,
+        audit_db=args.audit_db,
+        policy_file=args.policy_file,
+    )
+
+
+def main():
+    import uvicorn
+
+    config = parse_arguments()
+    os.environ.update(config.to_env())
+
+    uvicorn.run(
+        "anonyme.interface.service:create_app",
+        factory=True,
+        host=config.host,
+        port=config.port,
+        workers=config.workers,
+    )
+
+
+if __name__ == "__main__":
+    main()
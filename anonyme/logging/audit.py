@@ -2,16 +2,194 @@
 
 import os
 import sys
+import time
 import logging
-from typing import Optional
+import threading
+from collections import deque
+from typing import Dict, List, Optional
 import colorlog
-from logging.handlers import RotatingFileHandler
+from logging.handlers import BaseRotatingHandler, RotatingFileHandler
+
+
+class QueueAuditHandler(logging.Handler):
+    """
+    Hand log records to a background thread instead of writing them inline.
+
+    ``emit`` only appends to a bounded in-memory queue; a writer thread
+    drains it in batches of up to ``batch_size`` records, formats them,
+    writes them to ``handlers`` and flushes each handler once per batch.
+    Formatting, colorization and disk I/O thus stay off the caller's thread.
+    When the queue holds ``capacity`` records, ``overflow`` decides:
+
+    - ``"drop"``: discard the new record
+    - ``"block"``: wait up to ``block_timeout`` seconds for room (forever if
+      None), then discard it
+    - ``"sample"``: keep every ``sample_every``-th overflowing record by
+      evicting the oldest queued one, and discard the rest
+
+    Discarded and evicted records are counted in ``dropped``.
+    """
+
+    OVERFLOW_POLICIES = ("drop", "block", "sample")
+
+    def __init__(
+        self,
+        handlers: List[logging.Handler],
+        capacity: int = 10000,
+        overflow: str = "drop",
+        batch_size: int = 256,
+        sample_every: int = 10,
+        block_timeout: Optional[float] = None
+    ):
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {self.OVERFLOW_POLICIES}")
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        super().__init__()
+
+        self.handlers = list(handlers)
+        self.capacity = capacity
+        self.overflow = overflow
+        self.batch_size = batch_size
+        self.sample_every = sample_every
+        self.block_timeout = block_timeout
+
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self._overflowed = 0
+
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._busy = False
+        self._writer = threading.Thread(target=self._drain, name="anonyme-audit-writer", daemon=True)
+        self._writer.start()
+
+    def _prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Arguments may be mutated after the call returns, so render them now
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            record = self._prepare(record)
+        except Exception:
+            self.handleError(record)
+            return
+
+        with self._condition:
+            if self._stopping:
+                self.dropped += 1
+                return
+            if len(self._queue) >= self.capacity and not self._make_room():
+                self.dropped += 1
+                return
+            self._queue.append(record)
+            self.enqueued += 1
+            self._condition.notify_all()
+
+    def _make_room(self) -> bool:
+        """Apply the overflow policy to a full queue; the condition is held."""
+        if self.overflow == "block":
+            deadline = None if self.block_timeout is None else time.monotonic() + self.block_timeout
+            while len(self._queue) >= self.capacity and not self._stopping:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            return len(self._queue) < self.capacity
+
+        if self.overflow == "sample":
+            self._overflowed += 1
+            if self._overflowed % self.sample_every == 0:
+                self._queue.popleft()
+                self.dropped += 1
+                return True
+        return False
+
+    def _drain(self):
+        batch = []
+        while True:
+            with self._condition:
+                self.written += len(batch)
+                self._busy = False
+                # Wakes producers blocked on a full queue and callers of flush
+                self._condition.notify_all()
+                while not self._queue and not self._stopping:
+                    self._condition.wait()
+                if not self._queue:
+                    return
+                # Records that arrived while the last batch was written go out together
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                self._busy = True
+            for handler in self.handlers:
+                _write_batch(handler, batch)
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """Wait until every queued record is written; False if ``timeout`` passed first."""
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._queue and not self._busy, timeout)
+
+    def close(self):
+        """Write what is queued, stop the writer and close the wrapped handlers."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        self._writer.join()
+        for handler in self.handlers:
+            handler.close()
+        super().close()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "overflow": self.overflow,
+            "capacity": self.capacity,
+            "queued": len(self._queue),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+        }
+
+
+def _write_batch(handler: logging.Handler, records: List[logging.LogRecord]):
+    """Write ``records`` through ``handler`` with a single flush at the end."""
+    if not isinstance(handler, logging.StreamHandler):
+        for record in records:
+            handler.handle(record)
+        return
+
+    handler.acquire()
+    try:
+        for record in records:
+            if record.levelno < handler.level or not handler.filter(record):
+                continue
+            try:
+                if isinstance(handler, BaseRotatingHandler) and handler.shouldRollover(record):
+                    handler.doRollover()
+                if handler.stream is None:
+                    handler.stream = handler._open()
+                handler.stream.write(handler.format(record) + handler.terminator)
+            except Exception:
+                handler.handleError(record)
+        handler.flush()
+    finally:
+        handler.release()
 
 
 class LoggerManager:
     """Manages logger configuration and initialization."""
     
     _loggers = {}
+    _console_stream = None
+    # Set while async mode is on; the loggers' own handlers are parked meanwhile
+    _async_handler: Optional[QueueAuditHandler] = None
+    _parked: Dict[str, List[logging.Handler]] = {}
     
     DEFAULT_LOG_FORMAT = "%(log_color)s[%(levelname)s]%(reset)s - %(message)s"
     DEFAULT_FILE_FORMAT = "[%(levelname)s]: %(asctime)s - %(message)s"
@@ -73,6 +251,8 @@ class LoggerManager:
             logger.addHandler(file_handler)
             
             cls._loggers[name] = logger
+            if cls._async_handler is not None:
+                cls._park(name, logger)
             logger.info("Logger initialized successfully.")
             
             return logger
@@ -85,7 +265,7 @@ class LoggerManager:
     @classmethod
     def _create_console_handler(cls, log_level: int) -> colorlog.StreamHandler:
         """Create and configure console handler with colors."""
-        console_handler = colorlog.StreamHandler(stream=sys.stdout)
+        console_handler = colorlog.StreamHandler(stream=cls._console_stream or sys.stdout)
         console_handler.setFormatter(
             colorlog.ColoredFormatter(
                 fmt=cls.DEFAULT_LOG_FORMAT, 
@@ -119,9 +299,90 @@ class LoggerManager:
         file_handler.setLevel(log_level)
         return file_handler
     
+    @classmethod
+    def _park(cls, name: str, logger: logging.Logger):
+        cls._parked[name] = logger.handlers[:]
+        for handler in cls._parked[name]:
+            logger.removeHandler(handler)
+        logger.addHandler(cls._async_handler)
+    
+    @classmethod
+    def enable_async(
+        cls,
+        capacity: int = 10000,
+        overflow: str = "drop",
+        batch_size: int = 256,
+        sample_every: int = 10,
+        block_timeout: Optional[float] = None,
+        log_level: int = logging.INFO,
+        log_dir: str = "logs",
+        log_file: str = "running_logs.log",
+        max_file_size: int = 10 * 1024 * 1024,
+        backup_count: int = 5
+    ) -> QueueAuditHandler:
+        """
+        Route every logger, current and future, through one ``QueueAuditHandler``.
+        
+        The queue writes to a single console handler and a single rotating
+        file handler built from these arguments. The loggers' own handlers
+        come back with ``disable_async``. See ``QueueAuditHandler`` for the
+        overflow policies.
+        """
+        if cls._async_handler is not None:
+            return cls._async_handler
+        
+        targets = [cls._create_console_handler(log_level)]
+        try:
+            targets.append(cls._create_file_handler(
+                log_dir, log_file, log_level, max_file_size, backup_count
+            ))
+        except (OSError, PermissionError) as e:
+            logging.getLogger(__name__).warning("Audit queue writes to the console only: %s", e)
+        
+        cls._async_handler = QueueAuditHandler(
+            targets,
+            capacity=capacity,
+            overflow=overflow,
+            batch_size=batch_size,
+            sample_every=sample_every,
+            block_timeout=block_timeout
+        )
+        for name, logger in cls._loggers.items():
+            cls._park(name, logger)
+        return cls._async_handler
+    
+    @classmethod
+    def disable_async(cls):
+        """Write out the queue and give every logger its own handlers back."""
+        handler, cls._async_handler = cls._async_handler, None
+        if handler is None:
+            return
+        for name, logger in cls._loggers.items():
+            logger.removeHandler(handler)
+            for parked in cls._parked.pop(name, []):
+                logger.addHandler(parked)
+        handler.close()
+    
+    @classmethod
+    def async_stats(cls) -> Optional[Dict[str, int]]:
+        return cls._async_handler.stats() if cls._async_handler is not None else None
+    
+    @classmethod
+    def set_console_stream(cls, stream):
+        """Send console output of existing and future loggers to ``stream``."""
+        cls._console_stream = stream
+        handlers = [handler for logger in cls._loggers.values() for handler in logger.handlers]
+        handlers += [handler for parked in cls._parked.values() for handler in parked]
+        if cls._async_handler is not None:
+            handlers += cls._async_handler.handlers
+        for handler in handlers:
+            if isinstance(handler, logging.StreamHandler) and not isinstance(handler, logging.FileHandler):
+                handler.setStream(stream)
+    
     @classmethod
     def reset_loggers(cls):
         """Reset all cached loggers. Useful for testing."""
+        cls.disable_async()
         for logger in cls._loggers.values():
             for handler in logger.handlers[:]:
                 handler.close()
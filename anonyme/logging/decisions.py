@@ -0,0 +1,338 @@
+"""Structured, queryable audit trail of analysis decisions."""
+
+import hmac
+import time
+import sqlite3
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from anonyme.logging.audit import get_logger
+
+
+# Prompt hashes are truncated to this many bytes
+HASH_BYTES = 16
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS decisions ("
+    "id INTEGER PRIMARY KEY, ts REAL NOT NULL, session_id TEXT, action TEXT NOT NULL, "
+    "risk_score REAL NOT NULL, subtypes TEXT NOT NULL, prompt_hash BLOB NOT NULL)",
+    # One row per finding subtype of a decision, clustered by subtype
+    "CREATE TABLE IF NOT EXISTS decision_subtypes ("
+    "subtype TEXT NOT NULL, decision_id INTEGER NOT NULL, "
+    "PRIMARY KEY (subtype, decision_id)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS decisions_ts ON decisions (ts)",
+    "CREATE INDEX IF NOT EXISTS decisions_action_ts ON decisions (action, ts)",
+    "CREATE INDEX IF NOT EXISTS decisions_session_ts ON decisions (session_id, ts)",
+    "CREATE INDEX IF NOT EXISTS decisions_prompt_hash ON decisions (prompt_hash)",
+]
+
+
+def prompt_hash(prompt: str, key: Optional[bytes] = None) -> bytes:
+    """
+    Digest identifying a prompt without storing it.
+
+    With a secret ``key`` the digest is an HMAC, so short prompts cannot be
+    recovered by hashing guesses.
+    """
+    data = prompt.encode("utf-8")
+    if key:
+        return hmac.new(key, data, hashlib.sha256).digest()[:HASH_BYTES]
+    return hashlib.sha256(data).digest()[:HASH_BYTES]
+
+
+@dataclass
+class DecisionRecord:
+    timestamp: float
+    action: str
+    risk_score: float
+    prompt_hash: bytes
+    session_id: Optional[str] = None
+    subtypes: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return {
+            "timestamp": self.timestamp,
+            "session_id": self.session_id,
+            "action": self.action,
+            "risk_score": self.risk_score,
+            "subtypes": self.subtypes,
+            "prompt_hash": self.prompt_hash.hex(),
+        }
+
+
+class AuditSink(ABC):
+    """Receives one record per analysis decision."""
+
+    def __init__(self, hash_key: Optional[bytes] = None):
+        self.hash_key = hash_key
+
+    def record_result(self, prompt: str, result, session_id: Optional[str] = None):
+        self.record(DecisionRecord(
+            timestamp=time.time(),
+            action=result.action,
+            risk_score=result.risk_score,
+            prompt_hash=prompt_hash(prompt, self.hash_key),
+            session_id=session_id,
+            subtypes=list(result.subtypes),
+        ))
+
+    @abstractmethod
+    def record(self, record: DecisionRecord):
+        pass
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        return True
+
+    def close(self):
+        self.flush()
+
+
+class SQLiteAuditStore(AuditSink):
+    """
+    Decision records in SQLite, written in batches by a background thread.
+
+    ``record`` only appends to an in-memory queue, so callers, the event
+    loop included, never wait on disk I/O. A writer thread inserts the
+    queued records in one transaction once ``batch_size`` of them are
+    waiting or ``flush_interval`` seconds after the first one arrived,
+    whichever comes first. File databases use WAL so queries never block
+    writers. Decisions are indexed by time, action, session, finding
+    subtype and prompt hash.
+
+    At most ``capacity`` records wait in the queue. When it is full,
+    ``overflow`` decides as in ``QueueAuditHandler``: ``"drop"`` discards
+    the new record and ``"sample"`` keeps every ``sample_every``-th one by
+    evicting the oldest queued record. Waiting for room is not offered,
+    since ``record`` runs on the event loop. Lost records are counted in
+    ``dropped``.
+    """
+
+    OVERFLOW_POLICIES = ("drop", "sample")
+
+    def __init__(
+        self,
+        path: str = ":memory:",
+        batch_size: int = 256,
+        flush_interval: float = 1.0,
+        hash_key: Optional[bytes] = None,
+        capacity: int = 100000,
+        overflow: str = "drop",
+        sample_every: int = 10
+    ):
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {self.OVERFLOW_POLICIES}")
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        super().__init__(hash_key)
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.capacity = capacity
+        self.overflow = overflow
+        self.sample_every = sample_every
+
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self._overflowed = 0
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # Guards the connection; the queue has its own condition
+        self._lock = threading.Lock()
+        self._pending = deque()
+        self._first_at = 0.0
+        self._condition = threading.Condition()
+        self._flushing = False
+        self._stopping = False
+        self._busy = False
+
+        with self._lock, self._conn:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA busy_timeout=5000")
+            for statement in _SCHEMA:
+                self._conn.execute(statement)
+
+        self._writer = threading.Thread(target=self._drain, name="anonyme-decision-writer", daemon=True)
+        self._writer.start()
+
+    def record(self, record: DecisionRecord):
+        with self._condition:
+            if self._stopping:
+                self.dropped += 1
+                return
+            if len(self._pending) >= self.capacity and not self._make_room():
+                self.dropped += 1
+                return
+            self._pending.append(record)
+            self.recorded += 1
+            # The writer only needs waking to start the interval or to write a full batch
+            if len(self._pending) == 1:
+                self._first_at = time.monotonic()
+                self._condition.notify_all()
+            elif len(self._pending) == self.batch_size:
+                self._condition.notify_all()
+
+    def _make_room(self) -> bool:
+        """Apply the overflow policy to a full queue; the condition is held."""
+        if self.overflow == "sample":
+            self._overflowed += 1
+            if self._overflowed % self.sample_every == 0:
+                self._pending.popleft()
+                self.dropped += 1
+                return True
+        return False
+
+    def _due_in(self) -> Optional[float]:
+        """Seconds until the queued records are due (0 if now, None if none); the condition is held."""
+        if self._stopping or self._flushing or len(self._pending) >= self.batch_size:
+            return 0.0
+        if not self._pending:
+            return None
+        return max(0.0, self._first_at + self.flush_interval - time.monotonic())
+
+    def _drain(self):
+        while True:
+            with self._condition:
+                self._busy = False
+                # Wakes callers of flush
+                self._condition.notify_all()
+                due_in = self._due_in()
+                while due_in != 0.0:
+                    self._condition.wait(due_in)
+                    due_in = self._due_in()
+                self._flushing = False
+                if not self._pending:
+                    if self._stopping:
+                        return
+                    continue
+                batch = list(self._pending)
+                self._pending.clear()
+                self._busy = True
+            try:
+                self._write(batch)
+                with self._condition:
+                    self.written += len(batch)
+            except sqlite3.Error:
+                with self._condition:
+                    self.dropped += len(batch)
+                # Created on first use: ``anonyme --audit`` imports this module and keeps stdout clean
+                get_logger(__name__).exception(
+                    "Dropped %d decision records, writing to %s failed", len(batch), self.path
+                )
+
+    def _write(self, batch: List[DecisionRecord]):
+        with self._lock, self._conn:
+            for record in batch:
+                cursor = self._conn.execute(
+                    "INSERT INTO decisions (ts, session_id, action, risk_score, subtypes, prompt_hash) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (record.timestamp, record.session_id, record.action, record.risk_score,
+                     ",".join(record.subtypes), record.prompt_hash)
+                )
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO decision_subtypes VALUES (?, ?)",
+                    [(subtype, cursor.lastrowid) for subtype in record.subtypes]
+                )
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """Write every queued record now; False if ``timeout`` passed first."""
+        with self._condition:
+            if self._pending:
+                self._flushing = True
+                self._condition.notify_all()
+            return self._condition.wait_for(lambda: not self._pending and not self._busy, timeout)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "overflow": self.overflow,
+            "capacity": self.capacity,
+            "queued": len(self._pending),
+            "recorded": self.recorded,
+            "written": self.written,
+            "dropped": self.dropped,
+        }
+
+    def _where(
+        self,
+        action: Optional[str],
+        subtype: Optional[str],
+        since: Optional[float],
+        until: Optional[float],
+        session_id: Optional[str],
+        prompt: Optional[str]
+    ):
+        clauses, params = [], []
+        if action is not None:
+            clauses.append("action = ?")
+            params.append(action)
+        if subtype is not None:
+            clauses.append("id IN (SELECT decision_id FROM decision_subtypes WHERE subtype = ?)")
+            params.append(subtype)
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(until)
+        if session_id is not None:
+            clauses.append("session_id = ?")
+            params.append(session_id)
+        if prompt is not None:
+            clauses.append("prompt_hash = ?")
+            params.append(prompt_hash(prompt, self.hash_key))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query(
+        self,
+        action: Optional[str] = None,
+        subtype: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        session_id: Optional[str] = None,
+        prompt: Optional[str] = None,
+        limit: Optional[int] = 100
+    ) -> List[DecisionRecord]:
+        """Matching decisions, newest first; ``since``/``until`` are Unix timestamps."""
+        self.flush()
+        where, params = self._where(action, subtype, since, until, session_id, prompt)
+        sql = (
+            "SELECT ts, action, risk_score, prompt_hash, session_id, subtypes FROM decisions"
+            + where + " ORDER BY ts DESC"
+        )
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [
+            DecisionRecord(ts, action, risk, bytes(digest), session, subtypes.split(",") if subtypes else [])
+            for ts, action, risk, digest, session, subtypes in rows
+        ]
+
+    def count(
+        self,
+        action: Optional[str] = None,
+        subtype: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        session_id: Optional[str] = None,
+        prompt: Optional[str] = None
+    ) -> int:
+        self.flush()
+        where, params = self._where(action, subtype, since, until, session_id, prompt)
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM decisions" + where, params).fetchone()[0]
+
+    def close(self):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        self._writer.join()
+        with self._lock:
+            self._conn.close()
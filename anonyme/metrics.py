@@ -0,0 +1,238 @@
+"""In-process latency, cache and model-load metrics with a Prometheus text export."""
+
+import time
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+
+# Upper bounds in seconds, from the fast regex path up to a cold model
+LATENCY_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram, as Prometheus expects it."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        # One slot per bucket plus +Inf
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float, count: int = 1):
+        self.counts[bisect_left(self.buckets, value)] += count
+        self.sum += value * count
+        self.count += count
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        total, rows = 0, []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            rows.append(("+Inf" if bound == float("inf") else repr(bound), total))
+        return rows
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the ``q`` quantile; 0.0 when empty."""
+        if not self.count:
+            return 0.0
+        rank, running = q * self.count, 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            running += count
+            if running >= rank:
+                return bound
+        return float("inf")
+
+
+class StageTimer:
+    """
+    Timings of one analysis, stage by stage.
+
+    Stages are added to the process-wide histograms of ``metrics`` in one
+    go by ``finish``; ``as_metadata`` renders the per-call view for
+    ``AnalyzeResult.metadata``.
+    """
+
+    __slots__ = ("metrics", "stages", "_started", "_finished", "_lock")
+
+    def __init__(self, metrics: "Metrics"):
+        self.metrics = metrics
+        self.stages: Dict[str, float] = {}
+        self._started = time.perf_counter()
+        self._finished = False
+        # Stages abandoned on timeout add themselves from their worker threads, even after finish
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+            finished = self._finished
+        if finished:
+            # A stage abandoned on timeout still took this long
+            self.metrics.observe(stage, seconds)
+
+    def since(self, stage: str, start: float) -> float:
+        """Record ``stage`` as running from ``start`` until now; return now."""
+        now = time.perf_counter()
+        self.add(stage, now - start)
+        return now
+
+    def finish(self, action: Optional[str] = None) -> float:
+        total = time.perf_counter() - self._started
+        with self._lock:
+            self.stages["total"] = total
+            self._finished = True
+            stages = dict(self.stages)
+        self.metrics.record_call(stages, action)
+        return total
+
+    def as_metadata(self) -> str:
+        with self._lock:
+            stages = list(self.stages.items())
+        return ",".join(f"{stage}={seconds * 1000:.3f}" for stage, seconds in stages)
+
+
+class Metrics:
+    """
+    Aggregates for one process: per-stage latency histograms, cache
+    hit/miss counters, decision counts and model load times.
+
+    Observations take a lock for a few dict updates, so they are cheap
+    enough for the fast profile; ``enabled=False`` turns them into no-ops.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS, enabled: bool = True):
+        self.buckets = buckets
+        self.enabled = enabled
+        self.stages: Dict[str, Histogram] = {}
+        self.cache: Dict[Tuple[str, str], int] = {}
+        self.decisions: Dict[str, int] = {}
+        self.model_loads: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def timer(self) -> StageTimer:
+        return StageTimer(self)
+
+    def observe(self, stage: str, seconds: float, count: int = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = Histogram(self.buckets)
+            histogram.observe(seconds, count)
+
+    def record_call(self, stages: Dict[str, float], action: Optional[str] = None):
+        """Observe every stage of one call, and count its decision, under one lock."""
+        if not self.enabled:
+            return
+        with self._lock:
+            for stage, seconds in stages.items():
+                histogram = self.stages.get(stage)
+                if histogram is None:
+                    histogram = self.stages[stage] = Histogram(self.buckets)
+                histogram.observe(seconds)
+            if action is not None:
+                self.decisions[action] = self.decisions.get(action, 0) + 1
+
+    def count_cache(self, kind: str, hit: bool):
+        if not self.enabled:
+            return
+        key = (kind, "hit" if hit else "miss")
+        with self._lock:
+            self.cache[key] = self.cache.get(key, 0) + 1
+
+    def record_model_load(self, model: str, seconds: float):
+        with self._lock:
+            self.model_loads[model] = seconds
+
+    def cache_hit_rates(self) -> Dict[str, float]:
+        kinds = {kind for kind, _ in self.cache}
+        rates = {}
+        for kind in sorted(kinds):
+            hits = self.cache.get((kind, "hit"), 0)
+            total = hits + self.cache.get((kind, "miss"), 0)
+            rates[kind] = hits / total if total else 0.0
+        return rates
+
+    def snapshot(self) -> Dict:
+        """Plain-data summary, e.g. for ``/health`` or logs."""
+        with self._lock:
+            return {
+                "stages": {
+                    stage: {
+                        "count": histogram.count,
+                        "mean_ms": histogram.sum / histogram.count * 1000 if histogram.count else 0.0,
+                        "p50_ms": histogram.quantile(0.5) * 1000,
+                        "p99_ms": histogram.quantile(0.99) * 1000,
+                    }
+                    for stage, histogram in self.stages.items()
+                },
+                "cache_hit_rate": self.cache_hit_rates(),
+                "decisions": dict(self.decisions),
+                "model_load_seconds": dict(self.model_loads),
+            }
+
+    def render(self, gauges: Optional[Dict[str, float]] = None) -> str:
+        """
+        Prometheus text exposition of everything recorded so far.
+
+        ``gauges`` adds point-in-time values owned by the caller, such as
+        requests in flight, as ``anonyme_<name>``.
+        """
+        lines = []
+        with self._lock:
+            lines += [
+                "# HELP anonyme_stage_seconds Time spent in each analysis stage.",
+                "# TYPE anonyme_stage_seconds histogram",
+            ]
+            for stage, histogram in sorted(self.stages.items()):
+                for bound, total in histogram.cumulative():
+                    lines.append(f'anonyme_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {total}')
+                lines.append(f'anonyme_stage_seconds_sum{{stage="{stage}"}} {histogram.sum!r}')
+                lines.append(f'anonyme_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+            lines += [
+                "# HELP anonyme_cache_requests_total Cache lookups by kind and outcome.",
+                "# TYPE anonyme_cache_requests_total counter",
+            ]
+            for (kind, outcome), total in sorted(self.cache.items()):
+                lines.append(f'anonyme_cache_requests_total{{kind="{kind}",outcome="{outcome}"}} {total}')
+            lines += [
+                "# HELP anonyme_cache_hit_ratio Share of cache lookups that hit, by kind.",
+                "# TYPE anonyme_cache_hit_ratio gauge",
+            ]
+            for kind, rate in self.cache_hit_rates().items():
+                lines.append(f'anonyme_cache_hit_ratio{{kind="{kind}"}} {rate!r}')
+
+            lines += [
+                "# HELP anonyme_decisions_total Decisions by action.",
+                "# TYPE anonyme_decisions_total counter",
+            ]
+            for action, total in sorted(self.decisions.items()):
+                lines.append(f'anonyme_decisions_total{{action="{action}"}} {total}')
+
+            lines += [
+                "# HELP anonyme_model_load_seconds Time the last load of each model took.",
+                "# TYPE anonyme_model_load_seconds gauge",
+            ]
+            for model, seconds in sorted(self.model_loads.items()):
+                lines.append(f'anonyme_model_load_seconds{{model="{model}"}} {seconds!r}')
+
+        for name, value in sorted((gauges or {}).items()):
+            lines.append(f"# TYPE anonyme_{name} gauge")
+            lines.append(f"anonyme_{name} {value!r}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.stages.clear()
+            self.cache.clear()
+            self.decisions.clear()
+            self.model_loads.clear()
+
+
+metrics = Metrics()
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import Optional, Tuple
 
 @dataclass
 class Finding:
@@ -6,3 +7,8 @@ class Finding:
     subtype: str
     confidence: float
     source: str
+    start: Optional[int] = None
+    end: Optional[int] = None
+    text: Optional[str] = None
+    # Every (start, end) match behind the finding; start, end and text describe the first
+    spans: Tuple[Tuple[int, int], ...] = ()
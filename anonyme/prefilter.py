@@ -0,0 +1,144 @@
+import re
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+from anonyme.context import SENSITIVE_TOPICS
+
+
+# Lowercase words spaCy tags as DATE; anything else it reports needs a capital or digit
+DATE_KEYWORDS = [
+    "today", "tonight", "tomorrow", "yesterday", "ago", "day", "days", "week", "weeks",
+    "weekend", "month", "months", "year", "years", "decade", "century", "daily", "weekly",
+    "monthly", "yearly", "annual", "annually", "quarter", "morning", "evening", "night",
+    "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+    "january", "february", "march", "april", "may", "june", "july", "august",
+    "september", "october", "november", "december",
+]
+
+CONTEXT_KEYWORDS = [
+    "account", "address", "birth", "card", "code", "id", "key", "number", "pin", "token",
+]
+
+STOPWORDS = frozenset(
+    "the and for are but not you all any can had her was one our out his has him how its "
+    "who did get may new now see two way use she they them this that with have from what "
+    "when will your about there their which would could should been were into than then "
+    "also just like some more very here".split()
+)
+
+_WORD = re.compile(r"\w{3,}")
+_SIGNAL = re.compile(r"[\d@]")
+
+
+def _stem(keyword: str) -> str:
+    # Dropping the last two letters of longer keywords covers most inflections:
+    # "passwords", "diagnoses", "credential", "secretly"
+    return keyword[:-2] if len(keyword) > 5 else keyword
+
+
+def _keyword_pattern(keywords: Iterable[str]) -> Optional["re.Pattern"]:
+    """Match any word starting with the stem of a keyword."""
+    stems = sorted({_stem(keyword.lower()) for keyword in keywords}, key=len, reverse=True)
+    if not stems:
+        return None
+    return re.compile(r"\b(?:" + "|".join(re.escape(stem) for stem in stems) + r")")
+
+
+class Prefilter:
+    """
+    Character-class and keyword screen run before NER and context scoring.
+
+    It only skips a stage when that stage is very unlikely to add anything:
+    NER runs for any text with an uppercase letter, a digit, '@' or a date
+    word; context scoring runs for any text with a sensitive-topic keyword
+    and for any session with recent turns. Keywords match as word prefixes
+    of their stems, so inflected forms count too.
+
+    Reference chains compare sentence embeddings, and paraphrases score high
+    without sharing a word, so a session's history is only screened when
+    ``screen_references`` is set: context scoring then also needs a content
+    word shared with the recent turns. That trades missed paraphrases for a
+    higher skip rate.
+    """
+
+    def __init__(
+        self,
+        screen_ner: bool = True,
+        screen_context: bool = True,
+        ner_keywords: Iterable[str] = DATE_KEYWORDS,
+        context_keywords: Optional[Iterable[str]] = None,
+        reference_window: int = 5,
+        screen_references: bool = False
+    ):
+        if context_keywords is None:
+            context_keywords = [
+                keyword for keywords in SENSITIVE_TOPICS.values() for keyword in keywords
+            ] + CONTEXT_KEYWORDS
+
+        self.screen_ner = screen_ner
+        self.screen_context = screen_context
+        self.reference_window = reference_window
+        self.screen_references = screen_references
+        self._ner_keywords = _keyword_pattern(ner_keywords)
+        self._context_keywords = _keyword_pattern(context_keywords)
+
+        self.checked = 0
+        self.ner_skipped = 0
+        self.context_skipped = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Picklable for worker processes; each copy keeps its own counters
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def needs_ner(self, text: str) -> bool:
+        if not self.screen_ner:
+            return True
+        lowered = text.lower()
+        return (
+            lowered != text
+            or _SIGNAL.search(text) is not None
+            or (self._ner_keywords is not None and self._ner_keywords.search(lowered) is not None)
+        )
+
+    def needs_context(self, text: str, session) -> bool:
+        if not self.screen_context:
+            return True
+        lowered = text.lower()
+        if self._context_keywords is not None and self._context_keywords.search(lowered) is not None:
+            return True
+
+        recent = session.messages.recent(self.reference_window)
+        if not self.screen_references:
+            return bool(recent)
+
+        # Approximate: a paraphrase of a recent turn can share no word with it
+        words = set(_WORD.findall(lowered)) - STOPWORDS
+        return any(words.intersection(_WORD.findall(msg.content.lower())) for msg in recent)
+
+    def screen(self, text: str, session=None) -> Tuple[bool, bool]:
+        """Return whether NER and context scoring should run for ``text``."""
+        run_ner = self.needs_ner(text)
+        run_context = session is not None and self.needs_context(text, session)
+        with self._lock:
+            self.checked += 1
+            if not run_ner:
+                self.ner_skipped += 1
+            if session is not None and not run_context:
+                self.context_skipped += 1
+        return run_ner, run_context
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "checked": self.checked,
+            "ner_skipped": self.ner_skipped,
+            "context_skipped": self.context_skipped,
+            "ner_skip_rate": self.ner_skipped / self.checked if self.checked else 0.0,
+            "context_skip_rate": self.context_skipped / self.checked if self.checked else 0.0,
+        }
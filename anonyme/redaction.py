@@ -0,0 +1,58 @@
+from typing import Iterator, List, Tuple
+
+from anonyme.models.findings import Finding
+
+
+def mask_for(subtype: str) -> str:
+    return "[" + subtype.upper().replace(" ", "_") + "]"
+
+
+def _finding_spans(findings: List[Finding]) -> Iterator[Tuple[int, int, int]]:
+    for index, f in enumerate(findings):
+        if f.spans:
+            for start, end in f.spans:
+                yield start, end, index
+        elif f.start is not None and f.end is not None:
+            yield f.start, f.end, index
+
+
+def merge_spans(findings: List[Finding]) -> List[Tuple[int, int, str]]:
+    spans = sorted(
+        (start, -end, index)
+        for start, end, index in _finding_spans(findings)
+        if end > start
+    )
+
+    merged = []
+    for start, negative_end, index in spans:
+        end = -negative_end
+        if merged and start < merged[-1][1]:
+            last_start, last_end, subtype = merged[-1]
+            merged[-1] = (last_start, max(last_end, end), subtype)
+        else:
+            merged.append((start, end, findings[index].subtype))
+
+    return merged
+
+
+def redact(text: str, findings: List[Finding]) -> str:
+    """
+    Replace every finding span in ``text`` with a ``[SUBTYPE]`` mask.
+
+    A finding's ``spans`` cover every match it stands for; findings
+    without them contribute their ``start``/``end``.
+
+    Overlapping spans are merged and labelled with the subtype of the
+    finding that starts first (the longest one on ties), so the text is
+    rewritten in one pass.
+    """
+    parts = []
+    cursor = 0
+
+    for start, end, subtype in merge_spans(findings):
+        parts.append(text[cursor:start])
+        parts.append(mask_for(subtype))
+        cursor = end
+
+    parts.append(text[cursor:])
+    return "".join(parts)
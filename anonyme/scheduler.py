@@ -0,0 +1,141 @@
+import time
+import queue
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional
+
+_STOP = object()
+
+
+class MicroBatchScheduler:
+    """
+    Collect items submitted from many callers and process them in batches.
+
+    A background thread waits for the first item, keeps collecting until
+    ``max_batch_size`` items are queued or ``max_wait_ms`` has passed, then
+    hands the whole batch to ``process_batch``. That function must return
+    one result per item, in order, and each result goes back to the caller
+    that submitted the item. Once ``stop`` is called, ``submit`` raises
+    until ``start`` is called again.
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        name: str = "anonyme-microbatch"
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+
+        self.batches = 0
+        self.items = 0
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+        self._lock = threading.Lock()
+
+    def _ensure_thread(self):
+        # The lock is held
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def start(self):
+        with self._lock:
+            self._stopped = False
+            self._ensure_thread()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Process everything already submitted, then stop the worker thread."""
+        with self._lock:
+            self._stopped = True
+            thread = self._thread
+            self._thread = None
+            if thread is not None:
+                # Queued under the lock, so no item can land behind it
+                self._queue.put(_STOP)
+        if thread is not None:
+            thread.join(timeout)
+
+    def submit(self, item) -> Future:
+        future = Future()
+        with self._lock:
+            if self._stopped:
+                raise RuntimeError("cannot submit to a stopped scheduler")
+            self._ensure_thread()
+            self._queue.put((item, future))
+        return future
+
+    async def submit_async(self, item):
+        return await asyncio.wrap_future(self.submit(item))
+
+    def __call__(self, item):
+        return self.submit(item).result()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    @property
+    def average_batch_size(self) -> float:
+        return self.items / self.batches if self.batches else 0.0
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    entry = self._queue.get(timeout=remaining)
+                else:
+                    entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is _STOP:
+                return batch, True
+            batch.append(entry)
+
+        return batch, False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = self._collect()
+            batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+            if batch:
+                self._process(batch)
+
+    def _process(self, batch):
+        self.batches += 1
+        self.items += len(batch)
+
+        try:
+            results = self.process_batch([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(
+                    f"Batch function returned {len(results)} results for {len(batch)} items"
+                )
+        except Exception as exc:
+            for _, future in batch:
+                future.set_exception(exc)
+            return
+
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
@@ -0,0 +1,419 @@
+import json
+import time
+import zlib
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from anonyme.context import EmbeddingBasedContext, Message
+from anonyme.embeddings import ModelRegistry, normalize_rows
+from anonyme.models.findings import Finding
+
+
+@dataclass
+class SessionRecord:
+    """Serialized session: compressed JSON state plus raw embedding rows."""
+    session_id: str
+    state: bytes
+    embeddings: bytes
+    dtype: str
+    dim: int
+
+
+def dump_context(context: EmbeddingBasedContext, dtype=np.float16) -> SessionRecord:
+    history = context.messages
+    state = {
+        "model_name": context.model_name,
+        "max_history": context.max_history,
+        "messages": [
+            {
+                "role": msg.role,
+                "content": msg.content,
+                "timestamp": msg.timestamp.isoformat(),
+                "findings": [asdict(finding) for finding in msg.findings],
+                "risk_score": msg.risk_score,
+                "embedded": history.embedded(slot),
+            }
+            for slot, msg in zip(history.slots(), history)
+        ],
+        "entity_memory": {
+            key: {
+                "count": entry["count"],
+                "first_seen": entry["first_seen"].isoformat(),
+                "last_seen": entry["last_seen"].isoformat(),
+            }
+            for key, entry in context.entity_memory.items()
+        },
+        "risk_trend": list(context.risk_trend),
+    }
+
+    if history.embeddings is None or not len(history):
+        embeddings, dim = b"", 0
+    else:
+        rows = history.embeddings[history.slots()].astype(dtype)
+        embeddings, dim = rows.tobytes(), rows.shape[1]
+
+    return SessionRecord(
+        session_id=context.session_id,
+        state=zlib.compress(json.dumps(state, separators=(",", ":")).encode("utf-8")),
+        embeddings=embeddings,
+        dtype=np.dtype(dtype).str,
+        dim=dim,
+    )
+
+
+def _load_finding(fields: dict) -> Finding:
+    # JSON turns span tuples into lists; records saved before spans existed have none
+    spans = tuple(tuple(span) for span in fields.pop("spans", ()))
+    return Finding(**fields, spans=spans)
+
+
+def load_context(record: SessionRecord, model_registry: Optional[ModelRegistry] = None) -> EmbeddingBasedContext:
+    state = json.loads(zlib.decompress(record.state).decode("utf-8"))
+    context = EmbeddingBasedContext(
+        record.session_id,
+        model_name=state["model_name"],
+        model_registry=model_registry,
+        max_history=state["max_history"],
+    )
+
+    rows = [None] * len(state["messages"])
+    if record.dim:
+        rows = np.frombuffer(record.embeddings, dtype=np.dtype(record.dtype)).reshape(-1, record.dim)
+        # Renormalize so reduced-precision rows are unit length again
+        rows = normalize_rows(rows)
+    for msg, row in zip(state["messages"], rows):
+        context.messages.append(
+            Message(
+                role=msg["role"],
+                content=msg["content"],
+                timestamp=datetime.fromisoformat(msg["timestamp"]),
+                findings=[_load_finding(finding) for finding in msg["findings"]],
+                risk_score=msg["risk_score"],
+            ),
+            row if msg.get("embedded", True) else None,
+        )
+
+    context.entity_memory = {
+        key: {
+            "count": entry["count"],
+            "first_seen": datetime.fromisoformat(entry["first_seen"]),
+            "last_seen": datetime.fromisoformat(entry["last_seen"]),
+        }
+        for key, entry in state["entity_memory"].items()
+    }
+    context.risk_trend.extend(state["risk_trend"])
+    return context
+
+
+def estimate_size(context: EmbeddingBasedContext) -> int:
+    """Rough resident size of a session in bytes."""
+    history = context.messages
+    size = history.embeddings.nbytes if history.embeddings is not None else 0
+    for msg in history:
+        size += 200 + len(msg.content) + 150 * len(msg.findings)
+    return size + 300 * len(context.entity_memory)
+
+
+class SessionStore(ABC):
+    """Durable home for sessions evicted from memory."""
+
+    @abstractmethod
+    def load(self, session_id: str) -> Optional[SessionRecord]:
+        pass
+
+    @abstractmethod
+    def save(self, record: SessionRecord):
+        pass
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        pass
+
+    def close(self):
+        pass
+
+
+class SQLiteSessionStore(SessionStore):
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, state BLOB NOT NULL, embeddings BLOB NOT NULL, "
+                "dtype TEXT NOT NULL, dim INTEGER NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def load(self, session_id: str) -> Optional[SessionRecord]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state, embeddings, dtype, dim FROM sessions WHERE session_id = ?",
+                (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return SessionRecord(session_id, bytes(row[0]), bytes(row[1]), row[2], row[3])
+
+    def save(self, record: SessionRecord):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?)",
+                (record.session_id, record.state, record.embeddings, record.dtype, record.dim, time.time())
+            )
+
+    def delete(self, session_id: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+@dataclass
+class _Entry:
+    # None until the turn that created the entry has loaded or built the context
+    context: Optional[EmbeddingBasedContext]
+    last_access: float
+    size: int = 0
+    leases: int = 0
+    ready: Future = field(default_factory=Future)
+
+
+class SessionManager:
+    """
+    Keep conversation contexts in memory within an idle TTL and a size budget.
+
+    Sessions idle for ``idle_ttl`` seconds, or the least recently used ones
+    once ``max_sessions`` or ``max_memory_bytes`` is exceeded, are written to
+    ``store`` and dropped from memory. They are loaded back on their next
+    turn. Without a store, evicted sessions are discarded. Sessions leased
+    by an in-progress turn are never evicted.
+
+    The manager's lock only guards the bookkeeping. Store reads and writes
+    run outside it, so one session's I/O never holds up turns of the
+    others. The first turn to touch a session loads it while later turns
+    for that session wait on the entry. A session is not read back until
+    its eviction has been saved.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "all-MiniLM-L6-v2",
+        store: Optional[SessionStore] = None,
+        idle_ttl: Optional[float] = 1800.0,
+        max_sessions: int = 1000,
+        max_memory_bytes: Optional[int] = None,
+        max_history: int = 20,
+        model_registry: Optional[ModelRegistry] = None,
+        embedding_dtype=np.float16,
+        clock=time.monotonic
+    ):
+        if max_sessions < 1:
+            raise ValueError("max_sessions must be at least 1")
+
+        self.model_name = model_name
+        self.store = store
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.max_memory_bytes = max_memory_bytes
+        self.max_history = max_history
+        self.model_registry = model_registry
+        self.embedding_dtype = embedding_dtype
+        self.clock = clock
+
+        self.evictions = 0
+        self.rehydrations = 0
+
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        # Evicted sessions whose state is still being written to the store
+        self._saving: Dict[str, Future] = {}
+        self._memory = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._entries
+
+    @property
+    def memory_bytes(self) -> int:
+        return self._memory
+
+    def _create(self, session_id: str) -> EmbeddingBasedContext:
+        record = self.store.load(session_id) if self.store is not None else None
+        if record is not None:
+            with self._lock:
+                self.rehydrations += 1
+            return load_context(record, self.model_registry)
+        return EmbeddingBasedContext(
+            session_id,
+            model_name=self.model_name,
+            model_registry=self.model_registry,
+            max_history=self.max_history,
+        )
+
+    def acquire(self, session_id: str) -> EmbeddingBasedContext:
+        with self._lock:
+            entry = self._entries.get(session_id)
+            creating = entry is None
+            if creating:
+                entry = self._entries[session_id] = _Entry(None, self.clock())
+                saving = self._saving.get(session_id)
+            entry.leases += 1
+            entry.last_access = self.clock()
+            self._entries.move_to_end(session_id)
+            evicted = self._enforce_limits()
+        self._save(evicted)
+
+        if not creating:
+            return entry.ready.result()
+
+        try:
+            if saving is not None:
+                saving.result()
+            context = self._create(session_id)
+        except BaseException as exc:
+            with self._lock:
+                if self._entries.get(session_id) is entry:
+                    del self._entries[session_id]
+            entry.ready.set_exception(exc)
+            raise
+
+        with self._lock:
+            entry.context = context
+            entry.size = estimate_size(context)
+            self._memory += entry.size
+            evicted = self._enforce_limits()
+        entry.ready.set_result(context)
+        self._save(evicted)
+        return context
+
+    def release(self, session_id: str):
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None or entry.context is None:
+                return
+            entry.leases -= 1
+            entry.last_access = self.clock()
+            self._entries.move_to_end(session_id)
+            size = estimate_size(entry.context)
+            self._memory += size - entry.size
+            entry.size = size
+            evicted = self._enforce_limits()
+        self._save(evicted)
+
+    @contextmanager
+    def lease(self, session_id: str) -> Iterator[EmbeddingBasedContext]:
+        context = self.acquire(session_id)
+        try:
+            yield context
+        finally:
+            self.release(session_id)
+
+    def _evict(self, session_id: str) -> Tuple[str, EmbeddingBasedContext]:
+        """Drop a session from memory; the lock is held and the caller saves it."""
+        entry = self._entries.pop(session_id)
+        self._memory -= entry.size
+        self.evictions += 1
+        if self.store is not None:
+            self._saving[session_id] = Future()
+        return session_id, entry.context
+
+    def _save(self, evicted: List[Tuple[str, EmbeddingBasedContext]]):
+        """Write evicted sessions to the store, outside the lock."""
+        if self.store is None:
+            return
+        for session_id, context in evicted:
+            try:
+                self.store.save(dump_context(context, self.embedding_dtype))
+            finally:
+                with self._lock:
+                    done = self._saving.pop(session_id)
+                done.set_result(None)
+
+    def _over_budget(self) -> bool:
+        if len(self._entries) > self.max_sessions:
+            return True
+        return self.max_memory_bytes is not None and self._memory > self.max_memory_bytes
+
+    def _enforce_limits(self) -> List[Tuple[str, EmbeddingBasedContext]]:
+        """Evict idle and over-budget sessions; the lock is held, the caller saves what is returned."""
+        evicted = []
+        if self.idle_ttl is not None:
+            cutoff = self.clock() - self.idle_ttl
+            idle = []
+            # Entries are kept in access order, so the idle ones come first
+            for session_id, entry in self._entries.items():
+                if entry.last_access > cutoff:
+                    break
+                if entry.leases == 0:
+                    idle.append(session_id)
+            for session_id in idle:
+                evicted.append(self._evict(session_id))
+
+        if self._over_budget():
+            # Least recently used first
+            for session_id in [sid for sid, entry in self._entries.items() if entry.leases == 0]:
+                evicted.append(self._evict(session_id))
+                if not self._over_budget():
+                    break
+        return evicted
+
+    def evict_idle(self):
+        with self._lock:
+            evicted = self._enforce_limits()
+        self._save(evicted)
+
+    def drop(self, session_id: str):
+        """Forget a session everywhere, including the store."""
+        with self._lock:
+            entry = self._entries.pop(session_id, None)
+            if entry is not None:
+                self._memory -= entry.size
+            saving = self._saving.get(session_id)
+        if self.store is not None:
+            if saving is not None:
+                # Deleting first would let the pending save bring it back
+                saving.result()
+            self.store.delete(session_id)
+
+    def flush(self):
+        """Write every in-memory session to the store without evicting it."""
+        if self.store is None:
+            return
+        with self._lock:
+            contexts: List[EmbeddingBasedContext] = [
+                entry.context for entry in self._entries.values() if entry.context is not None
+            ]
+        for context in contexts:
+            self.store.save(dump_context(context, self.embedding_dtype))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "active": len(self._entries),
+            "memory_bytes": self._memory,
+            "evictions": self.evictions,
+            "rehydrations": self.rehydrations,
+        }
+
+    def close(self):
+        self.flush()
+        if self.store is not None:
+            self.store.close()
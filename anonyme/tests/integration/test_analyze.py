@@ -1,5 +1,18 @@
+import sys
+import time
+import asyncio
 import pytest
-from anonyme.analyze import analyze, AnalyzeResult
+import subprocess
+from anonyme import analyze as analyze_module
+from anonyme.analyze import analyze, analyze_async, analyze_many, AnalyzeResult, FAST_PIPELINE_VERSION, PIPELINE_VERSION
+from anonyme.cache import AnalysisCache
+from anonyme.config.policies import PolicyEngine, PolicySet
+from anonyme.decision import resolve_policy, set_policy_engine
+from anonyme.detectors.base import Detector
+from anonyme.logging.decisions import SQLiteAuditStore
+from anonyme.models.findings import Finding
+from anonyme.prefilter import Prefilter
+from anonyme.metrics import metrics
 
 
 class TestAnalyzeIntegration:
@@ -92,3 +105,402 @@ class TestAnalyzeIntegration:
         
         if 0.5 <= result.risk_score < 0.8:
             assert result.action == "REDACT"
+    
+    def test_analyze_many_preserves_order(self):
+        prompts = ["Hello world", "My SSN is 123-45-6789", "Safe text"]
+        results = analyze_many(prompts, [[], [], []], batch_size=2)
+        
+        assert len(results) == 3
+        assert [r.action for r in results] == [analyze(p, []).action for p in prompts]
+        assert results[1].action == "BLOCK"
+    
+    def test_analyze_many_rejects_mismatched_contexts(self):
+        with pytest.raises(ValueError):
+            analyze_many(["a", "b"], [[]])
+    
+    def test_cache_reuses_result_without_context(self):
+        cache = AnalysisCache()
+        first = analyze("My SSN is 123-45-6789", [], cache=cache)
+        second = analyze("My SSN is 123-45-6789", [], cache=cache)
+        
+        assert first == second
+        assert cache.hits == 1
+    
+    def test_cache_with_context_reuses_findings_only(self):
+        cache = AnalysisCache()
+        context = [{"role": "user", "content": "Hello"}]
+        analyze("Contact me at test@example.com", context, cache=cache)
+        result = analyze("Contact me at test@example.com", context, cache=cache)
+        
+        assert result.action == "BLOCK"
+        assert cache.hits == 1
+        assert cache.get_result("Contact me at test@example.com", PIPELINE_VERSION) is None
+
+
+class SlowDetector(Detector):
+    
+    def __init__(self, delay: float, error: bool = False):
+        self.delay = delay
+        self.error = error
+    
+    def detect(self, text: str):
+        time.sleep(self.delay)
+        if self.error:
+            raise RuntimeError("model crashed")
+        return [Finding(type="NER", subtype="PERSON", confidence=0.1, source="ner")]
+
+
+class SlowSession:
+    
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.recorded = []
+        self.unembedded = []
+    
+    def embedding_risk_modifier(self, text):
+        time.sleep(self.delay)
+        return 0.2, ["Sensitive topic detected: pii (confidence: 0.90)"]
+    
+    def findings_risk_modifier(self, findings):
+        return 0.0, []
+    
+    def add_message(self, role, content, findings, risk_score, embed=True):
+        self.recorded.append(content)
+        if not embed:
+            self.unembedded.append(content)
+
+
+@pytest.fixture
+def slow_ner():
+    def install(delay, error=False):
+        analyze_module.set_ner_detector(SlowDetector(delay, error))
+    previous = analyze_module.ner_detector
+    yield install
+    analyze_module.set_ner_detector(previous)
+
+
+class TestAnalyzeAsync:
+    
+    def test_matches_sync_analyze(self):
+        for prompt in ["Hello world", "My SSN is 123-45-6789", "John Smith works at Microsoft"]:
+            assert asyncio.run(analyze_async(prompt, [])) == analyze(prompt, [])
+    
+    def test_stages_run_concurrently(self, slow_ner):
+        slow_ner(0.4)
+        session = SlowSession(0.4)
+        
+        start = time.perf_counter()
+        result = asyncio.run(analyze_async("My SSN is 123-45-6789", [], session=session))
+        elapsed = time.perf_counter() - start
+        
+        assert elapsed < 0.7
+        assert "PERSON via ner" in result.reasons
+        assert any("Sensitive topic" in reason for reason in result.reasons)
+        assert session.recorded == ["My SSN is 123-45-6789"]
+    
+    def test_ner_timeout_fails_open(self, slow_ner):
+        slow_ner(0.5)
+        result = asyncio.run(analyze_async("Hello world", [], timeouts={"ner": 0.05}))
+        
+        assert result.action == "ALLOW"
+        assert result.metadata["degraded"] == "ner"
+        assert any("ner stage timed out" in reason for reason in result.reasons)
+    
+    def test_ner_error_fails_closed(self, slow_ner):
+        slow_ner(0.0, error=True)
+        result = asyncio.run(analyze_async("Hello world", [], fail_policy="closed"))
+        
+        assert result.action == "BLOCK"
+        assert result.metadata["degraded"] == "ner"
+    
+    def test_context_timeout_records_turn_unembedded(self):
+        session = SlowSession(0.5)
+        result = asyncio.run(analyze_async(
+            "Hello world", [], session=session, timeouts={"context": 0.05}
+        ))
+        
+        assert result.metadata["degraded"] == "context"
+        assert not any("Sensitive topic" in reason for reason in result.reasons)
+        assert session.recorded == session.unembedded == ["Hello world"]
+    
+    def test_degraded_results_not_cached(self, slow_ner):
+        slow_ner(0.5)
+        cache = AnalysisCache()
+        asyncio.run(analyze_async("Hello world", [], cache=cache, timeouts={"ner": 0.05}))
+        
+        assert cache.get_result("Hello world", PIPELINE_VERSION) is None
+        assert cache.get_findings("Hello world", PIPELINE_VERSION) is None
+
+
+class CountingDetector(Detector):
+    
+    def __init__(self):
+        self.calls = 0
+    
+    def detect(self, text: str):
+        self.calls += 1
+        return []
+    
+    def detect_many(self, texts, **kwargs):
+        self.calls += len(texts)
+        return [[] for _ in texts]
+
+
+@pytest.fixture
+def counting_ner():
+    detector = CountingDetector()
+    previous = analyze_module.set_ner_detector(detector)
+    yield detector
+    analyze_module.set_ner_detector(previous)
+
+
+class TestShortCircuit:
+    
+    blocked = "My SSN is 123-45-6789"
+    
+    def test_skips_ner_once_blocked(self, counting_ner):
+        result = analyze(self.blocked, [], short_circuit=True)
+        
+        assert result.action == "BLOCK"
+        assert result.metadata["skipped_stages"] == "ner"
+        assert counting_ner.calls == 0
+    
+    def test_runs_every_stage_when_undecided(self, counting_ner):
+        result = analyze("Hello world", [], short_circuit=True)
+        
+        assert "skipped_stages" not in result.metadata
+        assert counting_ner.calls == 1
+    
+    def test_same_actions_as_full_evaluation(self):
+        prompts = [self.blocked, "Call 555-123-4567", "John Smith works at Microsoft", "Hello"]
+        
+        assert [analyze(p, [], short_circuit=True).action for p in prompts] == [analyze(p, []).action for p in prompts]
+    
+    def test_batch_only_runs_ner_on_undecided(self, counting_ner):
+        results = analyze_many([self.blocked, "Hello", self.blocked], short_circuit=True)
+        
+        assert counting_ner.calls == 1
+        assert [r.metadata.get("skipped_stages") for r in results] == ["ner", None, "ner"]
+    
+    def test_skips_context_scoring(self, counting_ner):
+        session = SlowSession(5.0)
+        result = asyncio.run(analyze_async(self.blocked, [], session=session, short_circuit=True))
+        
+        assert result.metadata["skipped_stages"] == "ner,context"
+        assert session.recorded == [self.blocked]
+    
+    def test_partial_findings_not_cached(self, counting_ner):
+        cache = AnalysisCache()
+        analyze(self.blocked, [], cache=cache, short_circuit=True)
+        
+        assert cache.get_findings(self.blocked, PIPELINE_VERSION) is None
+        assert cache.get_result(self.blocked, PIPELINE_VERSION) is None
+
+
+class TestPrefilterGate:
+    
+    def test_skips_ner_for_plain_chatter(self, counting_ner):
+        prefilter = Prefilter()
+        result = analyze("hello there", [], prefilter=prefilter)
+        
+        assert result.action == "ALLOW"
+        assert result.metadata["skipped_stages"] == "ner"
+        assert counting_ner.calls == 0
+        assert prefilter.ner_skipped == 1
+    
+    def test_runs_ner_when_needed(self, counting_ner):
+        analyze("John Smith works at Microsoft", [], prefilter=Prefilter())
+        
+        assert counting_ner.calls == 1
+    
+    def test_regex_still_runs(self, counting_ner):
+        result = analyze("reach me at someone@example.com", [], prefilter=Prefilter())
+        
+        assert "Email via regex" in result.reasons
+    
+    def test_batch(self, counting_ner):
+        prefilter = Prefilter()
+        results = analyze_many(["hello there", "Alice Smith", "thanks"], prefilter=prefilter)
+        
+        assert counting_ner.calls == 1
+        assert [r.metadata.get("skipped_stages") for r in results] == ["ner", None, "ner"]
+    
+    def test_async_skips_context(self, counting_ner):
+        session = SlowSession(5.0)
+        session.messages = type("History", (), {"recent": lambda self, count: []})()
+        result = asyncio.run(analyze_async("hello there", [], session=session, prefilter=Prefilter()))
+        
+        assert result.metadata["skipped_stages"] == "ner,context"
+        assert session.recorded == ["hello there"]
+
+
+class TestFastProfile:
+    
+    def test_runs_regex_only(self, counting_ner):
+        result = analyze("Alice's SSN is 123-45-6789", [], profile="fast")
+        
+        assert result.action == "BLOCK"
+        assert all(reason.endswith("via regex") for reason in result.reasons)
+        assert result.metadata["profile"] == "fast"
+        assert counting_ner.calls == 0
+    
+    def test_repeated_matches_count_once(self):
+        text = "Order 12345 shipped 2024-05-01, invoice 98765 and 55512 and 1234"
+        result = analyze(text, [], profile="fast")
+        
+        assert result.risk_score == 1.0
+        assert result.reasons == ["Phone via regex"]
+    
+    def test_batch_and_async(self, counting_ner):
+        prompts = ["Hello", "mail test@example.com"]
+        results = analyze_many(prompts, profile="fast")
+        
+        assert [r.action for r in results] == ["ALLOW", "BLOCK"]
+        assert asyncio.run(analyze_async(prompts[1], [], profile="fast")).action == "BLOCK"
+        assert counting_ner.calls == 0
+    
+    def test_session_turn_recorded_without_embedding(self):
+        session = SlowSession(5.0)
+        result = analyze("Hello", [], session=session, profile="fast")
+        
+        assert result.action == "ALLOW"
+        assert session.recorded == ["Hello"]
+    
+    def test_cached_apart_from_full_results(self, counting_ner):
+        cache = AnalysisCache()
+        analyze("Hello", [], cache=cache, profile="fast")
+        
+        policy = resolve_policy()
+        assert cache.get_result("Hello", analyze_module._result_namespace(FAST_PIPELINE_VERSION, policy)) is not None
+        assert cache.get_result("Hello", analyze_module._result_namespace(PIPELINE_VERSION, policy)) is None
+    
+    def test_rejects_unknown_profile(self):
+        with pytest.raises(ValueError):
+            analyze("Hello", [], profile="turbo")
+    
+    def test_never_imports_ml_stacks(self):
+        source = (
+            "from anonyme.analyze import analyze, analyze_many\n"
+            "analyze('Alice at alice@example.com', [], profile='fast')\n"
+            "analyze_many(['Bob', '123-45-6789'], profile='fast')\n"
+            "import sys; print('spacy' in sys.modules, 'sentence_transformers' in sys.modules)"
+        )
+        result = subprocess.run([sys.executable, "-B", "-c", source], capture_output=True, text=True, check=True)
+        
+        assert result.stdout.strip().splitlines()[-1] == "False False"
+
+
+
+class TestAuditSink:
+    
+    @pytest.fixture
+    def store(self):
+        store = SQLiteAuditStore()
+        previous = analyze_module.set_audit_sink(store)
+        yield store
+        analyze_module.set_audit_sink(previous)
+        store.close()
+    
+    def test_records_every_entry_point(self, store, counting_ner):
+        cache = AnalysisCache()
+        analyze("My SSN is 123-45-6789", [], cache=cache)
+        analyze("My SSN is 123-45-6789", [], cache=cache)
+        analyze_many(["Hello", "mail test@example.com"])
+        asyncio.run(analyze_async("Hello", [], fail_policy="closed"))
+        analyze("Call 555-123-4567", [], profile="fast")
+        
+        records = store.query()
+        assert len(records) == 6
+        assert store.count(subtype="SSN") == 2
+        assert store.count(action="BLOCK", subtype="Email") == 1
+    
+    def test_records_session_id(self, store):
+        session = SlowSession(0.0)
+        session.session_id = "chat-1"
+        analyze("Hello", [], session=session, profile="fast")
+        
+        assert store.query(session_id="chat-1")[0].action == "ALLOW"
+
+
+class TestTimings:
+    
+    def stages(self, result):
+        return dict(part.split("=") for part in result.metadata["stage_ms"].split(","))
+    
+    def test_off_by_default(self):
+        assert "stage_ms" not in analyze("Hello", []).metadata
+    
+    def test_per_stage_milliseconds(self):
+        stages = self.stages(analyze("Alice at alice@example.com", [], timings=True))
+        
+        assert set(stages) == {"regex", "ner", "decide", "total"}
+        assert all(float(ms) >= 0 for ms in stages.values())
+        assert float(stages["total"]) >= float(stages["ner"])
+    
+    def test_every_entry_point(self):
+        assert set(self.stages(analyze_many(["Hello", "Bob"], timings=True)[1])) == {"regex", "ner", "decide", "total"}
+        assert set(self.stages(analyze("Hi", [], profile="fast", timings=True))) == {"regex", "decide", "total"}
+        
+        session = SlowSession(0.0)
+        result = asyncio.run(analyze_async("Hello", [], session=session, timings=True))
+        assert set(self.stages(result)) == {"regex", "ner", "context", "decide", "total"}
+    
+    def test_aggregates_and_cache_counters(self):
+        before = metrics.stages["regex"].count if "regex" in metrics.stages else 0
+        cache = AnalysisCache()
+        analyze("Hello there", [], cache=cache)
+        analyze("Hello there", [], cache=cache)
+        
+        assert metrics.stages["regex"].count == before + 1
+        assert metrics.cache[("result", "hit")] >= 1
+        assert metrics.decisions["ALLOW"] >= 2
+
+
+POLICIES = {"policies": [
+    {"name": "support", "match": {"role": "support"}, "weights": {"Email": 0.0}},
+    {"name": "hipaa", "match": {"regime": "HIPAA"}, "actions": {"Phone": "BLOCK"}},
+]}
+
+
+@pytest.fixture
+def policies():
+    previous = set_policy_engine(PolicyEngine(PolicySet(POLICIES)))
+    yield
+    set_policy_engine(previous)
+
+
+class TestPolicies:
+    
+    email = "Write to test@example.com"
+    
+    def test_scope_selects_policy(self, policies, counting_ner):
+        assert analyze(self.email, []).action == "BLOCK"
+        
+        result = analyze(self.email, [], scope={"role": "support"})
+        assert result.action == "ALLOW"
+        assert result.risk_score == 0.0
+        assert result.reasons == ["Email via regex"]
+    
+    def test_forced_action_short_circuits(self, policies, counting_ner):
+        result = analyze("Call me on 555-123-4567", [], short_circuit=True, scope={"regime": "HIPAA"})
+        
+        assert result.action == "BLOCK"
+        assert result.metadata["skipped_stages"] == "ner"
+        assert "Policy hipaa requires BLOCK" in result.reasons
+        assert counting_ner.calls == 0
+    
+    def test_results_cached_per_policy(self, policies, counting_ner):
+        cache = AnalysisCache()
+        analyze(self.email, [], cache=cache)
+        
+        assert analyze(self.email, [], cache=cache, scope={"role": "support"}).action == "ALLOW"
+        assert analyze(self.email, [], cache=cache).action == "BLOCK"
+        # Findings do not depend on the policy, so the second scope reused them
+        assert counting_ner.calls == 1
+    
+    def test_every_entry_point(self, policies, counting_ner):
+        scope = {"role": "support"}
+        
+        assert analyze_many([self.email], scope=scope)[0].action == "ALLOW"
+        assert analyze(self.email, [], profile="fast", scope=scope).action == "ALLOW"
+        assert asyncio.run(analyze_async(self.email, [], scope=scope)).action == "ALLOW"
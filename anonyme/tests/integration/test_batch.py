@@ -0,0 +1,96 @@
+import io
+import json
+import subprocess
+from anonyme import analyze as analyze_module
+from anonyme.interface import reader
+from anonyme.interface.batch import BatchScanner
+
+
+PROMPTS = [
+    "My SSN is 123-45-6789",
+    "Hello world",
+    "John Smith works at Microsoft",
+    "test@example.com",
+    "Safe text",
+]
+
+
+def corpus(copies: int = 4) -> str:
+    lines = [
+        json.dumps({"id": f"r{index}", "prompt": PROMPTS[index % len(PROMPTS)]})
+        for index in range(len(PROMPTS) * copies)
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def scan(scanner: BatchScanner, text: str):
+    output = io.StringIO()
+    counts = scanner.scan(io.StringIO(text), output)
+    return counts, [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+def scan_path(scanner: BatchScanner, path: str, **kwargs):
+    output = io.StringIO()
+    counts = scanner.scan_file(path, output, **kwargs)
+    return counts, [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+class TestBatchScanner:
+    
+    def test_forked_workers_match_inline_scan(self):
+        _, inline = scan(BatchScanner(workers=1, batch_size=3), corpus())
+        counts, forked = scan(BatchScanner(workers=2, batch_size=3), corpus())
+        
+        assert counts == (20, 0)
+        assert forked == inline
+        assert [line["id"] for line in forked] == [f"r{index}" for index in range(20)]
+    
+    def test_unordered_output_is_tagged(self):
+        (written, errors), lines = scan(BatchScanner(workers=3, batch_size=2, ordered=False), corpus())
+        
+        assert written == 20
+        assert sorted(line["line"] for line in lines) == list(range(1, 21))
+        by_id = {line["id"]: line["action"] for line in lines}
+        assert by_id["r0"] == "BLOCK"
+        assert by_id["r1"] == "ALLOW"
+    
+    def test_preloads_model_in_parent(self):
+        analyze_module.ner_detector.model = None
+        scan(BatchScanner(workers=2, batch_size=5), corpus(1))
+        
+        assert analyze_module.ner_detector.model is not None
+    
+    def test_console_script_module(self):
+        result = subprocess.run(
+            ["python", "-B", "-m", "anonyme.interface.batch", "-", "--workers", "2", "--batch-size", "4"],
+            input=corpus(2),
+            capture_output=True,
+            text=True
+        )
+        
+        assert result.returncode == 0
+        assert len(result.stdout.splitlines()) == 10
+        assert "Analyzed 10 record(s), 0 error(s)" in result.stderr
+    
+    def test_scan_file_shards_cover_corpus(self, tmp_path):
+        path = tmp_path / "corpus.jsonl"
+        path.write_text(corpus())
+        
+        shards = []
+        for index in range(3):
+            _, lines = scan_path(BatchScanner(workers=2, batch_size=3), str(path), shard=(index, 3))
+            shards.extend(lines)
+        _, whole = scan(BatchScanner(workers=1), corpus())
+        
+        assert [line["id"] for line in shards] == [line["id"] for line in whole]
+        assert [line["action"] for line in shards] == [line["action"] for line in whole]
+        assert all("offset" in line for line in shards)
+    
+    def test_inline_scan_file_closes_mappings(self, tmp_path):
+        path = tmp_path / "corpus.jsonl"
+        path.write_text(corpus(1))
+        
+        (written, _), _ = scan_path(BatchScanner(workers=1, batch_size=2), str(path))
+        
+        assert written == 5
+        assert reader._open_files == {}
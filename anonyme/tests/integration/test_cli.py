@@ -1,7 +1,11 @@
+import io
 import pytest
 import subprocess
 import json
 import re
+import sys
+from anonyme.interface import cli
+from anonyme.interface.cli import read_records, stream_jsonl
 
 
 def extract_json(output: str) -> dict:
@@ -152,3 +156,171 @@ class TestCLIInterface:
         data = extract_json(result.stdout)
         assert data["results"][0]["reasons"] == []
         assert data["results"][0]["risk_score"] == 0.0
+    
+    def test_cli_stats(self):
+        result = subprocess.run(
+            ["python", "-B", "-m", "anonyme.interface.cli", "Alice at test@example.com", "--json", "--stats"],
+            capture_output=True,
+            text=True
+        )
+        
+        data = extract_json(result.stdout)
+        assert "ner=" in data["results"][0]["metadata"]["stage_ms"]
+        assert 'anonyme_stage_seconds_count{stage="ner"} 1' in result.stderr
+        assert "anonyme_model_load_seconds" in result.stderr
+    
+    def test_cli_fast_profile(self):
+        result = subprocess.run(
+            ["python", "-B", "-m", "anonyme.interface.cli",
+             "Alice Johnson, test@example.com", "--profile", "fast", "--json"],
+            capture_output=True,
+            text=True
+        )
+        
+        data = extract_json(result.stdout)
+        assert data["results"][0]["action"] == "BLOCK"
+        assert data["results"][0]["reasons"] == ["Email via regex"]
+        assert data["results"][0]["metadata"] == {"profile": "fast"}
+
+    
+    def test_cli_policy_scope(self, tmp_path):
+        path = tmp_path / "policies.json"
+        path.write_text(json.dumps({"policies": [{"match": {"role": "support"}, "weights": {"Email": 0.0}}]}))
+        command = ["python", "-B", "-m", "anonyme.interface.cli", "Write to test@example.com", "--profile", "fast", "--json"]
+        default = subprocess.run(command, capture_output=True, text=True)
+        support = subprocess.run(command + ["--policy", str(path), "--role", "support"], capture_output=True, text=True)
+        
+        assert extract_json(default.stdout)["results"][0]["action"] == "BLOCK"
+        assert extract_json(support.stdout)["results"][0]["action"] == "ALLOW"
+
+
+JSONL_INPUT = "\n".join([
+    json.dumps({"id": "a", "prompt": "My SSN is 123-45-6789"}),
+    "",
+    "not json",
+    json.dumps({"prompt": "Hello world", "context": [{"role": "user", "content": "Hi"}]}),
+    json.dumps({"id": 7, "prompt": "test@example.com"}),
+]) + "\n"
+
+
+class TestCLIStreaming:
+    
+    def test_read_records_is_lazy_and_reports_bad_lines(self):
+        records = read_records(iter(JSONL_INPUT.splitlines()))
+        
+        assert next(records)["id"] == "a"
+        assert next(records) == {"line": 3, "error": "Expecting value: line 1 column 1 (char 0)"}
+    
+    def test_stream_writes_one_line_per_record_in_order(self):
+        output = io.StringIO()
+        written, errors = stream_jsonl(io.StringIO(JSONL_INPUT), output, batch_size=2)
+        
+        lines = [json.loads(line) for line in output.getvalue().splitlines()]
+        assert (written, errors) == (4, 1)
+        assert [line["line"] for line in lines] == [1, 3, 4, 5]
+        assert [line.get("action") for line in lines] == ["BLOCK", None, "ALLOW", "BLOCK"]
+        assert lines[0]["id"] == "a" and lines[3]["id"] == 7
+    
+    def test_stdin_with_worker_pool(self):
+        result = subprocess.run(
+            ["python", "-B", "-m", "anonyme.interface.cli", "--input", "-", "--workers", "2", "--batch-size", "1"],
+            input=JSONL_INPUT,
+            capture_output=True,
+            text=True
+        )
+        
+        lines = [json.loads(line) for line in result.stdout.splitlines()]
+        assert result.returncode == 1
+        assert [line["line"] for line in lines] == [1, 3, 4, 5]
+        assert "Analyzed 4 record(s), 1 error(s)" in result.stderr
+    
+    def test_input_closed_when_output_cannot_open(self, tmp_path, monkeypatch):
+        source = tmp_path / "in.jsonl"
+        source.write_text(JSONL_INPUT)
+        opened = []
+        
+        def tracking_open(*args, **kwargs):
+            handle = open(*args, **kwargs)
+            opened.append(handle)
+            return handle
+        
+        monkeypatch.setattr(cli, "open", tracking_open, raising=False)
+        # Leave the loggers on pytest's streams
+        monkeypatch.setattr(cli.LoggerManager, "set_console_stream", lambda stream: None)
+        monkeypatch.setattr(sys, "argv", ["anonyme", "--input", str(source), "--output", str(tmp_path / "missing" / "out.jsonl")])
+        with pytest.raises(FileNotFoundError):
+            cli.run_stream(cli.parse_arguments())
+        
+        assert len(opened) == 1 and opened[0].closed
+    
+    def test_n_process_rejected_with_input(self):
+        result = subprocess.run(
+            ["python", "-B", "-m", "anonyme.interface.cli", "--input", "-", "--n-process", "2"],
+            input=JSONL_INPUT,
+            capture_output=True,
+            text=True
+        )
+        
+        assert result.returncode == 2
+        assert "--workers" in result.stderr
+    
+    def test_requires_prompts_or_input(self):
+        result = subprocess.run(
+            ["python", "-B", "-m", "anonyme.interface.cli"],
+            capture_output=True,
+            text=True
+        )
+        
+        assert result.returncode == 2
+
+
+class TestCLIAudit:
+    
+    @pytest.fixture
+    def audit_db(self, tmp_path):
+        from anonyme.analyze import AnalyzeResult
+        from anonyme.logging.decisions import SQLiteAuditStore
+        
+        path = str(tmp_path / "audit.db")
+        store = SQLiteAuditStore(path)
+        store.record_result("My SSN is 123-45-6789", AnalyzeResult(
+            action="BLOCK", risk_score=0.9, reasons=["SSN via regex"], metadata={}, subtypes=["SSN"]
+        ), session_id="chat-1")
+        store.record_result("Hello", AnalyzeResult(action="ALLOW", risk_score=0.0, reasons=[], metadata={}))
+        store.close()
+        return path
+    
+    def run_audit(self, *args):
+        return subprocess.run(
+            ["python", "-B", "-m", "anonyme.interface.cli", "--audit", *args],
+            capture_output=True,
+            text=True
+        )
+    
+    def test_query_by_action_and_subtype(self, audit_db):
+        result = self.run_audit("--db", audit_db, "--action", "BLOCK", "--subtype", "SSN", "--since", "1d", "--json")
+        
+        assert result.returncode == 0
+        records = [json.loads(line) for line in result.stdout.splitlines()]
+        assert [(r["session_id"], r["subtypes"]) for r in records] == [("chat-1", ["SSN"])]
+        assert "123-45-6789" not in result.stdout
+    
+    def test_count_and_prompt_lookup(self, audit_db):
+        assert self.run_audit("--db", audit_db, "--count").stdout.strip() == "2"
+        assert self.run_audit("--db", audit_db, "--prompt", "Hello", "--count").stdout.strip() == "1"
+    
+    def test_audit_is_still_a_prompt(self):
+        result = subprocess.run(
+            ["python", "-B", "-m", "anonyme.interface.cli", "audit", "--profile", "fast", "--json"],
+            capture_output=True,
+            text=True
+        )
+        
+        data = extract_json(result.stdout)
+        assert data["results"][0]["action"] == "ALLOW"
+    
+    def test_missing_database(self, tmp_path):
+        result = self.run_audit("--db", str(tmp_path / "missing.db"))
+        
+        assert result.returncode != 0
+        assert "no audit database" in result.stderr
@@ -0,0 +1,176 @@
+import json
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+
+from anonyme.logging.audit import LoggerManager
+from anonyme.logging.decisions import SQLiteAuditStore
+from anonyme.interface.service import (
+    ConcurrencyLimiter,
+    ServiceConfig,
+    ServiceOverloaded,
+    create_app,
+)
+
+
+@pytest.fixture(scope="module")
+def client():
+    app = create_app(ServiceConfig(enable_context=False, max_concurrency=2))
+    with TestClient(app) as client:
+        yield client
+
+
+class TestAnalysisService:
+    
+    def test_health(self, client):
+        response = client.get("/health")
+        
+        assert response.status_code == 200
+        assert response.json()["status"] == "ok"
+    
+    def test_analyze_safe_prompt(self, client):
+        response = client.post("/analyze", json={"prompt": "Hello world"})
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["action"] == "ALLOW"
+        assert data["risk_score"] == 0.0
+        assert data["reasons"] == []
+    
+    def test_analyze_blocks_email(self, client):
+        response = client.post("/analyze", json={"prompt": "Contact me at test@example.com"})
+        
+        data = response.json()
+        assert data["action"] == "BLOCK"
+        assert any("Email" in reason for reason in data["reasons"])
+    
+    def test_batch_preserves_order(self, client):
+        items = [{"prompt": "Hello"}, {"prompt": "My SSN is 123-45-6789"}, {"prompt": "Safe text"}]
+        response = client.post("/analyze/batch", json={"items": items})
+        
+        assert response.status_code == 200
+        actions = [r["action"] for r in response.json()["results"]]
+        assert actions == ["ALLOW", "BLOCK", "ALLOW"]
+    
+    def test_invalid_request_rejected(self, client):
+        response = client.post("/analyze", json={"context": []})
+        
+        assert response.status_code == 422
+    
+    def test_timings_opt_in(self, client):
+        plain = client.post("/analyze", json={"prompt": "Hello"}).json()
+        timed = client.post("/analyze", json={"prompt": "Hello", "timings": True}).json()
+        
+        assert "stage_ms" not in plain["metadata"]
+        assert "ner=" in timed["metadata"]["stage_ms"]
+    
+    def test_metrics_endpoint(self, client):
+        client.post("/analyze", json={"prompt": "My SSN is 123-45-6789"})
+        response = client.get("/metrics")
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert 'anonyme_stage_seconds_count{stage="regex"}' in response.text
+        assert 'anonyme_decisions_total{action="BLOCK"}' in response.text
+        assert 'anonyme_model_load_seconds{model="spacy/en_core_web_sm"}' in response.text
+        assert "anonyme_in_flight 0" in response.text
+
+
+class TestFastProfileService:
+    
+    def test_serves_without_models(self):
+        app = create_app(ServiceConfig(profile="fast"))
+        with TestClient(app) as client:
+            health = client.get("/health").json()
+            response = client.post("/analyze", json={"prompt": "Contact test@example.com", "session_id": "s1"})
+        
+        assert health["profile"] == "fast"
+        assert "sessions" not in health
+        assert response.json()["action"] == "BLOCK"
+        assert response.json()["metadata"] == {"profile": "fast"}
+    
+    def test_profile_round_trips_through_env(self, monkeypatch):
+        for key, value in ServiceConfig(profile="fast").to_env().items():
+            monkeypatch.setenv(key, value)
+        
+        assert ServiceConfig.from_env().profile == "fast"
+
+
+class TestAuditQueue:
+    
+    def test_health_reports_queue_while_running(self):
+        app = create_app(ServiceConfig(profile="fast", audit_queue=1000, audit_overflow="sample"))
+        with TestClient(app) as client:
+            client.post("/analyze", json={"prompt": "Hello"})
+            audit = client.get("/health").json()["audit"]
+        
+        assert audit["overflow"] == "sample"
+        assert audit["enqueued"] >= 1
+        assert LoggerManager.async_stats() is None
+    
+    def test_blocking_overflow_refused(self):
+        with pytest.raises(ValueError):
+            create_app(ServiceConfig(profile="fast", audit_queue=1000, audit_overflow="block"))
+    
+    def test_decisions_written_to_audit_db(self, tmp_path):
+        path = str(tmp_path / "audit.db")
+        app = create_app(ServiceConfig(profile="fast", audit_db=path))
+        with TestClient(app) as client:
+            client.post("/analyze", json={"prompt": "My SSN is 123-45-6789", "session_id": "s1"})
+            client.post("/analyze/batch", json={"items": [{"prompt": "Hello"}]})
+            decisions = client.get("/health").json()["decisions"]
+        
+        assert decisions["recorded"] == 2 and decisions["dropped"] == 0
+        store = SQLiteAuditStore(path)
+        assert store.count() == 2
+        assert store.query(subtype="SSN")[0].action == "BLOCK"
+        store.close()
+
+
+class TestPolicyFile:
+    
+    def test_requests_select_policy_from_file(self, tmp_path):
+        path = tmp_path / "policies.json"
+        path.write_text(json.dumps({
+            "version": "7",
+            "policies": [{"name": "support", "match": {"role": "support"}, "weights": {"Email": 0.0}}],
+        }))
+        app = create_app(ServiceConfig(profile="fast", policy_file=str(path)))
+        with TestClient(app) as client:
+            default = client.post("/analyze", json={"prompt": "Write to test@example.com"}).json()
+            support = client.post("/analyze", json={"prompt": "Write to test@example.com", "role": "support"}).json()
+            batch = client.post("/analyze/batch", json={"items": [{"prompt": "test@example.com"}], "role": "support"}).json()
+            health = client.get("/health").json()
+        
+        assert default["action"] == "BLOCK"
+        assert support["action"] == "ALLOW"
+        assert batch["results"][0]["action"] == "ALLOW"
+        assert health["policies"]["version"] == "7"
+
+
+class TestConcurrencyLimiter:
+    
+    def test_rejects_when_full(self):
+        async def scenario():
+            limiter = ConcurrencyLimiter(max_concurrency=1, max_pending=1)
+            release = asyncio.Event()
+            
+            async def hold():
+                async with limiter.slot():
+                    await release.wait()
+            
+            running = asyncio.create_task(hold())
+            waiting = asyncio.create_task(hold())
+            await asyncio.sleep(0)
+            
+            assert limiter.in_flight == 2
+            with pytest.raises(ServiceOverloaded):
+                async with limiter.slot():
+                    pass
+            
+            release.set()
+            await asyncio.gather(running, waiting)
+            assert limiter.in_flight == 0
+            assert limiter.rejected == 1
+        
+        asyncio.run(scenario())
@@ -0,0 +1,137 @@
+import io
+import time
+import logging
+import threading
+import pytest
+from anonyme.logging.audit import LoggerManager, QueueAuditHandler
+
+
+class GatedHandler(logging.Handler):
+    """Records messages, but holds the writer thread until ``gate`` is set."""
+    
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+        self.entered = threading.Event()
+        self.gate = threading.Event()
+    
+    def emit(self, record):
+        self.entered.set()
+        self.gate.wait(5)
+        self.messages.append(record.getMessage())
+
+
+def make_record(message, *args):
+    return logging.LogRecord("test", logging.INFO, __file__, 1, message, args, None)
+
+
+@pytest.fixture
+def stalled():
+    """A queue whose writer is stuck inside the first record's write."""
+    handlers = []
+
+    def build(**kwargs):
+        target = GatedHandler()
+        handler = QueueAuditHandler([target], **kwargs)
+        handler.emit(make_record("first"))
+        assert target.entered.wait(5)
+        handlers.append((handler, target))
+        return handler, target
+
+    yield build
+    for handler, target in handlers:
+        target.gate.set()
+        handler.close()
+
+
+class TestQueueAuditHandler:
+    
+    def test_writes_batches_off_thread(self):
+        stream = io.StringIO()
+        target = logging.StreamHandler(stream)
+        handler = QueueAuditHandler([target], batch_size=4)
+        for index in range(10):
+            handler.emit(make_record("record %d", index))
+        
+        assert handler.flush()
+        assert stream.getvalue().splitlines() == [f"record {index}" for index in range(10)]
+        assert handler.stats()["written"] == 10
+        handler.close()
+    
+    def test_arguments_rendered_at_emit(self):
+        stream = io.StringIO()
+        handler = QueueAuditHandler([logging.StreamHandler(stream)])
+        context = ["a"]
+        handler.emit(make_record("context %s", context))
+        context.append("b")
+        handler.close()
+        
+        assert stream.getvalue() == "context ['a']\n"
+    
+    def test_drop_policy(self, stalled):
+        handler, target = stalled(capacity=2, overflow="drop")
+        for index in range(5):
+            handler.emit(make_record(str(index)))
+        
+        assert handler.dropped == 3
+        target.gate.set()
+        handler.flush()
+        assert target.messages == ["first", "0", "1"]
+    
+    def test_sample_policy_keeps_every_nth_overflow(self, stalled):
+        handler, target = stalled(capacity=2, overflow="sample", sample_every=2)
+        for index in range(6):
+            handler.emit(make_record(str(index)))
+        
+        # 3 and 5 each evicted the oldest queued record; 2 and 4 were discarded
+        assert handler.dropped == 4
+        target.gate.set()
+        handler.flush()
+        assert target.messages == ["first", "3", "5"]
+    
+    def test_block_policy_times_out(self, stalled):
+        handler, target = stalled(capacity=1, overflow="block", block_timeout=0.05)
+        handler.emit(make_record("queued"))
+        start = time.monotonic()
+        handler.emit(make_record("late"))
+        
+        assert time.monotonic() - start >= 0.05
+        assert handler.dropped == 1
+    
+    def test_block_policy_waits_for_room(self, stalled):
+        handler, target = stalled(capacity=1, overflow="block")
+        handler.emit(make_record("queued"))
+        producer = threading.Thread(target=handler.emit, args=(make_record("waited"),))
+        producer.start()
+        time.sleep(0.05)
+        
+        assert producer.is_alive()
+        target.gate.set()
+        producer.join(5)
+        handler.flush()
+        assert target.messages == ["first", "queued", "waited"]
+        assert handler.dropped == 0
+    
+    def test_rejects_unknown_policy(self):
+        with pytest.raises(ValueError):
+            QueueAuditHandler([], overflow="spill")
+
+
+class TestAsyncMode:
+    
+    def test_enable_and_disable_round_trip(self, tmp_path):
+        logger = LoggerManager.get_logger("anonyme.tests.async_mode", log_dir=str(tmp_path))
+        own_handlers = logger.handlers[:]
+        
+        handler = LoggerManager.enable_async(capacity=100, log_dir=str(tmp_path), log_file="audit.log")
+        try:
+            assert logger.handlers == [handler]
+            logger.info("queued message")
+            handler.flush()
+            assert LoggerManager.async_stats()["written"] >= 1
+        finally:
+            LoggerManager.disable_async()
+        
+        assert "queued message" in (tmp_path / "audit.log").read_text()
+        assert logger.handlers == own_handlers
+        assert LoggerManager.async_stats() is None
@@ -0,0 +1,110 @@
+import pytest
+from pydantic import BaseModel
+from anonyme.cache import AnalysisCache, CacheBackend, LRUCache
+from anonyme.models.findings import Finding
+
+
+class FakeClock:
+    
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+class DictBackend(CacheBackend):
+    
+    def __init__(self):
+        self.data = {}
+    
+    def get(self, key):
+        return self.data.get(key)
+    
+    def set(self, key, value):
+        self.data[key] = value
+    
+    def clear(self):
+        self.data.clear()
+
+
+class Result(BaseModel):
+    action: str
+    reasons: list
+
+
+class TestLRUCache:
+    
+    def test_get_and_set(self):
+        cache = LRUCache(max_size=2)
+        cache.set("a", 1)
+        
+        assert cache.get("a") == 1
+        assert cache.get("missing") is None
+    
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.evictions == 1
+        assert len(cache) == 2
+    
+    def test_ttl_expiry(self):
+        clock = FakeClock()
+        cache = LRUCache(max_size=10, ttl=5.0, clock=clock)
+        cache.set("a", 1)
+        
+        clock.now = 4.9
+        assert cache.get("a") == 1
+        clock.now = 5.0
+        assert cache.get("a") is None
+        assert cache.expirations == 1
+    
+    def test_invalid_size(self):
+        with pytest.raises(ValueError):
+            LRUCache(max_size=0)
+
+
+class TestAnalysisCache:
+    
+    def test_hit_and_miss_counters(self):
+        cache = AnalysisCache()
+        findings = [Finding(type="PII", subtype="Email", confidence=1.0, source="regex")]
+        
+        assert cache.get_findings("prompt") is None
+        cache.set_findings("prompt", findings)
+        assert cache.get_findings("prompt") == findings
+        
+        assert cache.hits == 1
+        assert cache.misses == 1
+        assert cache.hit_rate == 0.5
+    
+    def test_namespace_and_version_isolate_entries(self):
+        backend = DictBackend()
+        cache = AnalysisCache(backend, version="v1")
+        cache.set_findings("prompt", [], namespace="pipeline-a")
+        
+        assert cache.get_findings("prompt", namespace="pipeline-b") is None
+        assert AnalysisCache(backend, version="v2").get_findings("prompt", namespace="pipeline-a") is None
+        assert cache.get_findings("prompt", namespace="pipeline-a") == []
+    
+    def test_results_are_copied(self):
+        cache = AnalysisCache(DictBackend())
+        cache.set_result("prompt", Result(action="ALLOW", reasons=[]))
+        
+        first = cache.get_result("prompt")
+        first.reasons.append("mutated")
+        
+        assert cache.get_result("prompt").reasons == []
+    
+    def test_keys_are_hex_digests(self):
+        key = AnalysisCache().key("result", "secret prompt")
+        
+        assert len(key) == 64
+        assert "secret" not in key
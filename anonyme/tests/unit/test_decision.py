@@ -1,5 +1,5 @@
 import pytest
-from anonyme.decision import decide
+from anonyme.decision import decide, is_decided
 from anonyme.models.findings import Finding
 
 
@@ -76,3 +76,12 @@ class TestDecisionFunction:
         assert isinstance(result["action"], str)
         assert isinstance(result["risk_score"], (int, float))
         assert isinstance(result["reasons"], list)
+    
+    def test_is_decided_only_at_block_threshold(self):
+        below = [Finding(type="PII", subtype="Phone", confidence=0.6, source="regex")]
+        above = below + [Finding(type="PII", subtype="Email", confidence=0.6, source="regex")]
+        
+        assert not is_decided([])
+        assert not is_decided(below)
+        assert is_decided(above)
+        assert decide(above, {})["action"] == "BLOCK"
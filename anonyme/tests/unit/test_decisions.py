@@ -0,0 +1,121 @@
+import time
+import sqlite3
+import pytest
+from anonyme.analyze import AnalyzeResult
+from anonyme.logging.decisions import (
+    HASH_BYTES,
+    DecisionRecord,
+    SQLiteAuditStore,
+    prompt_hash,
+)
+
+
+def make_result(action, risk, subtypes):
+    reasons = [f"{subtype} via regex" for subtype in subtypes]
+    return AnalyzeResult(action=action, risk_score=risk, reasons=reasons, metadata={}, subtypes=subtypes)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteAuditStore(str(tmp_path / "audit.db"), batch_size=1000, flush_interval=60)
+    yield store
+    store.close()
+
+
+class TestHelpers:
+    
+    def test_prompt_hash(self):
+        digest = prompt_hash("My SSN is 123-45-6789")
+        
+        assert len(digest) == HASH_BYTES
+        assert digest == prompt_hash("My SSN is 123-45-6789")
+        assert digest != prompt_hash("My SSN is 123-45-6789", key=b"secret")
+
+
+class TestSQLiteAuditStore:
+    
+    def test_batches_writes(self, tmp_path):
+        path = str(tmp_path / "audit.db")
+        store = SQLiteAuditStore(path, batch_size=3, flush_interval=60)
+        reader = sqlite3.connect(path)
+        
+        for _ in range(2):
+            store.record_result("hello", make_result("ALLOW", 0.0, []))
+        time.sleep(0.1)
+        assert reader.execute("SELECT COUNT(*) FROM decisions").fetchone()[0] == 0
+        
+        store.record_result("hello", make_result("ALLOW", 0.0, []))
+        assert wait_for(lambda: reader.execute("SELECT COUNT(*) FROM decisions").fetchone()[0] == 3)
+        assert reader.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        store.close()
+    
+    def test_flushes_after_interval(self, tmp_path):
+        store = SQLiteAuditStore(str(tmp_path / "audit.db"), flush_interval=0.05)
+        store.record_result("hello", make_result("ALLOW", 0.0, []))
+        
+        assert wait_for(lambda: not store._pending and not store._busy)
+        store.close()
+    
+    def test_record_never_waits_for_a_write(self, store):
+        # Holding the connection stands in for a slow transaction on the writer thread
+        with store._lock:
+            for _ in range(1001):
+                store.record_result("hello", make_result("ALLOW", 0.0, []))
+        
+        assert store.count() == 1001
+    
+    @pytest.mark.parametrize("overflow, kept", [("drop", 2), ("sample", 3)])
+    def test_bounded_queue(self, tmp_path, overflow, kept):
+        store = SQLiteAuditStore(
+            str(tmp_path / "audit.db"), batch_size=1000, flush_interval=60,
+            capacity=2, overflow=overflow, sample_every=2
+        )
+        with store._lock:
+            for index in range(5):
+                store.record_result(f"prompt {index}", make_result("ALLOW", 0.0, []))
+            stats = store.stats()
+        
+        assert stats["queued"] == 2
+        assert stats["recorded"] == kept
+        assert stats["dropped"] == 5 - 2
+        store.close()
+        assert store.stats()["written"] == 2
+    
+    def test_rejects_blocking_overflow(self, tmp_path):
+        with pytest.raises(ValueError):
+            SQLiteAuditStore(str(tmp_path / "audit.db"), overflow="block")
+    
+    def test_close_writes_queued_records(self, tmp_path):
+        path = str(tmp_path / "audit.db")
+        store = SQLiteAuditStore(path, batch_size=1000, flush_interval=60)
+        store.record_result("hello", make_result("ALLOW", 0.0, []))
+        store.close()
+        
+        assert sqlite3.connect(path).execute("SELECT COUNT(*) FROM decisions").fetchone()[0] == 1
+    
+    def test_never_stores_prompt_text(self, tmp_path, store):
+        store.record_result("My SSN is 123-45-6789", make_result("BLOCK", 0.9, ["SSN"]))
+        store.flush()
+        
+        assert b"123-45-6789" not in (tmp_path / "audit.db").read_bytes() + (tmp_path / "audit.db-wal").read_bytes()
+    
+    def test_queries(self, store):
+        now = time.time()
+        store.record(DecisionRecord(now - 8 * 86400, "BLOCK", 0.9, prompt_hash("old"), "s1", ["SSN"]))
+        store.record(DecisionRecord(now - 60, "BLOCK", 1.7, prompt_hash("new"), "s2", ["SSN", "PERSON"]))
+        store.record(DecisionRecord(now - 30, "BLOCK", 0.9, prompt_hash("mail"), "s1", ["Email"]))
+        store.record(DecisionRecord(now, "ALLOW", 0.0, prompt_hash("hi"), None, []))
+        
+        assert store.count() == 4
+        assert [r.session_id for r in store.query(action="BLOCK", subtype="SSN")] == ["s2", "s1"]
+        assert [r.subtypes for r in store.query(subtype="SSN", since=now - 7 * 86400)] == [["SSN", "PERSON"]]
+        assert store.count(session_id="s1", until=now - 3600) == 1
+        assert store.query(prompt="hi")[0].action == "ALLOW"
+        assert len(store.query(limit=2)) == 2
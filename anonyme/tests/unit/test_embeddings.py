@@ -0,0 +1,275 @@
+import time
+import hashlib
+import threading
+import numpy as np
+import pytest
+from datetime import datetime
+from anonyme.context import SENSITIVE_TOPICS, EmbeddingBasedContext, Message, MessageHistory
+from anonyme.embeddings import EmbeddingCache, ModelRegistry, normalize_rows
+
+
+class CountingEncoder:
+    
+    def __init__(self, dim: int = 16):
+        self.dim = dim
+        self.calls = []
+    
+    def encode(self, text):
+        self.calls.append(text)
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in text.lower().split():
+            vector[int(hashlib.md5(token.encode()).hexdigest(), 16) % self.dim] += 1.0
+        return vector
+
+
+@pytest.fixture
+def encoder():
+    return CountingEncoder()
+
+
+@pytest.fixture
+def model_registry(encoder):
+    return ModelRegistry(loader=lambda name: encoder)
+
+
+class TestEmbeddingCache:
+    
+    def test_encodes_each_text_once(self):
+        encoder = CountingEncoder()
+        cache = EmbeddingCache(encoder)
+        
+        first = cache.encode("hello world")
+        second = cache.encode("hello world")
+        
+        assert encoder.calls == ["hello world"]
+        assert np.array_equal(first, second)
+        assert cache.hits == 1
+        assert cache.misses == 1
+    
+    def test_cached_vectors_are_read_only(self):
+        vector = EmbeddingCache(CountingEncoder()).encode("hello")
+        
+        with pytest.raises(ValueError):
+            vector[0] = 1.0
+    
+    def test_bounded_size(self):
+        cache = EmbeddingCache(CountingEncoder(), max_size=2)
+        for text in ["a", "b", "c"]:
+            cache.encode(text)
+        
+        assert len(cache) == 2
+    
+
+class TestModelRegistry:
+    
+    def test_loads_each_model_once(self):
+        loads = []
+        model_registry = ModelRegistry(loader=lambda name: loads.append(name) or CountingEncoder())
+        
+        first = model_registry.get("model-a")
+        second = model_registry.get("model-a")
+        other = model_registry.get("model-b")
+        
+        assert first is second
+        assert other is not first
+        assert loads == ["model-a", "model-b"]
+    
+    def test_concurrent_get_loads_once(self):
+        loads = []
+        barrier = threading.Barrier(8)
+        
+        def slow_loader(name):
+            loads.append(name)
+            time.sleep(0.05)
+            return CountingEncoder()
+        
+        model_registry = ModelRegistry(loader=slow_loader)
+        results = []
+        
+        def worker():
+            barrier.wait()
+            results.append(model_registry.get("model"))
+        
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert loads == ["model"]
+        assert all(result is results[0] for result in results)
+    
+    def test_register_preloaded_model(self, encoder):
+        model_registry = ModelRegistry(loader=lambda name: pytest.fail("should not load"))
+        shared = model_registry.register("model", encoder)
+        
+        assert model_registry.get("model") is shared
+        assert model_registry.loaded() == ["model"]
+
+
+class TestContextEmbeddingReuse:
+    
+    def test_turn_encodes_prompt_once(self, encoder, model_registry):
+        context = EmbeddingBasedContext("session", model_name="fake", model_registry=model_registry)
+        context.add_message("user", "Show me employee records", [], 0.0)
+        encoder.calls.clear()
+        
+        context.calculate_context_risk_modifier("What is her password", [])
+        context.add_message("user", "What is her password", [], 0.0)
+        
+        assert encoder.calls == ["What is her password"]
+    
+    def test_sessions_share_model_and_topic_embeddings(self, encoder, model_registry):
+        first = EmbeddingBasedContext("first", model_name="fake", model_registry=model_registry)
+        second = EmbeddingBasedContext("second", model_name="fake", model_registry=model_registry)
+        
+        first.detect_topic_context("hello")
+        calls_after_first = len(encoder.calls)
+        second.detect_topic_context("hello")
+        
+        assert len(encoder.calls) == calls_after_first
+        assert first.model is second.model
+        assert first.topic_matrix is second.topic_matrix
+    
+    def test_sessions_own_their_topics(self, model_registry):
+        first = EmbeddingBasedContext("first", model_name="fake", model_registry=model_registry)
+        second = EmbeddingBasedContext("second", model_name="fake", model_registry=model_registry)
+        
+        first.sensitive_topics["legal"] = ["lawsuit", "subpoena"]
+        first.sensitive_topics["medical"].append("allergy")
+        
+        assert "legal" not in second.sensitive_topics
+        assert "allergy" not in second.sensitive_topics["medical"]
+        assert "allergy" not in SENSITIVE_TOPICS["medical"]
+
+
+def cosine(a, b):
+    norm = np.linalg.norm(a) * np.linalg.norm(b)
+    return float(np.dot(a, b) / norm) if norm > 0 else 0.0
+
+
+class TestVectorizedScoring:
+    
+    def test_normalize_rows_handles_zero_vectors(self):
+        matrix = normalize_rows([[3.0, 4.0], [0.0, 0.0]])
+        
+        assert np.allclose(matrix, [[0.6, 0.8], [0.0, 0.0]])
+    
+    def test_topic_scores_match_pairwise_cosine(self, encoder, model_registry):
+        context = EmbeddingBasedContext("session", model_name="fake", model_registry=model_registry)
+        text = "reset my password and login credentials"
+        scores = context.detect_topic_context(text)
+        
+        for topic, keywords in context.sensitive_topics.items():
+            expected = cosine(encoder.encode(text), encoder.encode(" ".join(keywords)))
+            assert scores[topic] == pytest.approx(expected, abs=1e-6)
+    
+    def test_topic_scores_batch(self, model_registry):
+        context = EmbeddingBasedContext("session", model_name="fake", model_registry=model_registry)
+        texts = ["my password", "patient diagnosis", "hello"]
+        
+        assert context.detect_topic_context_many(texts) == [context.detect_topic_context(t) for t in texts]
+    
+    def test_reference_chain_matches_pairwise_cosine(self, encoder, model_registry):
+        context = EmbeddingBasedContext("session", model_name="fake", model_registry=model_registry)
+        history = ["alpha beta", "gamma delta", "alpha beta gamma", "epsilon", "alpha", "beta alpha"]
+        for text in history:
+            context.add_message("user", text, [], 0.0)
+        
+        chain = context.find_reference_chain("alpha beta", threshold=0.5)
+        
+        expected = [
+            (content, cosine(encoder.encode("alpha beta"), encoder.encode(content)))
+            for content in reversed(history[-5:])
+        ]
+        expected = [(content, score) for content, score in expected if score > 0.5]
+        assert [(msg.content, pytest.approx(score, abs=1e-6)) for msg, score in chain] == expected
+    
+    def test_message_embeddings_bounded_by_history(self, model_registry):
+        context = EmbeddingBasedContext("session", model_name="fake", model_registry=model_registry, max_history=3)
+        for index in range(5):
+            context.add_message("user", f"message {index}", [], 0.0)
+        
+        assert len(context.messages) == 3
+        assert context.messages.embeddings.shape[0] == 3
+        assert context.messages.embeddings.dtype == np.float32
+        assert np.allclose(np.linalg.norm(context.messages.embeddings, axis=1), 1.0)
+    
+    def test_reference_chain_after_wraparound(self, encoder, model_registry):
+        context = EmbeddingBasedContext("session", model_name="fake", model_registry=model_registry, max_history=4)
+        history = [f"alpha {index}" if index % 2 else f"beta {index}" for index in range(9)]
+        for text in history:
+            context.add_message("user", text, [], 0.0)
+        
+        chain = context.find_reference_chain("alpha beta", threshold=-1.0)
+        
+        expected = [
+            (content, cosine(encoder.encode("alpha beta"), encoder.encode(content)))
+            for content in reversed(history[-4:])
+        ]
+        assert [(msg.content, pytest.approx(score, abs=1e-6)) for msg, score in chain] == expected
+
+    
+    def test_unembedded_turns_embedded_on_demand(self, encoder, model_registry):
+        context = EmbeddingBasedContext("session", model_name="fake", model_registry=model_registry)
+        context.add_message("user", "alpha beta", [], 0.9, embed=False)
+        
+        assert encoder.calls == []
+        assert list(context.risk_trend) == [0.9]
+        
+        chain = context.find_reference_chain("alpha beta")
+        
+        assert [msg.content for msg, _ in chain] == ["alpha beta"]
+        assert chain[0][1] == pytest.approx(1.0)
+        assert encoder.calls.count("alpha beta") == 1
+
+class TestMessageHistory:
+    
+    def message(self, content):
+        return Message(role="user", content=content, timestamp=datetime.now(), findings=[], risk_score=0.0)
+    
+    def test_keeps_newest_in_order(self):
+        history = MessageHistory(3)
+        for index in range(7):
+            history.append(self.message(str(index)), np.full(2, index, dtype=np.float32))
+        
+        assert [msg.content for msg in history] == ["4", "5", "6"]
+        assert [msg.content for msg in history.recent(2)] == ["5", "6"]
+        assert history.embeddings[history.slots()][:, 0].tolist() == [4.0, 5.0, 6.0]
+    
+    def test_buffer_allocated_once(self):
+        history = MessageHistory(2)
+        history.append(self.message("a"), np.ones(4))
+        buffer = history.embeddings
+        for index in range(5):
+            history.append(self.message(str(index)), np.ones(4))
+        
+        assert history.embeddings is buffer
+        assert buffer.shape == (2, 4)
+    
+    def test_clear(self):
+        history = MessageHistory(2)
+        history.append(self.message("a"), np.ones(4))
+        history.clear()
+        
+        assert len(history) == 0
+        assert list(history) == []
+        assert history.slots() == []
+    
+    def test_fill_missing_skips_overwritten_slots(self):
+        history = MessageHistory(1)
+        history.append(self.message("old"))
+        
+        def embed(texts):
+            # A new turn takes the slot while the old one is being embedded
+            history.append(self.message("new"))
+            return np.ones((len(texts), 4), dtype=np.float32)
+        
+        history.fill_missing(history.slots(), embed)
+        
+        assert [msg.content for msg in history] == ["new"]
+        assert not history.embedded(history.slots()[0])
+    
+    def test_rejects_empty_capacity(self):
+        with pytest.raises(ValueError):
+            MessageHistory(0)
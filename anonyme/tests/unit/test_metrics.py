@@ -0,0 +1,107 @@
+import sys
+import pytest
+import threading
+from anonyme.metrics import Histogram, Metrics
+
+
+class TestHistogram:
+    
+    def test_buckets_are_cumulative(self):
+        histogram = Histogram((0.001, 0.01, 0.1))
+        for value in (0.0005, 0.001, 0.005, 0.5):
+            histogram.observe(value)
+        
+        assert histogram.cumulative() == [("0.001", 2), ("0.01", 3), ("0.1", 3), ("+Inf", 4)]
+        assert histogram.count == 4
+        assert histogram.sum == pytest.approx(0.5065)
+    
+    def test_quantile_is_bucket_bound(self):
+        histogram = Histogram((0.001, 0.01, 0.1))
+        histogram.observe(0.0005, count=99)
+        histogram.observe(0.05)
+        
+        assert histogram.quantile(0.5) == 0.001
+        assert histogram.quantile(1.0) == 0.1
+        assert Histogram().quantile(0.5) == 0.0
+
+
+class TestMetrics:
+    
+    def test_timer_feeds_histograms_and_metadata(self):
+        metrics = Metrics()
+        timer = metrics.timer()
+        timer.add("regex", 0.002)
+        timer.add("regex", 0.001)
+        timer.finish("BLOCK")
+        
+        assert timer.as_metadata().startswith("regex=3.000,total=")
+        # Both regex passes of the call land in one observation
+        assert metrics.stages["regex"].count == 1
+        assert metrics.snapshot()["stages"]["total"]["count"] == 1
+        assert metrics.decisions == {"BLOCK": 1}
+    
+    def test_stage_after_finish_still_observed(self):
+        metrics = Metrics()
+        timer = metrics.timer()
+        timer.finish()
+        timer.add("ner", 0.5)
+        
+        assert metrics.stages["ner"].count == 1
+    
+    def test_stages_added_while_rendering(self):
+        metrics = Metrics()
+        timer = metrics.timer()
+        
+        def abandoned_stages():
+            for index in range(2000):
+                timer.add(f"stage{index}", 0.001)
+        
+        # Switch threads as often as possible so the two interleave
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        worker = threading.Thread(target=abandoned_stages)
+        try:
+            worker.start()
+            timer.finish()
+            while worker.is_alive():
+                timer.as_metadata()
+        finally:
+            worker.join()
+            sys.setswitchinterval(interval)
+        
+        assert metrics.stages["total"].count == 1
+        assert timer.as_metadata().count("=") == 2001
+    
+    def test_cache_hit_rate(self):
+        metrics = Metrics()
+        for hit in (True, True, False, True):
+            metrics.count_cache("result", hit)
+        
+        assert metrics.cache_hit_rates() == {"result": 0.75}
+    
+    def test_disabled_records_nothing(self):
+        metrics = Metrics(enabled=False)
+        metrics.observe("regex", 0.1)
+        metrics.count_cache("result", True)
+        metrics.record_call({"regex": 0.1}, "BLOCK")
+        
+        assert metrics.snapshot()["stages"] == {}
+        assert metrics.snapshot()["decisions"] == {}
+    
+    def test_prometheus_text(self):
+        metrics = Metrics(buckets=(0.01,))
+        metrics.observe("ner", 0.005)
+        metrics.count_cache("findings", False)
+        metrics.record_call({}, "ALLOW")
+        metrics.record_model_load("spacy/en_core_web_sm", 0.75)
+        
+        text = metrics.render({"in_flight": 2})
+        assert '# TYPE anonyme_stage_seconds histogram' in text
+        assert 'anonyme_stage_seconds_bucket{stage="ner",le="0.01"} 1' in text
+        assert 'anonyme_stage_seconds_bucket{stage="ner",le="+Inf"} 1' in text
+        assert 'anonyme_stage_seconds_count{stage="ner"} 1' in text
+        assert 'anonyme_cache_requests_total{kind="findings",outcome="miss"} 1' in text
+        assert 'anonyme_cache_hit_ratio{kind="findings"} 0.0' in text
+        assert 'anonyme_decisions_total{action="ALLOW"} 1' in text
+        assert 'anonyme_model_load_seconds{model="spacy/en_core_web_sm"} 0.75' in text
+        assert text.endswith("anonyme_in_flight 2\n")
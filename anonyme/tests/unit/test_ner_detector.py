@@ -1,4 +1,6 @@
+import sys
 import pytest
+import subprocess
 from anonyme.detectors.ner import NerDetector
 
 
@@ -73,3 +75,62 @@ class TestNerDetector:
             assert finding.subtype in ["PERSON", "ORG", "GPE", "DATE"]
             assert finding.confidence == 0.9
             assert finding.source == "ner"
+    
+    def test_finding_offsets(self, detector):
+        text = "Tell me about Alice Johnson"
+        findings = detector.detect(text)
+        
+        for finding in findings:
+            assert text[finding.start:finding.end] == finding.text
+    
+    def test_detect_many_matches_detect(self, detector):
+        texts = ["Tell me about Alice Johnson", "Hello there", "Microsoft is in Redmond"]
+        batched = detector.detect_many(texts, batch_size=2)
+        
+        assert len(batched) == len(texts)
+        for text, findings in zip(texts, batched):
+            assert [(f.subtype, f.start, f.end) for f in findings] == \
+                [(f.subtype, f.start, f.end) for f in detector.detect(text)]
+    
+    def test_ner_only_pipeline(self, detector):
+        components = detector.active_components
+        
+        assert "ner" in components
+        assert not set(components) & set(NerDetector.NON_NER_COMPONENTS)
+    
+    def test_full_pipeline_keeps_components(self):
+        full = NerDetector(ner_only=False)
+        minimal = NerDetector()
+        
+        assert set(minimal.active_components) < set(full.active_components)
+        text = "Alice Johnson works at Microsoft in Warsaw"
+        assert [(f.subtype, f.start) for f in full.detect(text)] == \
+            [(f.subtype, f.start) for f in minimal.detect(text)]
+
+
+class TestLazyImport:
+    
+    def _imports_spacy(self, source: str) -> bool:
+        result = subprocess.run(
+            [sys.executable, "-B", "-c", source + "\nimport sys; print('spacy' in sys.modules)"],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        return result.stdout.strip().splitlines()[-1] == "True"
+    
+    def test_import_does_not_load_spacy(self):
+        assert not self._imports_spacy("import anonyme.detectors; import anonyme.analyze")
+        assert not self._imports_spacy("import anonyme.interface.cli")
+    
+    def test_first_detection_loads_spacy(self):
+        assert self._imports_spacy(
+            "from anonyme.detectors import NerDetector; NerDetector().detect('Alice lives in Warsaw')"
+        )
+    
+    def test_lazy_package_attributes(self):
+        import anonyme.detectors as detectors
+        
+        assert detectors.NerDetector is NerDetector
+        with pytest.raises(AttributeError):
+            detectors.MissingDetector
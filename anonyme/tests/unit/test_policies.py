@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import pytest
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from anonyme.config.policies import ANY, PolicyEngine, PolicyError, PolicySet
+from anonyme.models.findings import Finding
+
+
+SPEC = {
+    "version": "1",
+    "default": {"weights": {"PERSON": 0.5}},
+    "policies": [
+        {"name": "hipaa", "match": {"regime": "HIPAA"}, "weights": {"DATE": 1.0, "PERSON": 1.0}, "actions": {"SSN": "BLOCK"}},
+        {"name": "support", "match": {"role": "support"}, "weights": {"Email": 0.0}},
+        {"name": "support-public", "match": {"role": "support", "classification": "public"}, "block_threshold": 2.0},
+    ],
+}
+
+
+def finding(subtype, confidence=1.0):
+    return Finding(type="PII", subtype=subtype, confidence=confidence, source="regex")
+
+
+# Set before forking, since an engine cannot be pickled
+forked_engine = None
+
+
+def watching_in_child():
+    alive = forked_engine._watcher.is_alive()
+    forked_engine.watch()
+    return alive, forked_engine._watcher.is_alive()
+
+
+def write_spec(path, spec, mtime=None):
+    path.write_text(json.dumps(spec))
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+class TestPolicySet:
+    
+    def test_empty_set_keeps_plain_confidence_sum(self):
+        policy = PolicySet().resolve()
+        findings = [finding("Email", 1.0), finding("PERSON", 0.9)]
+    
+        assert policy.score(findings) == 1.9
+        assert policy.action_for(0.5) == "REDACT"
+        assert policy.action_for(0.8) == "BLOCK"
+        assert policy.name == "default"
+    
+    def test_weights_from_default_and_matching_policies(self):
+        policies = PolicySet(SPEC)
+    
+        assert policies.resolve().score([finding("PERSON")]) == 0.5
+        assert policies.resolve({"regime": "HIPAA"}).score([finding("PERSON")]) == 1.0
+        # Subtypes no rule names keep weight 1.0
+        assert policies.resolve({"regime": "HIPAA"}).score([finding("Phone", 0.6)]) == 0.6
+    
+    def test_more_specific_policies_apply_last(self):
+        policies = PolicySet(SPEC)
+        policy = policies.resolve({"role": "support", "classification": "public", "regime": "HIPAA"})
+    
+        assert policy.name == "hipaa+support+support-public"
+        assert policy.score([finding("Email"), finding("DATE")]) == 1.0
+        assert policy.block_threshold == 2.0
+    
+    def test_forced_action_is_a_floor(self):
+        policy = PolicySet(SPEC).resolve({"regime": "HIPAA"})
+        ssn = [finding("SSN", 0.1)]
+    
+        assert policy.forced_action(ssn) == "BLOCK"
+        assert policy.action_for(policy.score(ssn), policy.forced_action(ssn)) == "BLOCK"
+        assert policy.is_decided(ssn)
+        assert not PolicySet(SPEC).resolve().is_decided(ssn)
+    
+    def test_unknown_scope_values_fall_back_to_any(self):
+        policies = PolicySet(SPEC)
+    
+        assert policies.resolve({"role": "intern", "regime": "PCI"}) is policies.resolve()
+        assert policies._table[(ANY, ANY, ANY)] is policies.resolve({})
+    
+    def test_namespace_follows_resolved_rules(self):
+        policies = PolicySet(SPEC)
+    
+        assert policies.resolve().namespace == PolicySet(SPEC).resolve().namespace
+        assert policies.resolve().namespace != policies.resolve({"regime": "HIPAA"}).namespace
+        # A classification only matters together with the support role
+        assert policies.resolve({"classification": "public"}).namespace == policies.resolve().namespace
+    
+    @pytest.mark.parametrize("spec", [
+        {"default": {"weights": {"SSN": -1}}},
+        {"policies": [{"actions": {"SSN": "ALLOW"}}]},
+        {"policies": [{"match": {"team": "red"}}]},
+        {"default": {"block_threshold": "high"}},
+        ["not", "a", "mapping"],
+        {"default": {"weights": [1, 2]}},
+        {"policies": [{"actions": "BLOCK"}]},
+        {"policies": [{"match": ["regime"]}]},
+        {"policies": {"hipaa": {}}},
+        {"policies": ["hipaa"]},
+        {"default": []},
+        {"default": {"block_threshold": float("nan")}},
+        {"default": {"weights": {"SSN": float("inf")}}},
+        {"default": {"redact_threshold": -0.1}},
+        {"default": {"redact_threshold": 0.9}},
+        {"policies": [{"match": {"role": "support"}, "block_threshold": 0.3}]},
+    ])
+    def test_rejects_invalid_specs(self, spec):
+        with pytest.raises(PolicyError):
+            PolicySet(spec)
+
+
+class TestPolicyEngine:
+    
+    def test_reloads_when_file_changes(self, tmp_path):
+        path = tmp_path / "policies.json"
+        write_spec(path, SPEC, mtime=1_000_000)
+        engine = PolicyEngine.from_file(str(path), check_interval=0)
+        before = engine.resolve({"regime": "HIPAA"})
+    
+        changed = dict(SPEC, version="2", policies=[])
+        write_spec(path, changed, mtime=1_000_100)
+        assert engine.reload()
+        after = engine.resolve({"regime": "HIPAA"})
+    
+        assert before.name == "hipaa"
+        assert after.name == "default"
+        assert engine.stats()["version"] == "2"
+        assert engine.reloads == 1
+        assert not engine.reload()
+    
+    def test_watcher_reloads_in_background(self, tmp_path):
+        path = tmp_path / "policies.json"
+        write_spec(path, SPEC, mtime=1_000_000)
+        engine = PolicyEngine.from_file(str(path), check_interval=0.01)
+        try:
+            write_spec(path, dict(SPEC, version="2"), mtime=1_000_100)
+            deadline = time.monotonic() + 5
+            while engine.reloads == 0 and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            engine.close()
+    
+        assert engine.reloads == 1
+        assert engine.policies.version == "2"
+    
+    def test_resolve_never_reads_the_file(self, tmp_path):
+        path = tmp_path / "policies.json"
+        write_spec(path, SPEC, mtime=1_000_000)
+        engine = PolicyEngine.from_file(str(path), check_interval=0)
+        engine.resolve()
+    
+        write_spec(path, {"version": "2"}, mtime=1_000_100)
+    
+        assert engine.resolve().namespace == PolicySet(SPEC).resolve().namespace
+        assert engine.reload()
+        assert engine.policies.version == "2"
+    
+    @pytest.mark.parametrize("content", ["{not json", json.dumps({"default": {"weights": [1, 2]}})])
+    def test_bad_file_keeps_current_policies(self, tmp_path, content):
+        path = tmp_path / "policies.json"
+        write_spec(path, SPEC, mtime=1_000_000)
+        engine = PolicyEngine.from_file(str(path), check_interval=0)
+    
+        path.write_text(content)
+        os.utime(path, (1_000_100, 1_000_100))
+    
+        assert not engine.reload()
+        assert engine.resolve({"regime": "HIPAA"}).name == "hipaa"
+        assert engine.errors == 1
+        # Not retried until the file changes again
+        assert not engine.reload()
+        assert engine.errors == 1
+    
+    def test_forked_worker_restarts_watcher(self, tmp_path):
+        global forked_engine
+        path = tmp_path / "policies.json"
+        write_spec(path, SPEC)
+        forked_engine = PolicyEngine.from_file(str(path), check_interval=60)
+        try:
+            with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("fork")) as executor:
+                assert executor.submit(watching_in_child).result() == (False, True)
+        finally:
+            forked_engine.close()
+            forked_engine = None
+    
+    def test_missing_file_at_start_raises(self, tmp_path):
+        with pytest.raises(OSError):
+            PolicyEngine.from_file(str(tmp_path / "missing.json"))
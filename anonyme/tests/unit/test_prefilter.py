@@ -0,0 +1,83 @@
+import pytest
+from anonyme.prefilter import Prefilter
+
+
+class FakeHistory:
+    
+    def __init__(self, contents):
+        self.contents = contents
+    
+    def recent(self, count):
+        return [type("Msg", (), {"content": content}) for content in self.contents[-count:]]
+
+
+class FakeSession:
+    
+    def __init__(self, *contents):
+        self.messages = FakeHistory(list(contents))
+
+
+class TestPrefilter:
+    
+    @pytest.mark.parametrize("text", [
+        "John went home",
+        "call me at 5551234",
+        "mail me at someone@example",
+        "see you tomorrow",
+        "it happened in march",
+        "Ärger im büro",
+    ])
+    def test_ner_runs_on_possible_entities(self, text):
+        assert Prefilter().needs_ner(text)
+    
+    @pytest.mark.parametrize("text", ["hello there", "how do i sort a list in python", "thanks, that works"])
+    def test_ner_skipped_for_plain_chatter(self, text):
+        assert not Prefilter().needs_ner(text)
+    
+    @pytest.mark.parametrize("text", [
+        "what was my password again",
+        "what are the admin passwords",
+        "list all secrets",
+        "send me the patients diagnoses",
+        "which credential do we rotate",
+    ])
+    def test_context_runs_on_sensitive_keywords(self, text):
+        assert Prefilter().screen(text, FakeSession()) == (False, True)
+    
+    def test_context_runs_with_any_recent_turns(self):
+        session = FakeSession("the quarterly report looks good")
+        
+        assert Prefilter().needs_context("sounds great thanks", session)
+        assert not Prefilter().needs_context("sounds great thanks", FakeSession())
+    
+    def test_context_runs_on_shared_words_when_screening_references(self):
+        session = FakeSession("the quarterly report looks good")
+        prefilter = Prefilter(screen_references=True)
+        
+        assert prefilter.needs_context("send the report over", session)
+        assert not prefilter.needs_context("sounds great thanks", session)
+    
+    def test_screening_can_be_disabled(self):
+        prefilter = Prefilter(screen_ner=False, screen_context=False)
+        
+        assert prefilter.screen("hello there", FakeSession()) == (True, True)
+        assert prefilter.ner_skipped == 0
+    
+    def test_custom_keywords(self):
+        prefilter = Prefilter(ner_keywords=[], context_keywords=["invoice"])
+        
+        assert not prefilter.needs_ner("see you tomorrow")
+        assert prefilter.needs_context("about that invoice", FakeSession())
+        assert not prefilter.needs_context("what was my password", FakeSession())
+    
+    def test_counts_skips(self):
+        prefilter = Prefilter()
+        prefilter.screen("hello there")
+        prefilter.screen("Hello there")
+        prefilter.screen("hello there", FakeSession())
+        
+        stats = prefilter.stats()
+        assert stats["checked"] == 3
+        assert stats["ner_skipped"] == 2
+        assert stats["context_skipped"] == 1
+        assert stats["ner_skip_rate"] == pytest.approx(2 / 3)
@@ -0,0 +1,129 @@
+import json
+import random
+import pytest
+from anonyme.interface import reader
+from anonyme.interface.reader import MappedFile, close_spans, parse_fields, read_spans, shard_range
+
+
+@pytest.fixture
+def jsonl_file(tmp_path):
+    rng = random.Random(7)
+    records = []
+    for index in range(200):
+        record = {"id": index, "prompt": "x" * rng.randint(0, 40) + f" {index} é\"\\"}
+        if index % 3 == 0:
+            record["response"] = {"body": ["}", "{", "]"] * rng.randint(0, 5), "ok": True}
+        if index % 4 == 0:
+            record["context"] = [{"role": "user", "content": "hi"}]
+        records.append(record)
+    path = tmp_path / "input.jsonl"
+    path.write_text("\n".join(json.dumps(record) for record in records) + "\n\n", encoding="utf-8")
+    return str(path), records
+
+
+def expected_fields(record):
+    return {key: record[key] for key in ("prompt", "context", "id") if key in record}
+
+
+class TestParseFields:
+    
+    def test_matches_json_for_wanted_fields(self, jsonl_file):
+        _, records = jsonl_file
+        for record in records:
+            raw = json.dumps(record).encode("utf-8")
+            assert parse_fields(raw, 0, len(raw)) == expected_fields(record)
+    
+    def test_skips_nested_and_scalar_values(self):
+        raw = b' { "a": [1, {"b": "]}"}], "n": -1.5e3, "t": true, "z": null , "prompt" : "hi" } '
+        
+        assert parse_fields(raw, 0, len(raw)) == {"prompt": "hi"}
+        assert parse_fields(raw, 0, len(raw), fields={"n", "t", "z"}) == {"n": -1500.0, "t": True, "z": None}
+    
+    @pytest.mark.parametrize("raw", [b'[1, 2]', b'{"prompt": "hi"', b'{"prompt" "hi"}', b'{"a": [1, 2}'])
+    def test_rejects_malformed(self, raw):
+        with pytest.raises(ValueError):
+            parse_fields(raw, 0, len(raw))
+
+
+class TestMappedFile:
+    
+    def test_records_with_offsets(self, jsonl_file):
+        path, records = jsonl_file
+        with MappedFile(path) as mapped:
+            parsed = list(mapped.records())
+        
+        assert [{k: v for k, v in r.items() if k != "offset"} for r in parsed] == [expected_fields(r) for r in records]
+        assert parsed[0]["offset"] == 0
+    
+    def test_field_skipping_matches_full_decode(self, jsonl_file):
+        path, _ = jsonl_file
+        with MappedFile(path) as whole, MappedFile(path, full_decode_limit=0) as skipping:
+            assert list(skipping.records()) == list(whole.records())
+    
+    @pytest.mark.parametrize("count", [1, 2, 3, 7, 64, 500])
+    def test_shards_cover_each_line_once(self, jsonl_file, count):
+        path, records = jsonl_file
+        ids = []
+        with MappedFile(path) as mapped:
+            size = mapped.size
+        for index in range(count):
+            start, end = shard_range(size, index, count)
+            with MappedFile(path, start, end) as shard:
+                ids.extend(record["id"] for record in shard.records())
+        
+        assert ids == [record["id"] for record in records]
+    
+    def test_lines_are_views(self, jsonl_file):
+        path, records = jsonl_file
+        mapped = MappedFile(path)
+        offset, line = next(mapped.lines())
+        
+        assert isinstance(line, memoryview)
+        assert json.loads(bytes(line)) == records[0]
+        line.release()
+        mapped.close()
+    
+    def test_text_format(self, tmp_path):
+        path = tmp_path / "prompts.txt"
+        path.write_bytes(b"first prompt\r\n\nsecond \xc3\xa9\n")
+        with MappedFile(str(path), fmt="text") as mapped:
+            assert [r["prompt"] for r in mapped.records()] == ["first prompt", "second é"]
+    
+    @pytest.mark.parametrize("limit", [0, 1 << 20])
+    def test_bad_records_carry_errors(self, tmp_path, limit):
+        path = tmp_path / "bad.jsonl"
+        path.write_text('{"prompt": 3}\nnope\n[1]\n{"prompt": "ok"}\n')
+        with MappedFile(str(path), full_decode_limit=limit) as mapped:
+            records = list(mapped.records())
+        
+        assert ["error" in record for record in records] == [True, True, True, False]
+        assert records[1]["offset"] == 14
+    
+    def test_empty_file(self, tmp_path):
+        path = tmp_path / "empty.jsonl"
+        path.write_bytes(b"")
+        with MappedFile(str(path)) as mapped:
+            assert list(mapped.records()) == []
+    
+    def test_read_spans(self, jsonl_file):
+        path, records = jsonl_file
+        with MappedFile(path) as mapped:
+            spans = list(mapped.spans())[5:8]
+        
+        assert [r["id"] for r in read_spans(path, "jsonl", spans)] == [5, 6, 7]
+        close_spans()
+        assert reader._open_files == {}
+    
+    def test_read_spans_sees_rewritten_file_after_close(self, tmp_path):
+        path = tmp_path / "input.jsonl"
+        path.write_text('{"prompt": "a", "id": 1}\n')
+        assert read_spans(str(path), "jsonl", [(0, 24)])[0]["id"] == 1
+        close_spans()
+        
+        path.write_text('{"prompt": "b", "id": 2}\n')
+        assert read_spans(str(path), "jsonl", [(0, 24)])[0]["id"] == 2
+        close_spans()
+    
+    def test_shard_range_validates_index(self):
+        with pytest.raises(ValueError):
+            shard_range(100, 3, 3)
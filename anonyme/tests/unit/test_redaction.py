@@ -0,0 +1,51 @@
+from anonyme.redaction import redact, merge_spans, mask_for
+from anonyme.detectors.regex import RegexDetector
+from anonyme.models.findings import Finding
+
+
+class TestRedaction:
+    
+    def test_no_findings_returns_text(self):
+        assert redact("Hello world", []) == "Hello world"
+    
+    def test_single_span_replaced(self):
+        findings = [
+            Finding(type="PII", subtype="Email", confidence=1.0, source="regex",
+                    start=6, end=22, text="john@example.com")
+        ]
+        
+        assert redact("Email john@example.com now", findings) == "Email [EMAIL] now"
+    
+    def test_findings_without_offsets_are_ignored(self):
+        findings = [
+            Finding(type="PII", subtype="PERSON", confidence=0.9, source="ner")
+        ]
+        
+        assert redact("Alice", findings) == "Alice"
+    
+    def test_overlapping_spans_merged(self):
+        findings = [
+            Finding(type="PII", subtype="Phone", confidence=1.0, source="regex", start=4, end=10),
+            Finding(type="PII", subtype="SSN", confidence=1.0, source="regex", start=0, end=8),
+        ]
+        
+        assert merge_spans(findings) == [(0, 10, "SSN")]
+        assert redact("0123456789 tail", findings) == "[SSN] tail"
+    
+    def test_every_span_of_a_finding_replaced(self):
+        findings = [
+            Finding(type="PII", subtype="Email", confidence=1.0, source="regex",
+                    start=0, end=6, text="a@b.io", spans=((0, 6), (11, 17)))
+        ]
+        
+        assert redact("a@b.io and c@d.io", findings) == "[EMAIL] and [EMAIL]"
+    
+    def test_mask_format(self):
+        assert mask_for("Credit Card") == "[CREDIT_CARD]"
+        assert mask_for("PERSON") == "[PERSON]"
+    
+    def test_redact_regex_findings(self):
+        text = "Mail alice@example.com or bob@example.org, SSN 123-45-6789"
+        findings = RegexDetector().detect(text)
+        
+        assert redact(text, findings) == "Mail [EMAIL] or [EMAIL], SSN [SSN]"
@@ -1,4 +1,5 @@
 import pytest
+import re
 from anonyme.detectors.regex import RegexDetector
 from anonyme.models.findings import Finding
 
@@ -100,3 +101,38 @@ class TestRegexDetector:
         
         has_api_key = any(f.subtype == "API Key or Token" for f in findings)
         assert not has_api_key
+    
+    @pytest.mark.parametrize("text", [
+        "SSN 123-45-6789, card 1234 5678 9012 3456, mail bob99@mail.example.org, key abc123def456ghi789jkl0",
+        "Call +44 (20) 7946 0958 or mail ops@example.org",
+        "Card 1234567890123456, no dashes or mail here",
+        "no digits, mail or keys at all",
+        "token_ABCDEFGHIJKLMNOPQRST-xyz\tand a-b-c",
+    ])
+    def test_scan_matches_individual_patterns(self, detector, text):
+        spans = detector.scan(text)
+        
+        expected = dict(detector.patterns)
+        expected["API Key or Token"] = detector.api_key_pattern
+        for name, pattern in expected.items():
+            assert spans[name] == [m.span() for m in re.finditer(pattern, text)]
+    
+    def test_overlapping_patterns_all_reported(self, detector):
+        findings = detector.detect("My SSN is 123-45-6789")
+        
+        types = [f.subtype for f in findings]
+        assert types == ["SSN", "Phone"]
+    
+    def test_finding_offsets(self, detector):
+        text = "Mail a@example.com and b@example.com"
+        findings = [f for f in detector.detect(text) if f.subtype == "Email"]
+        
+        assert len(findings) == 1
+        assert text[findings[0].start:findings[0].end] == findings[0].text == "a@example.com"
+        assert [text[start:end] for start, end in findings[0].spans] == ["a@example.com", "b@example.com"]
+    
+    def test_one_finding_per_subtype(self, detector):
+        findings = detector.detect("Order 12345 shipped 2024-05-01, invoice 98765 and 55512 and 1234")
+        
+        assert [f.subtype for f in findings] == ["Phone"]
+        assert len(findings[0].spans) == 5
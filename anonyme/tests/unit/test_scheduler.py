@@ -0,0 +1,128 @@
+import asyncio
+import threading
+import pytest
+from anonyme.scheduler import MicroBatchScheduler
+from anonyme.detectors.batched import BatchedDetector
+from anonyme.detectors.regex import RegexDetector
+
+
+class RecordingBatch:
+    
+    def __init__(self):
+        self.batches = []
+        self.lock = threading.Lock()
+    
+    def __call__(self, items):
+        with self.lock:
+            self.batches.append(list(items))
+        return [item * 2 for item in items]
+
+
+class TestMicroBatchScheduler:
+    
+    def test_single_item_returns_result(self):
+        with MicroBatchScheduler(RecordingBatch(), max_wait_ms=1) as scheduler:
+            assert scheduler(21) == 42
+    
+    def test_concurrent_threads_share_batches(self):
+        process = RecordingBatch()
+        barrier = threading.Barrier(8)
+        results = {}
+        
+        with MicroBatchScheduler(process, max_batch_size=8, max_wait_ms=200) as scheduler:
+            def worker(value):
+                barrier.wait()
+                results[value] = scheduler(value)
+            
+            threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        
+        assert results == {i: i * 2 for i in range(8)}
+        assert len(process.batches) < 8
+        assert sum(len(batch) for batch in process.batches) == 8
+    
+    def test_batch_size_limit(self):
+        process = RecordingBatch()
+        scheduler = MicroBatchScheduler(process, max_batch_size=3, max_wait_ms=50)
+        futures = [scheduler.submit(i) for i in range(7)]
+        
+        assert [f.result(timeout=5) for f in futures] == [i * 2 for i in range(7)]
+        assert all(len(batch) <= 3 for batch in process.batches)
+        scheduler.stop()
+    
+    def test_asyncio_callers(self):
+        process = RecordingBatch()
+        scheduler = MicroBatchScheduler(process, max_batch_size=16, max_wait_ms=50)
+        
+        async def scenario():
+            return await asyncio.gather(*(scheduler.submit_async(i) for i in range(5)))
+        
+        assert asyncio.run(scenario()) == [0, 2, 4, 6, 8]
+        assert len(process.batches) == 1
+        scheduler.stop()
+    
+    def test_errors_reach_every_caller(self):
+        def failing(items):
+            raise ValueError("boom")
+        
+        with MicroBatchScheduler(failing, max_wait_ms=1) as scheduler:
+            future = scheduler.submit("x")
+            with pytest.raises(ValueError):
+                future.result(timeout=5)
+    
+    def test_submit_after_stop_raises(self):
+        scheduler = MicroBatchScheduler(RecordingBatch(), max_wait_ms=1)
+        assert scheduler("x") == "xx"
+        scheduler.stop()
+        
+        with pytest.raises(RuntimeError):
+            scheduler.submit("y")
+        scheduler.start()
+        assert scheduler("y") == "yy"
+        scheduler.stop()
+    
+    def test_wrong_result_count_is_an_error(self):
+        with MicroBatchScheduler(lambda items: [], max_wait_ms=1) as scheduler:
+            with pytest.raises(RuntimeError):
+                scheduler("x")
+
+
+class TestBatchedDetector:
+    
+    def test_matches_wrapped_detector(self):
+        detector = RegexDetector()
+        batched = BatchedDetector(detector, max_wait_ms=1)
+        text = "Mail me at test@example.com"
+        
+        try:
+            assert batched.detect(text) == detector.detect(text)
+        finally:
+            batched.close()
+    
+    def test_direct_batches_never_overlap_scheduled_ones(self):
+        class ExclusiveDetector(RegexDetector):
+            
+            def __init__(self):
+                super().__init__()
+                self.running = threading.Lock()
+            
+            def detect_many(self, texts, **kwargs):
+                assert self.running.acquire(blocking=False), "two batches ran at once"
+                try:
+                    threading.Event().wait(0.005)
+                    return super().detect_many(texts, **kwargs)
+                finally:
+                    self.running.release()
+        
+        batched = BatchedDetector(ExclusiveDetector(), max_wait_ms=1)
+        direct = threading.Thread(target=lambda: [batched.detect_many(["a@example.com"] * 4) for _ in range(20)])
+        try:
+            direct.start()
+            for _ in range(20):
+                assert batched.detect("Mail a@example.com")[0].subtype == "Email"
+            direct.join()
+        finally:
+            batched.close()
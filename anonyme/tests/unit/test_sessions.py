@@ -0,0 +1,223 @@
+import hashlib
+import threading
+import numpy as np
+import pytest
+from anonyme.embeddings import ModelRegistry
+from anonyme.models.findings import Finding
+from anonyme.sessions import SessionManager, SQLiteSessionStore, dump_context, load_context
+
+
+class HashEncoder:
+
+    def encode(self, text):
+        vector = np.zeros(16, dtype=np.float32)
+        for token in text.lower().split():
+            vector[int(hashlib.md5(token.encode()).hexdigest(), 16) % 16] += 1.0
+        return vector
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def model_registry():
+    return ModelRegistry(loader=lambda name: HashEncoder())
+
+
+@pytest.fixture
+def store():
+    store = SQLiteSessionStore()
+    yield store
+    store.close()
+
+
+class SlowStore(SQLiteSessionStore):
+    """Blocks loading and saving ``slow_id`` until ``release`` is set."""
+
+    def __init__(self, slow_id):
+        super().__init__()
+        self.slow_id = slow_id
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def _wait(self, session_id):
+        if session_id == self.slow_id:
+            self.entered.set()
+            assert self.release.wait(5)
+
+    def load(self, session_id):
+        self._wait(session_id)
+        return super().load(session_id)
+
+    def save(self, record):
+        self._wait(record.session_id)
+        super().save(record)
+
+
+def make_manager(model_registry, **kwargs):
+    kwargs.setdefault("model_name", "fake")
+    return SessionManager(model_registry=model_registry, **kwargs)
+
+
+def add_turns(context, count):
+    for index in range(count):
+        finding = Finding(type="PII", subtype="Email", confidence=1.0, source="regex", start=0, end=5, text="a@b.c")
+        context.add_message("user", f"turn {index} about alpha", [finding], 0.1 * index)
+
+
+class TestSerialization:
+
+    @pytest.mark.parametrize("dtype", [np.float16, np.float32])
+    def test_round_trip(self, model_registry, dtype):
+        manager = make_manager(model_registry)
+        context = manager.acquire("s1")
+        add_turns(context, 4)
+
+        restored = load_context(dump_context(context, dtype), model_registry)
+
+        assert [msg.content for msg in restored.messages] == [msg.content for msg in context.messages]
+        assert [msg.findings for msg in restored.messages] == [msg.findings for msg in context.messages]
+        assert list(restored.risk_trend) == list(context.risk_trend)
+        assert restored.entity_memory == context.entity_memory
+        original = context.messages.embeddings[context.messages.slots()]
+        assert np.allclose(restored.messages.embeddings[restored.messages.slots()], original, atol=1e-3)
+
+    def test_float16_halves_embedding_bytes(self, model_registry):
+        context = make_manager(model_registry).acquire("s1")
+        add_turns(context, 3)
+
+        assert len(dump_context(context, np.float16).embeddings) * 2 == len(dump_context(context, np.float32).embeddings)
+
+    def test_empty_session(self, model_registry):
+        context = make_manager(model_registry).acquire("s1")
+
+        restored = load_context(dump_context(context), model_registry)
+
+        assert len(restored.messages) == 0
+
+
+class TestSessionManager:
+
+    def test_reuses_live_session(self, model_registry):
+        manager = make_manager(model_registry)
+
+        with manager.lease("s1") as first, manager.lease("s1") as second:
+            assert first is second
+
+    def test_idle_sessions_evicted_and_rehydrated(self, model_registry, store):
+        clock = FakeClock()
+        manager = make_manager(model_registry, store=store, idle_ttl=10.0, clock=clock)
+        with manager.lease("s1") as context:
+            add_turns(context, 2)
+
+        clock.now = 11.0
+        manager.evict_idle()
+
+        assert "s1" not in manager
+        assert len(store) == 1
+        with manager.lease("s1") as context:
+            assert [msg.content for msg in context.messages] == ["turn 0 about alpha", "turn 1 about alpha"]
+        assert manager.rehydrations == 1
+
+    def test_max_sessions_evicts_least_recently_used(self, model_registry, store):
+        manager = make_manager(model_registry, store=store, max_sessions=2)
+        for session_id in ["a", "b"]:
+            with manager.lease(session_id):
+                pass
+        with manager.lease("a"):
+            pass
+        with manager.lease("c"):
+            pass
+
+        assert "b" not in manager
+        assert "a" in manager and "c" in manager
+        assert manager.evictions == 1
+
+    def test_memory_budget(self, model_registry):
+        manager = make_manager(model_registry, max_memory_bytes=4000)
+        for session_id in ["a", "b", "c"]:
+            with manager.lease(session_id) as context:
+                add_turns(context, 5)
+
+        assert manager.memory_bytes <= 4000
+        assert len(manager) < 3
+
+    def test_leased_session_not_evicted(self, model_registry):
+        clock = FakeClock()
+        manager = make_manager(model_registry, idle_ttl=1.0, max_sessions=1, clock=clock)
+        context = manager.acquire("busy")
+
+        clock.now = 5.0
+        with manager.lease("other"):
+            pass
+
+        assert "busy" in manager
+        manager.release("busy")
+        assert manager.acquire("busy") is context
+
+    def test_without_store_evicted_sessions_start_fresh(self, model_registry):
+        manager = make_manager(model_registry, max_sessions=1)
+        with manager.lease("a") as context:
+            add_turns(context, 1)
+        with manager.lease("b"):
+            pass
+
+        with manager.lease("a") as context:
+            assert len(context.messages) == 0
+
+    def test_drop_removes_stored_state(self, model_registry, store):
+        manager = make_manager(model_registry, store=store)
+        with manager.lease("a") as context:
+            add_turns(context, 1)
+        manager.flush()
+
+        manager.drop("a")
+
+        assert "a" not in manager
+        assert store.load("a") is None
+
+    def test_slow_load_does_not_block_other_sessions(self, model_registry):
+        store = SlowStore("slow")
+        manager = make_manager(model_registry, store=store)
+        loader = threading.Thread(target=manager.acquire, args=("slow",))
+        loader.start()
+        assert store.entered.wait(5)
+
+        with manager.lease("fast"):
+            pass
+
+        store.release.set()
+        loader.join(5)
+        assert "slow" in manager and "fast" in manager
+        store.close()
+
+    def test_slow_save_does_not_block_other_sessions(self, model_registry):
+        store = SlowStore(None)
+        manager = make_manager(model_registry, store=store, max_sessions=1)
+        with manager.lease("slow") as context:
+            add_turns(context, 1)
+        store.slow_id = "slow"
+        evictor = threading.Thread(target=manager.evict_idle)
+        manager.max_sessions = 0
+        evictor.start()
+        assert store.entered.wait(5)
+
+        with manager.lease("fast"):
+            pass
+
+        # Reloading waits for the pending save instead of reading stale state
+        reader = threading.Thread(target=manager.acquire, args=("slow",))
+        reader.start()
+        assert reader.is_alive()
+        store.release.set()
+        evictor.join(5)
+        reader.join(5)
+        with manager.lease("slow") as context:
+            assert len(context.messages) == 1
+        store.close()
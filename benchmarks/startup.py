@@ -0,0 +1,99 @@
+"""
+Startup latency of the Anonyme entry points.
+
+Every measurement runs in a fresh interpreter, so nothing is warm from an
+earlier run:
+
+    python benchmarks/startup.py --repeat 5
+
+``import`` rows time the import alone and say whether spaCy was pulled in;
+``first call`` is the first ``analyze`` after import, which loads the NER
+model, and ``second call`` is the steady state after it.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+print(json.dumps({{"seconds": time.perf_counter() - start, "spacy": "spacy" in sys.modules}}))
+"""
+
+CALL_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+from anonyme.analyze import analyze
+imported = time.perf_counter()
+analyze({prompt!r}, [])
+first = time.perf_counter()
+analyze({prompt!r} + " again", [])
+second = time.perf_counter()
+print(json.dumps({{
+    "import": imported - start,
+    "first": first - imported,
+    "second": second - first,
+}}))
+"""
+
+MODULES = ["anonyme.interface.cli", "anonyme.detectors", "anonyme.analyze"]
+
+
+def _probe(source: str) -> Dict:
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    result = subprocess.run(
+        [sys.executable, "-B", "-c", source],
+        capture_output=True, text=True, cwd=ROOT, env=env, check=True
+    )
+    # Loggers may print to stdout; the probe's report is the last line
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _wall(args: List[str]) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-B", *args], capture_output=True, cwd=ROOT, check=True)
+    return time.perf_counter() - start
+
+
+def _row(label: str, samples: List[float], note: str = "") -> str:
+    return f"{label:<36} {statistics.median(samples) * 1000:9.1f} ms  {note}".rstrip()
+
+
+def run(repeat: int, prompt: str) -> List[str]:
+    rows = []
+    for module in MODULES:
+        probes = [_probe(IMPORT_PROBE.format(module=module)) for _ in range(repeat)]
+        note = "(imports spaCy)" if any(p["spacy"] for p in probes) else ""
+        rows.append(_row(f"import {module}", [p["seconds"] for p in probes], note))
+
+    version = [_wall(["-m", "anonyme.interface.cli", "--version"]) for _ in range(repeat)]
+    rows.append(_row("cli --version (wall)", version))
+
+    calls = [_probe(CALL_PROBE.format(prompt=prompt)) for _ in range(repeat)]
+    rows.append(_row("first call (loads NER model)", [c["first"] for c in calls]))
+    rows.append(_row("second call", [c["second"] for c in calls]))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per measurement (default: 3)")
+    parser.add_argument("--prompt", default="Contact Alice at alice@example.com", help="Prompt for the call latency rows")
+    args = parser.parse_args()
+
+    print(f"median of {args.repeat} run(s), python {sys.version.split()[0]}")
+    for row in run(args.repeat, args.prompt):
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+"""
+Throughput and latency of the detectors, context scoring and ``analyze``.
+
+Every case runs over a synthetic corpus generated from a fixed seed, so
+the same command measures the same prompts on every commit:
+
+    python benchmarks/suite.py                      # stub models, offline
+    python benchmarks/suite.py --models real        # en_core_web_sm + sentence-transformers
+    python benchmarks/suite.py --json after.json --baseline before.json
+
+Prompts vary by length in words and by PII density, the share of words
+that are an email, phone number, SSN, card number or a name, organisation
+or place. With ``--models stub`` (the default) NER is a blank spaCy
+pipeline with an entity ruler over the same names, and embeddings are
+hashed bags of words: nothing is downloaded, and the numbers cover the
+pipeline around the models rather than the models themselves.
+
+Results are printed and written to ``bench_output.txt``; ``--json`` saves
+them with the commit they were measured on, and ``--baseline`` adds the
+change against such a file to each row.
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import random
+import argparse
+import platform
+import statistics
+import subprocess
+from dataclasses import dataclass, field, asdict
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from anonyme import analyze as pipeline
+from anonyme.context import EmbeddingBasedContext
+from anonyme.detectors.ner import NerDetector
+from anonyme.detectors.regex import RegexDetector
+from anonyme.embeddings import ModelRegistry, registry
+from anonyme.logging.audit import LoggerManager
+
+
+FILLER = (
+    "the a to of and in for on with about please can you help me write check "
+    "send review update report meeting project budget draft email summary notes "
+    "tomorrow today last week quarter client team schedule call invoice order "
+    "account details question reply thanks regarding following attached before "
+    "after new old plan status issue ticket access request data file share"
+).split()
+
+PEOPLE = ["Alice Johnson", "Bob Smith", "Maria Garcia", "Wei Chen", "Priya Patel", "John Doe"]
+ORGS = ["Acme Corp", "Globex", "Initech", "Umbrella Health", "Stark Industries"]
+PLACES = ["Warsaw", "London", "New York", "Berlin", "Tokyo", "Chicago"]
+
+LENGTHS = (16, 128, 1024)
+DENSITIES = (0.0, 0.05, 0.2)
+HISTORY_SIZES = (0, 5, 20, 100)
+QUICK_LENGTHS = (16, 128)
+QUICK_HISTORY_SIZES = (0, 20)
+
+
+def _pii(rng: random.Random) -> str:
+    kind = rng.randrange(8)
+    if kind == 0:
+        return f"{rng.choice(['alice', 'bob', 'm.garcia', 'wchen'])}{rng.randrange(100)}@example.com"
+    if kind == 1:
+        return f"({rng.randrange(200, 999)}) {rng.randrange(200, 999)}-{rng.randrange(10000):04d}"
+    if kind == 2:
+        return f"{rng.randrange(100, 899)}-{rng.randrange(10, 99)}-{rng.randrange(1000, 9999)}"
+    if kind == 3:
+        return "-".join(f"{rng.randrange(10000):04d}" for _ in range(4))
+    if kind in (4, 5):
+        return rng.choice(PEOPLE)
+    if kind == 6:
+        return rng.choice(ORGS)
+    return rng.choice(PLACES)
+
+
+def make_corpus(words: int, density: float, count: int, seed: int = 0) -> List[str]:
+    """``count`` prompts of about ``words`` words, a ``density`` share of them PII."""
+    rng = random.Random(f"{seed}/{words}/{density}")
+    prompts = []
+    for _ in range(count):
+        tokens = [_pii(rng) if rng.random() < density else rng.choice(FILLER) for _ in range(words)]
+        prompts.append(" ".join(tokens))
+    return prompts
+
+
+def corpus_size(words: int, quick: bool) -> int:
+    # Roughly the same number of words per case, but never too few prompts
+    budget = 4_000 if quick else 40_000
+    return max(8, min(400, budget // words))
+
+
+class StubEncoder:
+    """Hashed bag-of-words embeddings: texts sharing words score as similar."""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def encode(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in text.lower().split():
+            vector[zlib.crc32(token.encode("utf-8")) % self.dim] += 1.0
+        return vector
+
+
+def stub_ner_model():
+    """A blank English pipeline whose only component is an entity ruler over the corpus names."""
+    import spacy
+
+    nlp = spacy.blank("en")
+    ruler = nlp.add_pipe("entity_ruler")
+    ruler.add_patterns(
+        [{"label": "PERSON", "pattern": name} for name in PEOPLE]
+        + [{"label": "ORG", "pattern": name} for name in ORGS]
+        + [{"label": "GPE", "pattern": name} for name in PLACES]
+    )
+    return nlp
+
+
+@dataclass
+class Models:
+    ner: NerDetector
+    registry: ModelRegistry
+    embedding_model: str = "all-MiniLM-L6-v2"
+
+
+def load_models(kind: str) -> Models:
+    ner = NerDetector()
+    if kind == "stub":
+        ner.model = stub_ner_model()
+        stub_registry = ModelRegistry(loader=lambda name: StubEncoder())
+        return Models(ner, stub_registry)
+    return Models(ner, registry)
+
+
+@dataclass
+class Result:
+    benchmark: str
+    case: str
+    unit: str
+    value: float
+    params: Dict = field(default_factory=dict)
+
+    @property
+    def key(self) -> str:
+        return f"{self.benchmark}/{self.case}/{self.unit}"
+
+
+def _median_seconds(run: Callable[[], None], repeat: int) -> float:
+    run()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def _percentile(samples: Sequence[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _corpora(lengths: Sequence[int], quick: bool, seed: int):
+    for words in lengths:
+        for density in DENSITIES:
+            yield words, density, make_corpus(words, density, corpus_size(words, quick), seed)
+
+
+def bench_regex(lengths, quick: bool, repeat: int, seed: int) -> List[Result]:
+    detector = RegexDetector()
+    results = []
+    for words, density, prompts in _corpora(lengths, quick, seed):
+        seconds = _median_seconds(lambda: [detector.detect(prompt) for prompt in prompts], repeat)
+        megabytes = sum(len(prompt.encode("utf-8")) for prompt in prompts) / 1e6
+        params = {"words": words, "density": density, "prompts": len(prompts)}
+        case = f"words={words},pii={density}"
+        results.append(Result("regex.detect", case, "prompts/s", len(prompts) / seconds, params))
+        results.append(Result("regex.detect", case, "MB/s", megabytes / seconds, params))
+    return results
+
+
+def bench_ner(models: Models, lengths, quick: bool, repeat: int, seed: int) -> List[Result]:
+    detector = models.ner
+    results = []
+    for words, density, prompts in _corpora(lengths, quick, seed):
+        params = {"words": words, "density": density, "prompts": len(prompts)}
+        case = f"words={words},pii={density}"
+
+        detector.detect(prompts[0])
+        latencies = []
+        for prompt in prompts:
+            start = time.perf_counter()
+            detector.detect(prompt)
+            latencies.append(time.perf_counter() - start)
+        results.append(Result("ner.detect", case, "p50 ms", _percentile(latencies, 0.5) * 1000, params))
+        results.append(Result("ner.detect", case, "p95 ms", _percentile(latencies, 0.95) * 1000, params))
+
+        seconds = _median_seconds(lambda: detector.detect_many(prompts), repeat)
+        results.append(Result("ner.detect_many", case, "prompts/s", len(prompts) / seconds, params))
+    return results
+
+
+def bench_context(models: Models, history_sizes, quick: bool, repeat: int, seed: int) -> List[Result]:
+    turns = make_corpus(32, 0.05, max(history_sizes), seed)
+    # Fresh prompts each run, so every call embeds its text instead of hitting the cache
+    queries = make_corpus(32, 0.05, 50 if quick else 200, seed + 1)
+    detector = RegexDetector()
+    query_findings = [detector.detect(query) for query in queries]
+    results = []
+    for history in history_sizes:
+        session = EmbeddingBasedContext(
+            "bench", model_name=models.embedding_model,
+            model_registry=models.registry, max_history=max(history, 1)
+        )
+        for turn in turns[:history]:
+            session.add_message("user", turn, detector.detect(turn), 0.3)
+
+        samples = []
+        for index in range(repeat):
+            suffix = f" run {index}"
+            start = time.perf_counter()
+            for query, findings in zip(queries, query_findings):
+                session.calculate_context_risk_modifier(query + suffix, findings)
+            samples.append(time.perf_counter() - start)
+        results.append(Result(
+            "context.calculate_context_risk_modifier", f"history={history}", "us/call",
+            statistics.median(samples) / len(queries) * 1e6, {"history": history, "calls": len(queries)}
+        ))
+    return results
+
+
+def bench_analyze(models: Models, lengths, quick: bool, repeat: int, seed: int) -> List[Result]:
+    previous = pipeline.set_ner_detector(models.ner)
+    results = []
+    try:
+        for words, density, prompts in _corpora(lengths, quick, seed):
+            params = {"words": words, "density": density, "prompts": len(prompts)}
+            case = f"words={words},pii={density}"
+            modes = {
+                "full": lambda: [pipeline.analyze(prompt, []) for prompt in prompts],
+                "fast": lambda: [pipeline.analyze(prompt, [], profile="fast") for prompt in prompts],
+                "session": lambda: _analyze_in_session(models, prompts),
+            }
+            for mode, run in modes.items():
+                seconds = _median_seconds(run, repeat)
+                results.append(Result(f"analyze.{mode}", case, "prompts/s", len(prompts) / seconds, params))
+    finally:
+        pipeline.set_ner_detector(previous)
+    return results
+
+
+def _analyze_in_session(models: Models, prompts: List[str]):
+    session = EmbeddingBasedContext(
+        "bench", model_name=models.embedding_model, model_registry=models.registry
+    )
+    for prompt in prompts:
+        pipeline.analyze(prompt, [], session=session)
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=ROOT, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _load_baseline(path: Optional[str]) -> Dict[str, float]:
+    if not path:
+        return {}
+    with open(path) as f:
+        report = json.load(f)
+    return {f"{r['benchmark']}/{r['case']}/{r['unit']}": r["value"] for r in report["results"]}
+
+
+def format_rows(results: List[Result], baseline: Dict[str, float]) -> List[str]:
+    rows = []
+    for result in results:
+        row = f"{result.benchmark:<42} {result.case:<24} {result.value:12.2f} {result.unit:<10}"
+        before = baseline.get(result.key)
+        if before:
+            row += f" {(result.value - before) / before * 100:+7.1f}%"
+        rows.append(row.rstrip())
+    return rows
+
+
+BENCHMARKS = ("regex", "ner", "context", "analyze")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--models", choices=["stub", "real"], default="stub",
+                        help="stub runs offline; real loads en_core_web_sm and sentence-transformers (default: stub)")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS), help="Benchmarks to run")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case; the median is reported (default: 5)")
+    parser.add_argument("--seed", type=int, default=0, help="Corpus seed (default: 0)")
+    parser.add_argument("--quick", action="store_true", help="Smaller corpora and fewer cases, for a smoke run")
+    parser.add_argument("--output", default=os.path.join(ROOT, "bench_output.txt"), help="Text report (default: bench_output.txt)")
+    parser.add_argument("--json", help="Also save the results as JSON, e.g. to compare commits")
+    parser.add_argument("--baseline", help="JSON from an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    # analyze() logs every prompt; keep the console readable, the file handler still runs
+    LoggerManager.set_console_stream(open(os.devnull, "w"))
+
+    lengths = QUICK_LENGTHS if args.quick else LENGTHS
+    history_sizes = QUICK_HISTORY_SIZES if args.quick else HISTORY_SIZES
+    models = load_models(args.models)
+
+    results: List[Result] = []
+    if "regex" in args.only:
+        results += bench_regex(lengths, args.quick, args.repeat, args.seed)
+    if "ner" in args.only:
+        results += bench_ner(models, lengths, args.quick, args.repeat, args.seed)
+    if "context" in args.only:
+        results += bench_context(models, history_sizes, args.quick, args.repeat, args.seed)
+    if "analyze" in args.only:
+        results += bench_analyze(models, lengths, args.quick, args.repeat, args.seed)
+
+    commit = _commit()
+    header = (
+        f"commit {commit}, models={args.models}, seed={args.seed}, repeat={args.repeat}, "
+        f"python {platform.python_version()} on {platform.machine()}"
+    )
+    report = [header] + format_rows(results, _load_baseline(args.baseline))
+    print("\n".join(report))
+    with open(args.output, "w") as f:
+        f.write("\n".join(report) + "\n")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "commit": commit,
+                "models": args.models,
+                "seed": args.seed,
+                "repeat": args.repeat,
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "results": [asdict(result) for result in results],
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
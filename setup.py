@@ -32,6 +32,8 @@ setup(
     entry_points={
         "console_scripts": [
             "anonyme=anonyme.interface.cli:main",
+            "anonyme-service=anonyme.interface.service:main",
+            "anonyme-batch=anonyme.interface.batch:main",
         ],
     },
     include_package_data=True,